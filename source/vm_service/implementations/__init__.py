@@ -5,6 +5,7 @@ from .send_file import send_files, create_dir
 from .read_from_vm import list_dir, read_file, download_file, download_folder
 from .process import start_process, process_status, stop_process
 from .listening_ports import listening_ports
+from .search import SearchError, search_vm
 from .preview_proxy import proxy_request, proxy_request_stream
 
 __all__ = [
@@ -21,6 +22,8 @@ __all__ = [
     "process_status",
     "stop_process",
     "listening_ports",
+    "search_vm",
+    "SearchError",
     "proxy_request",
     "proxy_request_stream",
 ]
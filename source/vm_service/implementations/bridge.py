@@ -1,23 +1,118 @@
 import asyncio
+import os
+import selectors
 import socket
 import threading
 import collections
 
 from fastapi import WebSocket
+from starlette.concurrency import run_in_threadpool
 import paramiko
 
 from models import VMRecord
 from .ssh_cache import generate_console
 
 # How many output frames may be in flight (scheduled on the loop but not yet sent)
-# before the reader thread waits for the oldest to drain. Bounds memory while still
-# letting reads and sends pipeline instead of round-tripping per frame.
+# before a terminal stops being read until the oldest drains. Bounds memory while
+# still letting reads and sends pipeline instead of round-tripping per frame.
 _MAX_INFLIGHT = 32
 # Read window. TUIs (opencode, vim, htop) repaint in large bursts; a bigger window
-# pulls a redraw in fewer recv() calls.
-_RECV_CHUNK = 32768
+# pulls a redraw in fewer recv() calls. 64 KiB is a full SSH channel packet.
+_RECV_CHUNK = 65536
 _MAX_FRAME = 262144
 
+# What a pump of one terminal asks the hub to do next.
+_KEEP, _PAUSE, _DONE = range(3)
+
+
+def _failed(fut: "asyncio.Future") -> bool:
+    return fut.cancelled() or fut.exception() is not None
+
+
+class _ReaderHub:
+    """One thread that reads the output of every open terminal.
+
+    A reader thread per terminal meant N threads contending for the GIL, each waking
+    on its own recv() timeout. The hub waits on all channels' readiness pipes with a
+    single selector and pumps whichever is readable, so an idle terminal costs
+    nothing. Registration changes are queued and applied on the hub thread (woken
+    through a self-pipe), so the selector is only ever touched from that thread.
+    """
+
+    def __init__(self) -> None:
+        self._sel: selectors.BaseSelector | None = None
+        self._ops: "collections.deque[tuple[str, TTYBridge]]" = collections.deque()
+        self._lock = threading.Lock()
+        self._wake_w: int = -1
+
+    def _start(self) -> None:
+        # Caller holds self._lock.
+        rfd, wfd = os.pipe()
+        os.set_blocking(rfd, False)
+        os.set_blocking(wfd, False)
+        self._sel = selectors.DefaultSelector()
+        self._sel.register(rfd, selectors.EVENT_READ, None)
+        self._wake_w = wfd
+        threading.Thread(target=self._run, name="tty-reader-hub", daemon=True).start()
+
+    def submit(self, op: str, bridge: "TTYBridge") -> None:
+        with self._lock:
+            if self._sel is None:
+                self._start()
+            self._ops.append((op, bridge))
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # pipe full: a wake-up is already pending
+
+    def _apply_ops(self, sel: selectors.BaseSelector) -> None:
+        while True:
+            with self._lock:
+                if not self._ops:
+                    return
+                op, bridge = self._ops.popleft()
+            if op == "read":
+                if bridge._alive and bridge._rfd is not None:
+                    try:
+                        sel.register(bridge._rfd, selectors.EVENT_READ, bridge)
+                    except (KeyError, ValueError):
+                        pass  # already registered
+                continue
+            # "close"
+            if bridge._rfd is not None:
+                try:
+                    sel.unregister(bridge._rfd)
+                except (KeyError, ValueError):
+                    pass
+            bridge._teardown()
+
+    def _run(self) -> None:
+        sel = self._sel
+        assert sel is not None
+        while True:
+            for key, _ in sel.select():
+                if key.data is None:
+                    try:
+                        while os.read(key.fd, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                bridge: "TTYBridge" = key.data
+                try:
+                    action = bridge._pump()
+                except Exception:
+                    action = _DONE
+                if action == _KEEP:
+                    continue
+                sel.unregister(key.fd)
+                if action == _DONE:
+                    bridge._teardown()
+            self._apply_ops(sel)
+
+
+_hub = _ReaderHub()
+
 
 class TTYBridge:
     def __init__(
@@ -31,22 +126,36 @@ class TTYBridge:
         self.cli: paramiko.SSHClient | None = None
         self.chan: paramiko.Channel | None = None
         self._alive: bool = False
-        # Event loop that owns `ws`; reader thread schedules sends here instead of
+        self._closed: bool = False
+        # Readiness fd of `chan`, watched by the shared reader hub.
+        self._rfd: int | None = None
+        # Event loop that owns `ws`; the hub schedules sends here instead of
         # spinning up a throwaway loop per chunk (asyncio.run was the main bottleneck).
         self.loop: asyncio.AbstractEventLoop = loop or asyncio.get_event_loop()
+        # Frames scheduled on the loop but not yet flushed. Ordering is preserved
+        # because run_coroutine_threadsafe schedules FIFO.
+        self._inflight: "collections.deque[asyncio.Future]" = collections.deque()
         # Input that arrives before the upstream shell exists is buffered here and
         # flushed once the channel is ready, so callers never need to guess a delay
         # before sending the first command.
         self._lock = threading.Lock()
-        self._pending: list[bytes | str] = []
+        self._pending: list[bytes] = []
         self._ready: bool = False
 
     def start(self) -> None:
+        # Connecting blocks (TCP + SSH handshake), so it runs on its own short-lived
+        # thread; once the shell is up, reading is handed to the shared hub.
         def _run():
             try:
                 cli, chan = generate_console(self.vm)
                 self.cli = cli
                 self.chan = chan
+                # Blocking, for writes too: a zero (or short) timeout makes
+                # paramiko raise socket.timeout as soon as the peer's window is
+                # full, dropping input. The hub never blocks on recv(): it only
+                # reads when data is buffered or the channel reached EOF.
+                chan.settimeout(None)
+                self._rfd = chan.fileno()
                 self._alive = True
 
                 # Flush anything that was sent while the shell was still starting.
@@ -56,76 +165,89 @@ class TTYBridge:
                     self._ready = True
                     for payload in self._pending:
                         try:
-                            chan.send(payload)
+                            chan.sendall(memoryview(payload))
                         except Exception:
                             break
                     self._pending = []
+            except Exception as e:
+                print("Could not open terminal:", e)
+                self._teardown()
+                return
+            if self._closed:
+                self._teardown()
+                return
+            _hub.submit("read", self)
 
-                # Frames scheduled on the loop but not yet flushed. Ordering is
-                # preserved because run_coroutine_threadsafe schedules FIFO.
-                inflight: "collections.deque[asyncio.Future]" = collections.deque()
+        threading.Thread(target=_run, daemon=True).start()
 
-                # `chan` has a small read timeout (set in generate_console), so recv()
-                # returns the instant data arrives and otherwise wakes every ~0.2s just
-                # to re-check `_alive`. No busy-poll, no fixed latency on the echo.
-                while self._alive and not chan.closed:
-                    try:
-                        data = chan.recv(_RECV_CHUNK)
-                    except socket.timeout:
-                        continue
-                    except Exception:
-                        break
-                    if not data:
+    def _pump(self) -> int:
+        """Forward whatever the channel has buffered. Runs on the hub thread."""
+        chan = self.chan
+        if not self._alive or chan is None or chan.closed:
+            return _DONE
+        if not chan.recv_ready() and not chan.eof_received:
+            return _KEEP  # stray wake-up: nothing to read yet
+        try:
+            data = chan.recv(_RECV_CHUNK)
+        except socket.timeout:
+            return _KEEP
+        if not data:
+            return _DONE
+
+        # Coalesce whatever is already buffered into a single frame so large
+        # redraws (`clear`, TUIs) ship in one send. recv_ready() is non-blocking,
+        # so this never adds latency for small echoes. Pieces are appended to a
+        # bytearray in place; `bytes += bytes` re-copied the frame on every read.
+        if chan.recv_ready():
+            frame = bytearray(data)
+            try:
+                while chan.recv_ready() and len(frame) < _MAX_FRAME:
+                    more = chan.recv(_RECV_CHUNK)
+                    if not more:
                         break
+                    frame += more
+            except Exception:
+                pass
+            data = bytes(frame)
 
-                    # Coalesce whatever is already buffered into a single frame so
-                    # large redraws (`clear`, TUIs) ship in one send. recv_ready() is
-                    # non-blocking, so this never adds latency for small echoes.
-                    try:
-                        while chan.recv_ready() and len(data) < _MAX_FRAME:
-                            more = chan.recv(_RECV_CHUNK)
-                            if not more:
-                                break
-                            data += more
-                    except Exception:
-                        pass
+        # Binary frame (no base64): saves 33% size + encode/decode CPU on the hot
+        # output path.
+        fut = asyncio.run_coroutine_threadsafe(self.ws.send_bytes(data), self.loop)
+        inflight = self._inflight
+        inflight.append(fut)
 
-                    # Binary frame (no base64): saves 33% size + encode/decode CPU on
-                    # the hot output path.
-                    fut = asyncio.run_coroutine_threadsafe(
-                        self.ws.send_bytes(bytes(data)), self.loop
-                    )
-                    inflight.append(fut)
+        # Reap finished sends without blocking, so reads and sends pipeline.
+        while inflight and inflight[0].done():
+            if _failed(inflight.popleft()):
+                return _DONE
 
-                    # Reap finished sends without blocking, so reads and sends pipeline.
-                    while inflight and inflight[0].done():
-                        inflight.popleft()
+        # Backpressure: if the loop falls behind, stop reading this terminal (the
+        # others keep flowing) until its oldest frame is flushed.
+        if len(inflight) >= _MAX_INFLIGHT:
+            inflight.popleft().add_done_callback(self._resume)
+            return _PAUSE
+        return _KEEP
 
-                    # Backpressure: if the loop falls behind, wait for the oldest frame.
-                    if len(inflight) >= _MAX_INFLIGHT:
-                        try:
-                            inflight.popleft().result()
-                        except Exception:
-                            break
-                self._alive = False
-            finally:
-                try:
-                    if self.chan and not self.chan.closed:
-                        self.chan.close()
-                except Exception:
-                    pass
-                # Close the terminal's dedicated SSH connection so it does not
-                # linger after the websocket goes away.
-                try:
-                    if self.cli is not None:
-                        self.cli.close()
-                except Exception:
-                    pass
+    def _resume(self, fut: "asyncio.Future") -> None:
+        _hub.submit("close" if _failed(fut) else "read", self)
 
-        threading.Thread(target=_run, daemon=True).start()
+    def _teardown(self) -> None:
+        self._alive = False
+        try:
+            if self.chan and not self.chan.closed:
+                self.chan.close()
+        except Exception:
+            pass
+        # Close the terminal's dedicated SSH connection so it does not linger after
+        # the websocket goes away.
+        try:
+            if self.cli is not None:
+                self.cli.close()
+        except Exception:
+            pass
 
     @staticmethod
-    def _to_payload(data: bytes | str) -> bytes | str:
+    def _to_payload(data: bytes | str) -> bytes:
         if isinstance(data, (bytes, bytearray)):
             return bytes(data)
 
@@ -134,20 +256,30 @@ class TTYBridge:
             return b"\x03"
         if s == "ctrld":
             return b"\x04"
-        # Send as-is (no forced newline)
-        return data
-
-    async def send(self, data: bytes | str) -> None:
-        payload = self._to_payload(data)
+        # Send as-is (no forced newline), encoded once up front.
+        return data.encode()
 
+    def _write(self, payload: bytes) -> None:
         # If the shell channel is not ready yet, buffer instead of dropping. The lock
-        # closes the race against the reader thread flipping `_ready` and draining.
+        # closes the race against the connect thread flipping `_ready` and draining.
         with self._lock:
             if not self._ready or not self.chan or self.chan.closed:
                 self._pending.append(payload)
                 return
+            # send() may write only part of a large paste (it stops at the SSH
+            # window); sendall() waits for the window and loops until everything
+            # is out, and slicing a memoryview on each partial write doesn't copy
+            # the remainder.
+            self.chan.sendall(memoryview(payload))
 
-        self.chan.send(payload)
+    async def send(self, data: bytes | str) -> None:
+        # sendall blocks while the peer's window is full (a big paste, or a program
+        # not reading stdin), so it runs on the threadpool, never on the loop that
+        # serves every terminal. Awaiting it keeps this terminal's input in order.
+        await run_in_threadpool(self._write, self._to_payload(data))
 
     def close(self) -> None:
+        self._closed = True
         self._alive = False
+        if self._rfd is not None:
+            _hub.submit("close", self)
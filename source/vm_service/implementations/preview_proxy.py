@@ -203,21 +203,26 @@ class StreamResult:
 def _read_head(chan, timeout: float) -> tuple[bytes, bytes]:
     """Read off the channel until end-of-headers; return ``(head, leftover_body)``."""
     chan.settimeout(timeout)
-    buf = b""
-    while b"\r\n\r\n" not in buf:
+    # Grown in place and only the newly received tail (plus 3 bytes of overlap for
+    # a terminator split across reads) is scanned, instead of re-copying and
+    # re-searching the whole head on every recv().
+    buf = bytearray()
+    end = -1
+    while end == -1:
         try:
             data = chan.recv(_RECV_CHUNK)
         except socket.timeout:
             break
         if not data:
             break
+        start = max(len(buf) - 3, 0)
         buf += data
-        if len(buf) > _MAX_HEAD_BYTES:
+        end = buf.find(b"\r\n\r\n", start)
+        if end == -1 and len(buf) > _MAX_HEAD_BYTES:
             break
-    head, sep, rest = buf.partition(b"\r\n\r\n")
-    if not sep:
+    if end == -1:
         return b"", b""
-    return head, rest
+    return bytes(buf[:end]), bytes(buf[end + 4 :])
 
 
 def _parse_head(head: bytes, method: str) -> tuple[int, str, list[tuple[str, str]]]:
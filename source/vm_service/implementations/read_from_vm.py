@@ -1,33 +1,49 @@
 import os
 import shlex
+import stat
 import mimetypes
-from typing import Any
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Iterator
 import paramiko
 
 from models import VMRecord, ListDirItem, FileContent
 from .ssh_cache import exec_and_close
 from .ssh_pool import borrow
 
+# Downloads are relayed in chunks of this size, so memory stays bounded however
+# large the file or archive is.
+_DOWNLOAD_CHUNK = 1 << 20
+
+
+# `find -printf %y` type letters; anything that isn't a directory is listed as a file.
+_PATH_TYPES = {b"d": "directory"}
+
 
 def _execute_list(
     root: str, cli: paramiko.SSHClient, depth: int = 1
 ) -> list[ListDirItem]:
     items: list[ListDirItem] = []
     try:
-        cmd = f"find {shlex.quote(root)} -maxdepth {depth} -printf '%p||%y\\n' 2>/dev/null || true"
+        # One NUL-terminated record per entry, type letter first: NUL is the only
+        # byte a path can't contain, so names with newlines or "||" parse fine.
+        cmd = f"find {shlex.quote(root)} -maxdepth {depth} -printf '%y%p\\0' 2>/dev/null || true"
         out, _ = exec_and_close(cli, cmd)
-        lines = (out.decode() or "").strip().splitlines()
 
-        for ln in lines:
-            if "||" not in ln:
+        append = items.append
+        basename = os.path.basename
+        path_type = _PATH_TYPES.get
+        for rec in out.split(b"\0"):
+            if len(rec) < 2:
                 continue
-            p, t = ln.split("||", 1)
-            base = os.path.basename(p.rstrip("/")) or p
-            items.append(
-                ListDirItem(
+            p = rec[1:].decode()
+            base = basename(p.rstrip("/")) or p
+            # Trusted, already-typed fields: skip per-item pydantic validation.
+            append(
+                ListDirItem.model_construct(
                     path=p,
                     name=base,
-                    path_type="directory" if t == "d" else "file",
+                    path_type=path_type(rec[:1], "file"),
                 )
             )
     except Exception as e:
@@ -73,8 +89,31 @@ def read_file(container: VMRecord, path: str) -> FileContent:
     )
 
 
+def _stream(
+    first: bytes, read: Callable[[int], bytes], stack: ExitStack
+) -> Iterator[bytes]:
+    """Yield ``first`` then ``read`` chunks until EOF; closing ``stack`` at the end.
+
+    ``stack`` holds the borrowed connection (and the open file or channel), so it
+    stays checked out exactly as long as the response body is being sent.
+    """
+    with stack:
+        buf = first
+        while buf:
+            yield buf
+            buf = read(_DOWNLOAD_CHUNK)
+
+
+def _close_channel(stdout: Any) -> None:
+    try:
+        stdout.channel.close()
+    except Exception:
+        pass
+
+
 def download_file(vm: VMRecord, path: str) -> dict[str, Any] | None:
-    with borrow(vm) as conn:
+    with ExitStack() as stack:
+        conn = stack.enter_context(borrow(vm))
         sftp = conn.sftp
         if not sftp:
             print("Issue downloading...", "issue with sftp")
@@ -85,23 +124,26 @@ def download_file(vm: VMRecord, path: str) -> dict[str, Any] | None:
         except Exception as e:
             print("Issue downloading... File not found", e)
             return None
-        if str(st.st_mode).startswith("4"):
+        # st_mode is an int (0o40755 for a directory is 16877, so the old
+        # "starts with 4" check on its decimal form never matched a real one).
+        if stat.S_ISDIR(st.st_mode or 0):
             print("Issue downloading...", "Path is a directory; use /download-folder")
             return None
 
         try:
             # pyrefly: ignore  # missing-attribute
-            with sftp.file(path, "rb") as rf:
-                data: bytes = rf.read()
+            rf = stack.enter_context(sftp.file(path, "rb"))
+            first: bytes = rf.read(_DOWNLOAD_CHUNK)
         except Exception as e:
             print("Issue downloading...", f"Cannot open: {path}", e)
             return None
+        body = _stream(first, rf.read, stack.pop_all())
 
     name = os.path.basename(path) or "download"
     media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
     headers = {"Content-Disposition": f'attachment; filename="{name}"'}
     return {
-        "content": data,
+        "content": body,
         "media_type": media_type,
         "headers": headers,
     }
@@ -113,13 +155,35 @@ def _zip_available(cli: paramiko.SSHClient) -> bool:
     return out.decode().strip() == "OK"
 
 
+# Whether each VM has `zip`, as (checked_at, available) per vm id. The guest's
+# tools don't change while it runs, so one probe serves downloads for a while
+# instead of costing an extra exec round-trip each; a stopped VM is forgotten.
+_ZIP_TTL_S = 300.0
+_zip_cache: dict[str, tuple[float, bool]] = {}
+
+
+def _zip_available_cached(vm_id: str, cli: paramiko.SSHClient) -> bool:
+    now = time.monotonic()
+    hit = _zip_cache.get(vm_id)
+    if hit is not None and now - hit[0] < _ZIP_TTL_S:
+        return hit[1]
+    available = _zip_available(cli)
+    _zip_cache[vm_id] = (now, available)
+    return available
+
+
+def clear_zip_cache(vm_id: str) -> None:
+    _zip_cache.pop(vm_id, None)
+
+
 def download_folder(
     vm: VMRecord, root: str, prefer_fmt: str = "zip"
 ) -> dict[str, Any] | None:
     safe_root = shlex.quote(root)
     base = os.path.basename(root.rstrip("/")) or "archive"
 
-    with borrow(vm) as conn:
+    with ExitStack() as stack:
+        conn = stack.enter_context(borrow(vm))
         cli = conn.cli
         sftp = conn.sftp
         if not cli or not sftp:
@@ -132,7 +196,7 @@ def download_folder(
             return None
 
         fmt = prefer_fmt
-        if fmt == "zip" and not _zip_available(cli):
+        if fmt == "zip" and not _zip_available_cached(vm.id, cli):
             fmt = "tar.gz"
 
         if fmt == "zip":
@@ -147,19 +211,24 @@ def download_folder(
             print("Error generating zip folder", "Invalid format")
             return None
 
-        archive_bytes, err_bytes = exec_and_close(cli, cmd)
-
-    if not archive_bytes:
-        err = err_bytes.decode(errors="ignore")
-        print(
-            "Error generating zip folder", f"Pack command returned empty output. {err}"
-        )
-        return None
+        # The archive is piped through as it is produced; only the first chunk is
+        # read here, to tell a failed pack (no output) from a real archive.
+        _, stdout, stderr = cli.exec_command(cmd)
+        stack.callback(_close_channel, stdout)
+        first = stdout.read(_DOWNLOAD_CHUNK)
+        if not first:
+            err = stderr.read().decode(errors="ignore")
+            print(
+                "Error generating zip folder",
+                f"Pack command returned empty output. {err}",
+            )
+            return None
+        body = _stream(first, stdout.read, stack.pop_all())
 
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
 
     return {
-        "content": archive_bytes,
+        "content": body,
         "media_type": media_type,
         "headers": headers,
     }
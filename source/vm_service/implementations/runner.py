@@ -5,11 +5,12 @@ import signal
 import threading
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import settings
 
-from qemu_manager.vm import start_vm
-from models import VMState, VMRecord
+from qemu_manager.vm import start_vm, _pid_alive, _wait_pid_exit
+from models import VMState, VMRecord, VMProc
 
 from typing import TYPE_CHECKING
 
@@ -22,6 +23,10 @@ class Runner:
     def __init__(self, store: "RedisStore", node_name: str) -> None:
         self.node_name = node_name
         self.store = store
+        # Handles of the VMs this process booted. Records read back from the store
+        # don't carry `proc`, so stop() looks the handle up here (cached pid and
+        # Popen) before falling back to the pidfile.
+        self._procs: dict[str, VMProc] = {}
 
     def workdir(self, vm_id: str) -> str:
         base = os.path.join(settings.VM_BASE_DIR, "vms")
@@ -37,6 +42,7 @@ class Runner:
                 vm_ssh_user = settings.VM_SSH_USER
                 proc = start_vm(vm.workdir, vm.vcpus, vm.mem_mib, vm.disk_gib, vm.id)
                 vm.proc = proc
+                self._procs[vm.id] = proc
                 vm.ssh_port = proc.port_ssh
                 vm.ssh_user = vm_ssh_user
 
@@ -56,28 +62,41 @@ class Runner:
         vm.booted_at = time.time()
         self.store.put(vm)
 
+    @staticmethod
+    def _safe_unlink(pth: str) -> None:
+        # No exists() pre-check: a missing file is just one failed unlink.
+        try:
+            os.remove(pth)
+        except Exception:
+            pass
+
     @staticmethod
     def _clean_up(vm: VMRecord):
-        for pth in [
-            os.path.join(vm.workdir, "disk.qcow2"),
-            os.path.join(vm.workdir, "seed.iso"),
-            os.path.join(vm.workdir, "console.log"),
-            os.path.join(vm.workdir, "qemu.pid"),
-            os.path.join(vm.workdir, "user-data"),
-            os.path.join(vm.workdir, "meta-data"),
-            os.path.join(vm.workdir, "seed.iso.spec"),
-        ]:
-            try:
-                if os.path.exists(pth):
-                    os.remove(pth)
-            except Exception:
+        # Unlinking a multi-GiB overlay can block for a while as the filesystem frees
+        # its extents; unlink releases the GIL, so the files are removed in parallel
+        # and the small ones don't queue behind the disk image.
+        paths = [
+            os.path.join(vm.workdir, name)
+            for name in (
+                "disk.qcow2",
+                "seed.iso",
+                "console.log",
+                "qemu.pid",
+                "user-data",
+                "meta-data",
+                "seed.iso.spec",
+            )
+        ]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            for _ in pool.map(Runner._safe_unlink, paths):
                 pass
 
     @staticmethod
     def _kill_by_pid(pid):
+        # Give QEMU up to 1s to exit on SIGTERM, returning as soon as it does.
         try:
             os.killpg(pid, signal.SIGTERM)
-            time.sleep(1.0)
+            _ = _wait_pid_exit(pid, 1.0)
         except Exception:
             pass
         try:
@@ -103,6 +122,15 @@ class Runner:
         vm_base_dir = settings.VM_BASE_DIR or ""
         pidfile = os.path.join(vm_base_dir, "vms", vm.id, "qemu.pid")
 
+        # The cached pid may belong to a QEMU that already exited (and the pid may
+        # have been reused since), so it is only trusted while the process is
+        # still there: the Popen handle knows for sure, a bare pid is probed.
+        if vm.proc is not None and vm.proc.pid:
+            popen = vm.proc.proc
+            alive = popen.poll() is None if popen else _pid_alive(vm.proc.pid)
+            if alive:
+                return vm.proc.pid, pidfile
+
         pid = None
         if os.path.exists(pidfile):
             try:
@@ -122,11 +150,12 @@ class Runner:
         corrected. Lazy-imported to avoid an import cycle with ``implementations``.
         """
         try:
-            from implementations import ssh_pool, preview_pool, ssh_cache
+            from implementations import ssh_pool, preview_pool, ssh_cache, read_from_vm
 
             ssh_pool.drop_pool(vm_id)
             preview_pool.drop_preview_pool(vm_id)
             ssh_cache.clear_cache(vm_id)
+            read_from_vm.clear_zip_cache(vm_id)
         except Exception:
             pass
 
@@ -135,6 +164,9 @@ class Runner:
     ) -> None:
         def _run():
             try:
+                known = self._procs.pop(vm.id, None)
+                if vm.proc is None:
+                    vm.proc = known
                 pid, pidfile = self._try_to_get_pid(vm)
 
                 if pid:
@@ -0,0 +1,170 @@
+"""Full-text search inside a VM (IDE search panel and the AI agent's grep tool).
+
+Runs ripgrep when the guest has it (multi-threaded, structured ``--json`` output
+that survives ``:`` in paths) and falls back to ``grep -RInI`` otherwise. The
+pattern is matched literally with ``fixed_strings`` (``-F`` for both) and is
+otherwise an extended regex (``grep -E``), so it means the same on both. Both are
+tried in ONE remote shell command, so no extra round-trip is spent probing for
+``rg``; the parser tells the two formats apart from the first line, since rg's
+JSON stream always opens with a ``begin`` message. Output is streamed and reading
+stops as soon as ``max_results_total`` matches were collected. An exit status of
+2 or more with no matches (bad pattern, missing root) is raised as a SearchError.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import shlex
+from contextlib import closing
+from typing import Any, Callable
+
+from models import VMRecord, SearchHit, SearchRequest
+from .ssh_cache import exec_lines
+from .ssh_pool import borrow
+
+_RG_BEGIN = b'{"type":"begin"'
+
+
+class SearchError(Exception):
+    """The search command itself failed (e.g. an invalid pattern)."""
+
+
+# The fixed head of each command line, already shell-safe; only the request-derived
+# arguments that follow are quoted per call.
+# -R recursive, -I ignore binaries, -n show line numbers
+_GREP_PREFIX = "grep -RInI"
+# Match grep -R's file set: don't honor .gitignore, include dotfiles, follow
+# symlinks. Binary files are skipped by default, like grep -I.
+_RG_PREFIX = "rg --json --no-ignore --hidden --follow"
+
+
+def _grep_args(req: SearchRequest) -> list[str]:
+    # -E: extended regex, the closest dialect to ripgrep's, so a regex works the
+    # same with either tool.
+    argv: list[str] = ["-F" if req.fixed_strings else "-E"]
+    if req.case_insensitive:
+        argv.append("-i")
+    for d in req.exclude_dirs:
+        argv.append(f"--exclude-dir={d}")
+    for g in req.include_globs:
+        if g.strip() == "*" or g.strip() == "":
+            continue
+        argv.append(f"--include={g}")
+    # No single file can contribute more than the overall cap.
+    if req.max_results_total:
+        argv.append(f"--max-count={req.max_results_total}")
+    argv.extend(["-e", req.pattern, req.root])
+    return argv
+
+
+def _rg_args(req: SearchRequest) -> list[str]:
+    argv: list[str] = ["-F"] if req.fixed_strings else []
+    if req.case_insensitive:
+        argv.append("-i")
+    for g in req.include_globs:
+        if g.strip() == "*" or g.strip() == "":
+            continue
+        argv.append(f"--glob={g}")
+    # Later globs win; the trailing slash restricts the exclusion to directories.
+    for d in req.exclude_dirs:
+        argv.append(f"--glob=!{d}/")
+    if req.max_results_total:
+        argv.append(f"--max-count={req.max_results_total}")
+    argv.extend(["-e", req.pattern, req.root])
+    return argv
+
+
+def _command(req: SearchRequest) -> str:
+    rg = f"{_RG_PREFIX} {shlex.join(_rg_args(req))}"
+    grep = f"{_GREP_PREFIX} {shlex.join(_grep_args(req))}"
+    cmd = f"if command -v rg >/dev/null 2>&1; then {rg}; else {grep}; fi"
+    if not req.compress:
+        return cmd
+    # Fastest gzip level: matches compress several-fold and cost little CPU. A
+    # pipeline exits with gzip's status, so the search's own status is passed
+    # out through fd 4 and re-raised with `exit`.
+    return (
+        f"exec 3>&1; s=$({{ {{ {cmd}; echo $? >&4; }} | gzip -1 >&3; }} 4>&1); exit $s"
+    )
+
+
+def _rg_text(field: dict[str, Any]) -> str:
+    # rg reports non-UTF-8 data as base64 under "bytes" instead of "text".
+    text = field.get("text")
+    if text is not None:
+        return text
+    return base64.b64decode(field.get("bytes", "")).decode("utf-8", errors="replace")
+
+
+def _parse_rg(line: bytes) -> tuple[str, str] | None:
+    msg = json.loads(line)
+    if msg.get("type") != "match":
+        return None
+    data = msg["data"]
+    content = _rg_text(data["lines"])
+    if content.endswith("\n"):
+        content = content[:-1]
+    return _rg_text(data["path"]), f"L{data['line_number']}: {content}"
+
+
+def _parse_grep(line: bytes) -> tuple[str, str] | None:
+    # Split the raw bytes and decode only the fields that are kept; lines that are
+    # not "path:line:content" are dropped without ever being decoded.
+    parts = line.split(b":", 2)
+    if len(parts) < 3:
+        return None
+    file_path = parts[0].decode("utf-8", errors="replace")
+    line_num = parts[1].decode("ascii", errors="replace")
+    content = parts[2].decode("utf-8", errors="replace")
+    return file_path, f"L{line_num}: {content}"
+
+
+def search_vm(container: VMRecord, req: SearchRequest) -> list[SearchHit]:
+    """Search ``req.root`` inside ``container``, grouping matches by file."""
+    results: dict[str, list[str]] = {}
+    total = 0
+    parse: Callable[[bytes], tuple[str, str] | None] | None = None
+    exit_info: list[tuple[int, bytes]] = []
+
+    with borrow(container) as conn:
+        # Closing the generator closes the channel (no leak), which also stops the
+        # remote search instead of transferring output that would be thrown away.
+        lines_iter = exec_lines(
+            conn.cli,
+            _command(req),
+            req.timeout_seconds,
+            gunzip=req.compress,
+            on_exit=lambda code, err: exit_info.append((code, err)),
+        )
+        with closing(lines_iter) as lines:
+            for raw_line in lines:
+                if parse is None:
+                    parse = _parse_rg if raw_line.startswith(_RG_BEGIN) else _parse_grep
+                try:
+                    hit = parse(raw_line)
+                except Exception:
+                    continue
+                if hit is None:
+                    continue
+                file_path, match_str = hit
+                results.setdefault(file_path, []).append(match_str)
+
+                total += 1
+                if req.max_results_total and total >= req.max_results_total:
+                    break
+
+    # rg and grep exit 1 for "no match" and 2 for errors. Errors on single files
+    # (e.g. permission denied) also give 2, so they only fail the search when
+    # nothing matched at all.
+    if exit_info and exit_info[0][0] >= 2:
+        code, err = exit_info[0]
+        detail = err.decode("utf-8", errors="replace").strip()
+        if not results:
+            raise SearchError(f"search exited with {code}: {detail}")
+        print("Search finished with errors:", detail)
+
+    return [
+        SearchHit.model_construct(path=path, matchs=matchs)
+        for path, matchs in results.items()
+    ]
@@ -7,6 +7,10 @@ import errno
 from models import VMUploadFiles, VMRecord, ElementResponse
 from .ssh_pool import borrow
 
+# Indirection so tests can drop the settle delays without patching time.sleep
+# for the whole process.
+_sleep = time.sleep
+
 
 def _run_and_check(cli: paramiko.SSHClient, cmd: str, timeout: float | None = None):
     _, stdout, stderr = cli.exec_command(cmd, timeout=timeout)
@@ -81,11 +85,11 @@ def _save_file_bytes(
     dirn = posixpath.dirname(full_path)
     if dirn and dirn not in (".", "/"):
         _sftp_mkdirs(sftp, dirn)
-    time.sleep(0.02)
+    _sleep(0.02)
 
     with sftp.open(full_path, "wb") as wf:
         wf.write(data)
-    time.sleep(0.02)
+    _sleep(0.02)
 
     mode = file_mode or 0o644
     try:
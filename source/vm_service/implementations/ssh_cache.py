@@ -1,6 +1,8 @@
-from typing import cast
+from typing import Callable, Iterator, cast
 import shlex
 import socket
+import threading
+import zlib
 import paramiko
 import settings
 from models import VMRecord
@@ -20,6 +22,8 @@ class VMIdentityMismatch(Exception):
 cache_data: dict[
     str, dict[str, paramiko.SSHClient | paramiko.SFTPClient | paramiko.Channel | None]
 ] = {}
+# Serializes the lazy SFTP open so two callers don't both start the subsystem.
+_sftp_lock = threading.Lock()
 
 
 def exec_and_close(
@@ -82,6 +86,64 @@ def exec_and_close_status(
             pass
 
 
+def exec_lines(
+    cli: paramiko.SSHClient,
+    command: str,
+    timeout: float | None = None,
+    chunk_size: int = 65536,
+    gunzip: bool = False,
+    on_exit: Callable[[int, bytes], None] | None = None,
+) -> Iterator[bytes]:
+    """Run ``command`` and yield its stdout line by line, in bounded chunks.
+
+    Unlike ``exec_and_close`` the output is never buffered whole: a caller that has
+    seen enough just stops iterating. Closing the generator (explicitly, or when it
+    is dropped) closes the channel, so sshd hangs up on the remote command instead
+    of letting it run to completion; the channel is always closed, as there.
+
+    With ``gunzip`` the command's stdout is a gzip stream (e.g. ``... | gzip -1``)
+    and is inflated incrementally as it arrives.
+
+    Once stdout is exhausted (not when the caller stops early), ``on_exit`` gets
+    the exit status (``-1`` if it can't be read, as in ``exec_and_close_status``)
+    and the command's stderr.
+    """
+    _, stdout, stderr = cli.exec_command(command)
+    try:
+        if timeout is not None:
+            try:
+                stdout.channel.settimeout(timeout)
+            except Exception:
+                pass
+        inflate = zlib.decompressobj(zlib.MAX_WBITS | 16) if gunzip else None
+        tail = b""
+        while True:
+            raw = stdout.read(chunk_size)
+            chunk = raw
+            if inflate is not None:
+                chunk = inflate.decompress(raw) if raw else inflate.flush()
+            if chunk:
+                lines = (tail + chunk).split(b"\n")
+                tail = lines.pop()
+                yield from lines
+            if not raw:
+                break
+        if tail:
+            yield tail
+        if on_exit is not None:
+            err = stderr.read()
+            try:
+                code = int(stdout.channel.recv_exit_status())
+            except Exception:
+                code = -1
+            on_exit(code, err)
+    finally:
+        try:
+            stdout.channel.close()
+        except Exception:
+            pass
+
+
 def write_vm_id_marker(cli: paramiko.SSHClient, vm_id: str) -> None:
     """Best-effort: stamp ``vm_id`` into the guest at ``VM_ID_MARKER_PATH``.
 
@@ -126,48 +188,91 @@ def assert_vm_identity(cli: paramiko.SSHClient, expected_vm_id: str | None) -> N
         )
 
 
+# Flow-control window for the bulk channels (exec, SFTP) opened on a tuned
+# transport. Paramiko's 2 MiB default stalls bulk output (`cat` of a big file,
+# search results, SFTP reads) waiting for WINDOW_ADJUST round-trips; the window is
+# only credit, so a reader that keeps draining never buffers anywhere near this.
+_CHANNEL_WINDOW = 128 * 1024 * 1024
+# Interactive shells keep a modest window: a runaway program (`yes`, a huge `cat`)
+# can then only get this far ahead of the terminal before Ctrl-C reaches it.
+_SHELL_WINDOW = 4 * 1024 * 1024
+
+
+def _compress_kwargs() -> dict[str, bool]:
+    """``connect()`` kwargs enabling SSH compression when ``VM_SSH_COMPRESS`` is on."""
+    return {"compress": True} if getattr(settings, "VM_SSH_COMPRESS", False) else {}
+
+
+def _tune_transport(cli: paramiko.SSHClient) -> None:
+    """Tune a freshly connected client's transport before any channel is opened.
+
+    Disables Nagle (tiny keystroke packets must not wait ~40ms to be coalesced),
+    enables keepalive against idle drops and widens the default channel window
+    (shells opt out, see ``_invoke_shell``). Guarded so test fakes without a real
+    transport are a no-op.
+    """
+    try:
+        transport = cli.get_transport()
+        if transport is None:
+            return
+        try:
+            transport.set_keepalive(30)
+        except Exception:
+            pass
+        # pyrefly: ignore  # bad-assignment
+        transport.default_window_size = _CHANNEL_WINDOW
+        tsock = getattr(transport, "sock", None)
+        if tsock is not None:
+            tsock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception as e:
+        print("Could not tune SSH transport:", e)
+
+
+def _invoke_shell(cli: paramiko.SSHClient) -> paramiko.Channel:
+    """``cli.invoke_shell()``, but with the modest ``_SHELL_WINDOW``.
+
+    ``SSHClient.invoke_shell`` always uses the transport's default window, which
+    ``_tune_transport`` sized for bulk transfers, so the session is opened here
+    the same way with an explicit window. Fakes without ``open_session`` fall back.
+    """
+    transport = cli.get_transport()
+    open_session = getattr(transport, "open_session", None)
+    if open_session is None:
+        return cli.invoke_shell(width=120, height=32)
+    chan = open_session(window_size=_SHELL_WINDOW)
+    chan.get_pty(width=120, height=32)
+    chan.invoke_shell()
+    return chan
+
+
 def clear_cache(vm_id: str):
     cache_data[vm_id] = {}
 
 
 def clear_all_cache():
-    global cache_data
-    cache_data = {}
+    # In place, so modules that imported cache_data by name see the reset too.
+    cache_data.clear()
 
 
 def finalize_and_cache(container_id: str, cli: paramiko.SSHClient):
     """
-    Take an already-connected SSH client, tune it, open the sftp/shell channels
-    and store the full entry in ``cache_data``.
+    Take an already-connected SSH client, tune it, open the shell channel and
+    store the full entry in ``cache_data``.
 
     This is the single place where a cache entry is built, so every code path
     (lazy generation and the boot-time warmup in ``wait_ssh``) produces an
-    identical, consistent entry (cli + sftp + chan + transport tuning).
+    identical, consistent entry (cli + chan + transport tuning). The SFTP
+    subsystem is NOT opened here: exec-only users (search, run commands) never need
+    it, so ``sftp`` stays ``None`` until ``open_sftp`` first asks for it.
     """
-    # Disable Nagle on the SSH transport: tiny keystroke packets must not wait to be
-    # coalesced (~40ms otherwise). Keepalive avoids idle drops. Guarded so test fakes
-    # without a real transport are a no-op.
-    try:
-        transport = cli.get_transport()
-        if transport is not None:
-            try:
-                transport.set_keepalive(30)
-            except Exception:
-                pass
-            tsock = getattr(transport, "sock", None)
-            if tsock is not None:
-                tsock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    except Exception as e:
-        print("Could not enable TCP_NODELAY on SSH transport:", e)
-
-    sftp = cli.open_sftp()
+    _tune_transport(cli)
 
-    chan = cli.invoke_shell(width=120, height=32)
+    chan = _invoke_shell(cli)
     chan.settimeout(0.0)
 
-    cache_data[container_id] = {"cli": cli, "sftp": sftp, "chan": chan}
+    cache_data[container_id] = {"cli": cli, "sftp": None, "chan": chan}
 
-    return cli, sftp, chan
+    return cli, None, chan
 
 
 def _connect(ssh_port: int | None, ssh_user: str | None) -> paramiko.SSHClient:
@@ -186,19 +291,9 @@ def _connect(ssh_port: int | None, ssh_user: str | None) -> paramiko.SSHClient:
         username=ssh_user or "root",
         pkey=key,
         look_for_keys=False,
+        **_compress_kwargs(),
     )
-    try:
-        transport = cli.get_transport()
-        if transport is not None:
-            try:
-                transport.set_keepalive(30)
-            except Exception:
-                pass
-            tsock = getattr(transport, "sock", None)
-            if tsock is not None:
-                tsock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    except Exception as e:
-        print("Could not tune SSH transport:", e)
+    _tune_transport(cli)
     return cli
 
 
@@ -235,7 +330,7 @@ def cache_ssh_and_sftp_by_id(
         _ = _generate_ssh_and_sftp_by_id(container_id, ssh_port, ssh_user)
         return cache_data[container_id]
 
-    if data["cli"] is None or data["sftp"] is None:
+    if data["cli"] is None:
         _ = _generate_ssh_and_sftp_by_id(container_id, ssh_port, ssh_user)
         return cache_data[container_id]
 
@@ -267,14 +362,25 @@ def open_ssh(container: VMRecord):
     return cast(paramiko.SSHClient, val["cli"])
 
 
+def _lazy_sftp(val: dict) -> paramiko.SFTPClient:
+    """Return the entry's SFTP client, opening the subsystem on first use."""
+    sftp = val.get("sftp")
+    if sftp is None:
+        with _sftp_lock:
+            sftp = val.get("sftp")
+            if sftp is None:
+                sftp = cast(paramiko.SSHClient, val["cli"]).open_sftp()
+                val["sftp"] = sftp
+    return cast(paramiko.SFTPClient, sftp)
+
+
 def open_sftp(container: VMRecord):
-    val = cache_ssh_and_sftp(container)
-    return cast(paramiko.SFTPClient, val["sftp"])
+    return _lazy_sftp(cache_ssh_and_sftp(container))
 
 
 def open_ssh_and_sftp(container: VMRecord):
     val = cache_ssh_and_sftp(container)
-    sftp = cast(paramiko.SFTPClient, val["sftp"])
+    sftp = _lazy_sftp(val)
     cli = cast(paramiko.SSHClient, val["cli"])
     return sftp, cli
 
@@ -303,7 +409,7 @@ def generate_console(container: VMRecord):
             pass
         raise
 
-    chan = cli.invoke_shell(width=120, height=32)
+    chan = _invoke_shell(cli)
     # Small timeout (not 0.0): recv() blocks until data arrives (zero added latency)
     # and only wakes periodically to honor shutdown, instead of busy-polling.
     chan.settimeout(0.2)
@@ -7,28 +7,31 @@ Two SSH "lanes" coexist per VM:
 - Every other operation — the AI agent's read/grep/edit/exec, the editor's file
   ops, background-process control — **borrows** a connection from this bounded
   per-VM pool, uses it EXCLUSIVELY for the duration of one operation, and returns
-  it. A borrowed connection carries its own SFTP client, so concurrent operations
+  it. A borrowed connection carries its own SFTP client (opened on first use, so
+  exec-only operations never pay for the subsystem), so concurrent operations
   (e.g. the agent grepping while the editor reads a file) never race the same
   SFTP client and never serialize behind a single lock. The pool is capped per VM
-  (``_POOL_SIZE``), so the VM sshd's ``MaxSessions`` can't be exhausted — and exec
-  channels are still closed promptly by ``exec_and_close``.
+  (``settings.VM_SSH_POOL_SIZE``), so the VM sshd's ``MaxSessions`` can't be
+  exhausted — and exec channels are still closed promptly by ``exec_and_close``.
 
 The pool lives in-process (vm_service is a single process); connections are real
 paramiko TCP sockets and cannot be shared across processes or stored in Redis.
+Connections left idle for ``_IDLE_TIMEOUT_S`` are closed the next time the pool is
+touched, so a VM nobody is using does not keep sshd sessions open forever.
 """
 
 from __future__ import annotations
 
 import threading
+import time
 from contextlib import contextmanager
 from typing import Any, Iterator
 
+import settings
 from .ssh_cache import _connect, assert_vm_identity
 
-# Max concurrent borrowed connections per VM. Each is independent (own channels +
-# own SFTP), so this bounds channels-per-VM well under the sshd MaxSessions while
-# still allowing the agent and the editor to work the same VM in parallel.
-_POOL_SIZE = 4
+# Idle connections older than this are closed instead of reused.
+_IDLE_TIMEOUT_S = 60.0
 
 _idle: dict[str, list["_Conn"]] = {}
 _sems: dict[str, threading.BoundedSemaphore] = {}
@@ -36,22 +39,44 @@ _guard = threading.Lock()
 
 
 class _Conn:
-    __slots__ = ("cli", "sftp")
+    __slots__ = ("cli", "_sftp", "last_used")
 
-    def __init__(self, cli: Any, sftp: Any) -> None:
+    def __init__(self, cli: Any) -> None:
         self.cli = cli
-        self.sftp = sftp
+        self._sftp: Any = None
+        self.last_used = 0.0
+
+    @property
+    def sftp(self) -> Any:
+        if self._sftp is None:
+            self._sftp = self.cli.open_sftp()
+        return self._sftp
 
 
 def _sem(vm_id: str) -> threading.BoundedSemaphore:
     with _guard:
         s = _sems.get(vm_id)
         if s is None:
-            s = threading.BoundedSemaphore(_POOL_SIZE)
+            # Max concurrent borrowed connections for this VM, read when its pool
+            # is first used. Each is independent (own channels + own SFTP), so
+            # this bounds channels-per-VM under the sshd MaxSessions while still
+            # letting the agent and the editor work the same VM in parallel.
+            s = threading.BoundedSemaphore(settings.VM_SSH_POOL_SIZE)
             _sems[vm_id] = s
         return s
 
 
+def _reap_idle(now: float) -> "list[_Conn]":
+    """Pop every idle connection past ``_IDLE_TIMEOUT_S``. Caller holds ``_guard``."""
+    expired: list[_Conn] = []
+    for vm_id, idle in list(_idle.items()):
+        keep = [c for c in idle if now - c.last_used < _IDLE_TIMEOUT_S]
+        if len(keep) != len(idle):
+            expired.extend(c for c in idle if now - c.last_used >= _IDLE_TIMEOUT_S)
+            _idle[vm_id] = keep
+    return expired
+
+
 def _alive(conn: "_Conn") -> bool:
     try:
         t = conn.cli.get_transport()
@@ -61,7 +86,7 @@ def _alive(conn: "_Conn") -> bool:
 
 
 def _close(conn: "_Conn") -> None:
-    for obj in (getattr(conn, "sftp", None), getattr(conn, "cli", None)):
+    for obj in (getattr(conn, "_sftp", None), getattr(conn, "cli", None)):
         try:
             if obj is not None:
                 obj.close()
@@ -73,7 +98,7 @@ def _close(conn: "_Conn") -> None:
 def borrow(container: Any) -> Iterator["_Conn"]:
     """Borrow an SSH connection (cli + sftp) for one VM operation.
 
-    Blocks if all ``_POOL_SIZE`` connections for this VM are in use. A healthy
+    Blocks if all ``VM_SSH_POOL_SIZE`` connections for this VM are in use. A healthy
     connection is returned to the pool on success; a connection whose operation
     raised (or that died) is closed and dropped so it never poisons the pool.
     """
@@ -84,14 +109,17 @@ def borrow(container: Any) -> Iterator["_Conn"]:
     failed = False
     try:
         with _guard:
+            expired = _reap_idle(time.monotonic())
             idle = _idle.get(vm_id)
             conn = idle.pop() if idle else None
+        for stale in expired:
+            _close(stale)
         if conn is not None and not _alive(conn):
             _close(conn)
             conn = None
         if conn is None:
             cli = _connect(container.ssh_port, container.ssh_user)
-            conn = _Conn(cli, cli.open_sftp())
+            conn = _Conn(cli)
             # Fresh connection: confirm the port really hosts THIS vm before use.
             # A mismatch raises; the finally below closes the connection so it never
             # enters the pool and no file/exec op ever lands on the wrong VM.
@@ -102,6 +130,7 @@ def borrow(container: Any) -> Iterator["_Conn"]:
         raise
     finally:
         if conn is not None and not failed and _alive(conn):
+            conn.last_used = time.monotonic()
             with _guard:
                 _idle.setdefault(vm_id, []).append(conn)
         elif conn is not None:
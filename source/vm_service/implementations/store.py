@@ -1,9 +1,16 @@
+import dataclasses
 import json
 import time
 import socket
 from redis.client import Redis
 from models import VMState, VMRecord
 
+_RECONCILED_REASON = "reconciled: ssh port not reachable"
+# json.dumps builds a new JSONEncoder on every call that passes options; one
+# configured encoder is reused instead. (json.loads with no options already
+# reuses a shared decoder.)
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
 
 class RedisStore:
     def __init__(
@@ -11,6 +18,7 @@ class RedisStore:
         url: str | None = None,
         namespace: str = "vmservice",
         provisioning_grace_s: int = 900,  # 15 mins default
+        cache_ttl_s: float = 1.0,
     ) -> None:
         if not url:
             return
@@ -22,6 +30,11 @@ class RedisStore:
         self.ns: str = namespace
         self.ids_key: str = f"{self.ns}:vms"
         self.provisioning_grace_s: int = provisioning_grace_s
+        # Write-through cache in front of get(): nearly every /vms request starts
+        # with one, and within the TTL it skips the Redis GET, the JSON decode and
+        # the SSH liveness probe of _reconcile. Refreshed by put/mget/all.
+        self.cache_ttl_s: float = cache_ttl_s
+        self._cache: dict[str, tuple[float, VMRecord]] = {}
 
     # ---- Keys ----
     def _key(self, vm_id: str) -> str:
@@ -91,67 +104,113 @@ class RedisStore:
         except Exception:
             return False
 
-    def _reconcile(self, vm: VMRecord):
-        if (
+    def _ssh_dead(self, vm: VMRecord) -> bool:
+        return (
             vm.state == VMState.running
             and vm.ssh_port is not None
             and not self._ssh_alive(vm.ssh_port)
-        ):
-            self.set_status(
-                vm, VMState.stopped, error_reason="reconciled: ssh port not reachable"
-            )
+        )
+
+    def _reconcile(self, vm: VMRecord):
+        if self._ssh_dead(vm):
+            self.set_status(vm, VMState.stopped, error_reason=_RECONCILED_REASON)
         return vm
 
-    # ---- API compatible ----
-    def put(self, vm: VMRecord) -> None:
+    def _load(self, ids: list[str]) -> dict[str, "VMRecord"]:
+        """Fetch ``ids`` with one MGET and reconcile them.
+
+        VMs found dead are written back together in a single pipeline instead of
+        one round-trip each.
+        """
+        vals = self.r.mget([self._key(i) for i in ids])
+        out: dict[str, "VMRecord"] = {}
+        dead: list[VMRecord] = []
+        for i, s in zip(ids, vals):
+            if not s:
+                continue
+            try:
+                vm = self._from_dict(json.loads(s))
+            except Exception:
+                continue
+            if self._ssh_dead(vm):
+                vm.state = VMState.stopped
+                vm.error_reason = _RECONCILED_REASON
+                dead.append(vm)
+            else:
+                self._remember(vm)
+            out[i] = vm
+        if dead:
+            p = self.r.pipeline(transaction=False)
+            for vm in dead:
+                self._queue_put(p, vm)
+            p.execute()
+        return out
+
+    def _remember(self, vm: VMRecord) -> None:
+        # A detached copy: callers mutate the records they get (and the runner
+        # hangs its process handle on them), which must not leak into the cache.
+        self._cache[vm.id] = (time.monotonic(), dataclasses.replace(vm, proc=None))
+
+    def _queue_put(self, p, vm: VMRecord) -> None:
         vm.updated_at = time.time()
+        self._remember(vm)
         data = self._to_dict(vm)
-        key = self._key(vm.id)
-        p = self.r.pipeline()
-        p.set(key, json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        p.set(self._key(vm.id), _encode(data))
         p.sadd(self.ids_key, vm.id)
+
+    # ---- API compatible ----
+    def put(self, vm: VMRecord) -> None:
+        # Both writes are idempotent, so no MULTI/EXEC around them: a reader that
+        # lands in between at worst misses a just-created VM for one call.
+        p = self.r.pipeline(transaction=False)
+        self._queue_put(p, vm)
         p.execute()
 
     def get(self, vm_id: str):
+        hit = self._cache.get(vm_id)
+        if hit is not None and time.monotonic() - hit[0] < self.cache_ttl_s:
+            return dataclasses.replace(hit[1])
         s = self.r.get(self._key(vm_id))
         if s is None:
+            self._cache.pop(vm_id, None)
             raise KeyError(vm_id)
         # pyrefly: ignore  # bad-argument-type
         vm = self._from_dict(json.loads(s))
+        self._remember(vm)
         return self._reconcile(vm)
 
+    def mget(self, vm_ids: list[str]) -> dict[str, "VMRecord"]:
+        """Fetch several VMs in one round-trip; unknown ids are simply absent."""
+        wanted = list(dict.fromkeys(vm_ids))
+        if not wanted:
+            return {}
+        # Fresh cache entries are answered locally; only the rest go to Redis.
+        now = time.monotonic()
+        cached: dict[str, VMRecord] = {}
+        for i in wanted:
+            hit = self._cache.get(i)
+            if hit is not None and now - hit[0] < self.cache_ttl_s:
+                cached[i] = dataclasses.replace(hit[1])
+        missing = [i for i in wanted if i not in cached]
+        loaded = self._load(missing) if missing else {}
+        out: dict[str, "VMRecord"] = {}
+        for i in wanted:
+            vm = cached.get(i) or loaded.get(i)
+            if vm is not None:
+                out[i] = vm
+        return out
+
     def all(self) -> dict[str, "VMRecord"]:
         ids = self.r.smembers(self.ids_key)
         if not ids:
             return {}
-        p = self.r.pipeline()
         # pyrefly: ignore  # no-matching-overload
-        ordered = sorted(ids)
-        for i in ordered:
-            p.get(self._key(i))
-        vals = p.execute()
-        out: dict[str, "VMRecord"] = {}
-        for i, s in zip(ordered, vals):
-            if not s:
-                continue
-            try:
-                vm = self._from_dict(json.loads(s))
-                out[i] = self._reconcile(vm)
-            except Exception:
-                continue
-        return out
+        return self._load(sorted(ids))
 
     def reconcile_all(self) -> int:
         """Call this when service start to autohealth the catalog..."""
-        cnt = 0
-        # pyrefly: ignore  # no-matching-overload
-        for vid in list(self.r.smembers(self.ids_key)):
-            try:
-                _ = self.get(vid)
-                cnt += 1
-            except KeyError:
-                continue
-        return cnt
+        # Ids whose record is gone are skipped, so only existing VMs are counted.
+        return len(self.all())
 
     def set_status(
         self,
@@ -11,25 +11,25 @@ from fastapi import (
     WebSocketDisconnect,
 )
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import settings
 from models import (
     VMState,
     VMRecord,
 )
-from implementations import (
-    RedisStore,
-    TTYBridge,
-    Runner,
-)
+from implementations import TTYBridge
 
+from middleware import BearerAuthMiddleware, document_bearer_auth
 from routes import vms_router
 
-
-store = RedisStore(settings.REDIS_URL, settings.REDIS_PREFIX)
-runner = Runner(store, settings.NODE_NAME)
+# The same store and runner as the REST routes, so the terminal sees the records
+# the routes just wrote (the store caches them in process).
+from routes.vms import store, runner
 
 # ===== FastAPI app =====
 app = FastAPI(title="vm-service", version="0.1.0")
+app.add_middleware(BearerAuthMiddleware, prefix="/vms")
+document_bearer_auth(app, prefix="/vms")
 
 
 @app.get("/health")
@@ -62,7 +62,10 @@ async def tty_ws(websocket: WebSocket, vm_id: str):
     print("Initiating ws...")
     await websocket.accept()
     try:
-        vm: "VMRecord" = store.get(vm_id)
+        # store.get blocks on Redis and, on a cache miss, an SSH liveness probe;
+        # run it on the threadpool (like the plain-def REST routes) so it doesn't
+        # stall the loop that serves every open terminal.
+        vm: "VMRecord" = await run_in_threadpool(store.get, vm_id)
     except KeyError:
         await websocket.send_text("VM not found")
         await websocket.close()
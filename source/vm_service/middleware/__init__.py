@@ -1,3 +1,3 @@
-from .security import verify_bearer_token
+from .security import BearerAuthMiddleware, document_bearer_auth
 
-__all__ = ["verify_bearer_token"]
+__all__ = ["BearerAuthMiddleware", "document_bearer_auth"]
@@ -1,30 +1,97 @@
-from fastapi import (
-    HTTPException,
-    Security,
-)
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import functools
+import hmac
+from typing import Any
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 import settings
 
-bearer_scheme = HTTPBearer(auto_error=False)
+# Built once: the responses never vary, and a Response is a reusable ASGI app
+# (headers and body are rendered up front).
+_UNAUTH_RESPONSE = JSONResponse(
+    {"detail": "Not authenticated"},
+    status_code=401,
+    headers={"WWW-Authenticate": "Bearer"},
+)
+_FORBIDDEN_RESPONSE = JSONResponse({"detail": "Invalid token"}, status_code=403)
+
+
+@functools.lru_cache(maxsize=1)
+def _expected_token(token: str) -> bytes:
+    # Keyed on the configured value, so it is encoded once yet still follows a
+    # changed settings.AUTH_TOKEN (tests monkeypatch it).
+    return token.encode("utf-8")
+
+
+def _bearer_token(headers: list[tuple[bytes, bytes]]) -> bytes | None:
+    """The token of an ``Authorization: Bearer <token>`` header, else ``None``."""
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.partition(b" ")
+            if token and scheme.lower() == b"bearer":
+                return token
+            return None
+    return None
+
+
+class BearerAuthMiddleware:
+    """Check the bearer token of every HTTP request under ``prefix``.
+
+    Plain ASGI middleware rather than a router dependency: the raw header bytes are
+    checked straight from the scope, so authenticated requests skip FastAPI's
+    dependency solver and rejected ones never reach routing. Other paths
+    (``/health``, the docs) and websockets (the terminal) pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, prefix: str = "/vms") -> None:
+        self.app = app
+        self.prefix = prefix.rstrip("/")
+
+    def _protected(self, path: str) -> bool:
+        return path == self.prefix or path.startswith(self.prefix + "/")
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._protected(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        token = _bearer_token(scope["headers"])
+        if token is None:
+            await _UNAUTH_RESPONSE(scope, receive, send)
+            return
+        # Constant time: how long the check takes must not tell how much of a
+        # guessed token was right.
+        if not hmac.compare_digest(token, _expected_token(settings.AUTH_TOKEN)):
+            await _FORBIDDEN_RESPONSE(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
 
-def _unauthorized() -> HTTPException:
-    return HTTPException(
-        status_code=401,
-        detail="Not authenticated",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
 
+def document_bearer_auth(app: FastAPI, prefix: str = "/vms") -> None:
+    """Declare the middleware's bearer auth in ``app``'s OpenAPI schema.
 
-def _forbidden() -> HTTPException:
-    return HTTPException(status_code=403, detail="Invalid token")
+    A middleware is invisible to FastAPI's schema generation, unlike the old
+    ``HTTPBearer`` dependency, so the same ``HTTPBearer`` scheme is added by hand
+    to every operation under ``prefix`` (docs and generated clients send it).
+    """
+    prefix = prefix.rstrip("/")
+    build = app.openapi
 
+    def openapi() -> dict[str, Any]:
+        if app.openapi_schema is not None:
+            return app.openapi_schema
+        schema: dict[str, Any] = build()
+        components = schema.setdefault("components", {})
+        components.setdefault("securitySchemes", {})["HTTPBearer"] = {
+            "type": "http",
+            "scheme": "bearer",
+        }
+        for path, item in schema.get("paths", {}).items():
+            if path == prefix or path.startswith(prefix + "/"):
+                for operation in item.values():
+                    operation["security"] = [{"HTTPBearer": []}]
+        app.openapi_schema = schema
+        return schema
 
-async def verify_bearer_token(
-    credentials: HTTPAuthorizationCredentials | None = Security(bearer_scheme),
-) -> None:
-    if not credentials or credentials.scheme.lower() != "bearer":
-        raise _unauthorized()
-    token = credentials.credentials
-    if token != settings.AUTH_TOKEN:
-        raise _forbidden()
+    # pyrefly: ignore  # bad-assignment
+    app.openapi = openapi
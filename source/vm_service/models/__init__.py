@@ -14,6 +14,7 @@ from .control import (
     ListDirItem,
     ElementResponse,
     FileContent,
+    ConsoleTail,
     SearchRequest,
     SearchHit,
     VMFile,
@@ -45,6 +46,7 @@ __all__ = [
     "ListDirItem",
     "ElementResponse",
     "FileContent",
+    "ConsoleTail",
     "SearchRequest",
     "SearchHit",
     "VMFile",
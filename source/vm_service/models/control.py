@@ -38,8 +38,22 @@ class FileContent(BaseModel):
     found: bool
 
 
+class ConsoleTail(BaseModel):
+    log: str
+    found: bool
+
+
 class SearchRequest(BaseModel):
-    pattern: str = Field(..., description="Text/regex pattern to search with grep.")
+    pattern: str = Field(
+        ...,
+        description=(
+            "Extended regex (ripgrep syntax, or POSIX ERE via grep -E when the VM "
+            "has no rg); a literal string with fixed_strings."
+        ),
+    )
+    fixed_strings: bool = Field(
+        False, description="Match the pattern literally (-F) instead of as a regex."
+    )
     root: str = Field("/app", description="Root directory where the search starts.")
     case_insensitive: bool = Field(False, description="Use -i flag in grep.")
     include_globs: list[str] = Field(
@@ -55,6 +69,10 @@ class SearchRequest(BaseModel):
     timeout_seconds: int = Field(
         10, description="Timeout for the SSH channel in seconds."
     )
+    compress: bool = Field(
+        False,
+        description="Gzip the output inside the VM to send fewer bytes over SSH.",
+    )
 
 
 class SearchHit(BaseModel):
@@ -15,7 +15,7 @@ if TYPE_CHECKING:
     from implementations import Runner
 
 
-@dataclass
+@dataclass(slots=True)
 class VMProc:
     """
     Lightweight handle to a running (or reattached) QEMU VM.
@@ -29,6 +29,9 @@ class VMProc:
     proc: subprocess.Popen[Any] | None = None
     console_log: str | None = None
     pidfile: str | None = None
+    # QEMU's pid as written to `pidfile`, read once when the VM came up so stopping
+    # it does not have to go back to the file.
+    pid: int | None = None
 
 
 class VMState(str, Enum):
@@ -86,7 +89,7 @@ class VMAction(BaseModel):
     cleanup_disks: bool | None = False
 
 
-@dataclass
+@dataclass(slots=True)
 class VMRecord:
     id: str
     state: VMState
@@ -120,7 +123,9 @@ class VMOut(BaseModel):
     @staticmethod
     # pyrefly: ignore  # unknown-name
     def from_record(vm: "VMRecord", runner: "Runner") -> "VMOut":
-        return VMOut(
+        # Built from an already-typed VMRecord, so skip pydantic validation; list
+        # endpoints call this once per VM.
+        return VMOut.model_construct(
             id=vm.id,
             state=vm.state,
             node=runner.node_name,
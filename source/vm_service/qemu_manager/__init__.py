@@ -5,19 +5,21 @@ This file allows existing imports to keep working with minimal changes.
 
 from .ports import pick_free_port
 from .crypto import spec_hash, load_pkey
-from .seed import make_overlay, make_seed_iso
+from .seed import make_overlay, make_overlays, make_seed_iso
 from .ssh_ready import wait_ssh
 from .qemu_args import vm_qemu_arm64_args, vm_qemu_x86_args
-from .vm import start_vm
+from .vm import start_vm, tail_file
 
 __all__ = [
     "pick_free_port",
     "spec_hash",
     "load_pkey",
     "make_overlay",
+    "make_overlays",
     "make_seed_iso",
     "wait_ssh",
     "vm_qemu_arm64_args",
     "vm_qemu_x86_args",
     "start_vm",
+    "tail_file",
 ]
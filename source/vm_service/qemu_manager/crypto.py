@@ -1,5 +1,7 @@
+import os
 import json
 import hashlib
+from functools import lru_cache
 
 import paramiko
 
@@ -16,6 +18,26 @@ def spec_hash(user: str, pubkey_path: str) -> str:
 
 
 def load_pkey(path: str):
+    """Load the private key at ``path``, parsed once per (path, mtime).
+
+    ``wait_ssh`` retries the handshake many times per boot and every pooled or
+    terminal connection needs the key too; caching skips re-reading and re-parsing
+    the PEM each time. Rewriting the key file changes its mtime, so a rotated key
+    is picked up on the next call.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return _parse_pkey(path)
+    return _cached_pkey(path, mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _cached_pkey(path: str, mtime_ns: int):
+    return _parse_pkey(path)
+
+
+def _parse_pkey(path: str):
     """Try common private key formats, raising if none match.
 
     Keep the order and exceptions identical to the original implementation.
@@ -0,0 +1,147 @@
+"""
+Pool of pre-created, blank qcow2 overlays.
+
+Booted VMs are already pooled by the orchestrator (``web_service``'s warm pool
+claims a running VM on create). When that pool misses, vm_service still has to
+create the VM's overlay before QEMU can start. A blank overlay over the golden
+image is identical for every VM with the same backing image and disk size, so a
+few spares are created ahead of time under ``VM_BASE_DIR/overlay-pool`` and
+claimed with a single ``rename`` — no ``qemu-img`` on the boot path.
+
+Spares are keyed by (backing image, its mtime, disk size): a rebuilt golden
+gets a fresh bucket, and the next refill deletes the buckets of its older
+versions. Off unless ``settings.VM_OVERLAY_POOL_SIZE`` > 0.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+
+import settings
+
+from .seed import make_overlays
+
+# One refill lock per bucket: refills of the same bucket skip each other, but a
+# refill of one size never blocks (or skips) another's.
+_refill_locks: dict[str, threading.Lock] = {}
+_guard = threading.Lock()
+
+
+def _target() -> int:
+    try:
+        return max(0, int(getattr(settings, "VM_OVERLAY_POOL_SIZE", 0) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _bucket(base_image: str, disk_gib: int) -> str | None:
+    """Directory holding spares for this backing image + size, or None if unknown."""
+    try:
+        mtime = os.stat(base_image).st_mtime_ns
+    except OSError:
+        return None
+    # "<image>-<mtime>-<size>": buckets of one image share a prefix, so a refill
+    # can tell the stale versions apart from the other sizes of the current one.
+    image = hashlib.sha256(base_image.encode()).hexdigest()[:16]
+    return os.path.join(
+        settings.VM_BASE_DIR, "overlay-pool", f"{image}-{mtime}-{int(disk_gib)}"
+    )
+
+
+def _prune_stale(bucket: str) -> None:
+    """Delete sibling buckets made for an older version of the same image."""
+    root, name = os.path.split(bucket)
+    image, mtime, _size = name.split("-")
+    for other in os.listdir(root):
+        parts = other.split("-")
+        # Only older versions: a refill that raced a golden rebuild (and computed
+        # the previous mtime) must not wipe the new buckets.
+        if len(parts) == 3 and parts[0] == image and int(parts[1]) < int(mtime):
+            shutil.rmtree(os.path.join(root, other), ignore_errors=True)
+
+
+def _refill_lock(bucket: str) -> threading.Lock:
+    with _guard:
+        lock = _refill_locks.get(bucket)
+        if lock is None:
+            lock = _refill_locks[bucket] = threading.Lock()
+        return lock
+
+
+def _refill(bucket: str, base_image: str, disk_gib: int, target: int) -> None:
+    lock = _refill_lock(bucket)
+    if not lock.acquire(blocking=False):
+        return  # another refill is already topping this bucket up
+    try:
+        os.makedirs(bucket, exist_ok=True)
+        _prune_stale(bucket)
+        names = os.listdir(bucket)
+        # A .tmp left by a failed or interrupted refill may be half-written:
+        # never promote it, just drop it.
+        _remove([os.path.join(bucket, n) for n in names if n.endswith(".tmp")])
+        have = sum(1 for name in names if name.endswith(".qcow2"))
+        missing = target - have
+        if missing <= 0:
+            return
+        # Build under a temp name and rename, so a claim never sees a half-written disk.
+        tmp = [os.path.join(bucket, f"{uuid.uuid4().hex}.tmp") for _ in range(missing)]
+        try:
+            make_overlays([(base_image, path, disk_gib) for path in tmp])
+        except Exception:
+            _remove(tmp)
+            raise
+        for path in tmp:
+            os.replace(path, path[: -len(".tmp")] + ".qcow2")
+    except Exception as e:
+        print("Error refilling overlay pool", e)
+    finally:
+        lock.release()
+
+
+def _remove(paths: list[str]) -> None:
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def claim_overlay(base_image: str, overlay: str, disk_gib: int) -> bool:
+    """
+    Move a pre-created overlay to ``overlay``; True if one was claimed.
+
+    Either way a background refill is kicked off so the next VM of this size
+    finds a spare. A miss (pool off, empty, or cross-device rename) leaves
+    ``overlay`` untouched for the caller to create as usual.
+    """
+    target = _target()
+    if target <= 0 or os.path.exists(overlay):
+        return False
+    bucket = _bucket(base_image, disk_gib)
+    if bucket is None:
+        return False
+
+    claimed = False
+    try:
+        for name in sorted(os.listdir(bucket)):
+            if not name.endswith(".qcow2"):
+                continue
+            try:
+                os.rename(os.path.join(bucket, name), overlay)
+            except FileNotFoundError:
+                continue  # a concurrent boot took this one
+            claimed = True
+            break
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print("Could not claim a pooled overlay", e)
+
+    threading.Thread(
+        target=_refill, args=(bucket, base_image, disk_gib, target), daemon=True
+    ).start()
+    if claimed:
+        print("Claimed pooled overlay for", overlay)
+    return claimed
@@ -0,0 +1,35 @@
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import Any, Sequence
+
+
+@lru_cache(maxsize=None)
+def _which(name: str) -> str:
+    """Absolute path of ``name`` on PATH (cached), or ``name`` unchanged.
+
+    Paths that already contain a separator are returned as-is. An unresolvable
+    name is kept so the error surfaces from the exec, exactly as before.
+    """
+    if os.sep in name:
+        return name
+    return shutil.which(name) or name
+
+
+def run_checked(cmd: Sequence[str], **kwargs: Any) -> subprocess.CompletedProcess[Any]:
+    """``subprocess.run(cmd, check=True)`` with the executable pre-resolved.
+
+    Helpers like ``qemu-img`` run once or twice per VM boot; resolving them once
+    per process skips the ``execvp`` PATH walk on every launch.
+
+    CPython only launches through ``posix_spawn`` (no ``fork`` of the service's
+    page tables) when the executable is a path and ``close_fds`` is off, so the
+    default is ``close_fds=False``. That does not leak the service's SSH
+    sockets or pidfiles: Python creates every descriptor non-inheritable
+    (PEP 446), and vm_service never marks one inheritable.
+    """
+    argv = list(cmd)
+    argv[0] = _which(argv[0])
+    kwargs.setdefault("close_fds", False)
+    return subprocess.run(argv, check=True, **kwargs)
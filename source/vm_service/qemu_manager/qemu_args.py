@@ -1,11 +1,34 @@
+import functools
+import itertools
+import json
 import os
 import platform
-import glob
+import time
 import shutil
-import subprocess
+import threading
 
 import settings
 
+from .proc import run_checked
+
+
+@functools.lru_cache(maxsize=1)
+def _host_machine() -> str:
+    """``platform.machine()``, looked up once: the host arch can't change at runtime."""
+    return platform.machine()
+
+
+@functools.lru_cache(maxsize=1)
+def _host_system() -> str:
+    """``platform.system()``, looked up once."""
+    return platform.system()
+
+
+@functools.lru_cache(maxsize=1)
+def _kvm_available() -> bool:
+    """Whether ``/dev/kvm`` exists, probed once instead of stat()-ing per VM boot."""
+    return os.path.exists("/dev/kvm")
+
 
 def _first_existing(paths: list[str]) -> str | None:
     """Return the first path that exists from a list of candidates."""
@@ -15,15 +38,66 @@ def _first_existing(paths: list[str]) -> str | None:
     return None
 
 
+# On-disk memo of _qemu_datadir, so a host whose firmware is only found through
+# the datadir heuristic doesn't fork `qemu -help`/`-version` on every VM spawn.
+_DATADIR_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+    "pequeroku",
+    "qemu_datadir.json",
+)
+_DATADIR_CACHE_TTL_S = 24 * 3600
+
+
 def _qemu_datadir(qemu_bin: str) -> str | None:
+    """
+    Cached :func:`_probe_qemu_datadir`.
+
+    Entries are keyed by the binary's path and mtime (a QEMU upgrade invalidates
+    them) and expire after ``_DATADIR_CACHE_TTL_S``. Cache IO errors only cost
+    the probe; they are never raised.
+    """
+    try:
+        st = os.stat(qemu_bin)
+    except OSError:
+        return _probe_qemu_datadir(qemu_bin)
+    return _qemu_datadir_at(qemu_bin, st.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def _qemu_datadir_at(qemu_bin: str, mtime_ns: int) -> str | None:
+    # Memoized in-process on top of the disk cache: same key, so it is only
+    # read (and the JSON parsed) once per binary version.
+    key = f"{qemu_bin}:{mtime_ns}"
+    cache: dict[str, dict[str, object]] = {}
+    try:
+        with open(_DATADIR_CACHE_PATH, encoding="utf-8") as fh:
+            cache = json.load(fh)
+        entry = cache.get(key) or {}
+        if time.time() - float(str(entry.get("at", 0))) < _DATADIR_CACHE_TTL_S:
+            return str(entry.get("datadir") or "") or None
+    except (OSError, ValueError, TypeError, AttributeError):
+        cache = {}
+
+    datadir = _probe_qemu_datadir(qemu_bin)
+    cache[key] = {"datadir": datadir or "", "at": time.time()}
+    try:
+        os.makedirs(os.path.dirname(_DATADIR_CACHE_PATH), exist_ok=True)
+        tmp = f"{_DATADIR_CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(cache, fh)
+        os.replace(tmp, _DATADIR_CACHE_PATH)
+    except OSError as e:
+        print("Could not cache qemu datadir", e)
+    return datadir
+
+
+def _probe_qemu_datadir(qemu_bin: str) -> str | None:
     """
     Try to infer QEMU's datadir (where firmware files usually live).
     Heuristic: parse `qemu-system-aarch64 -help` or `-version` for paths containing 'share/qemu'.
     """
     try:
-        out = subprocess.run(
-            [qemu_bin, "-help"], capture_output=True, text=True, check=True
-        ).stdout
+        out = run_checked([qemu_bin, "-help"], capture_output=True, text=True).stdout
         for line in out.splitlines():
             if "/share/qemu" in line:
                 start = line.find("/")
@@ -35,9 +109,7 @@ def _qemu_datadir(qemu_bin: str) -> str | None:
     except Exception as e:
         print("Error getting qemu_bin help", e)
     try:
-        out = subprocess.run(
-            [qemu_bin, "-version"], capture_output=True, text=True, check=True
-        ).stdout
+        out = run_checked([qemu_bin, "-version"], capture_output=True, text=True).stdout
         for tok in out.split():
             if tok.endswith("/share/qemu") and os.path.isdir(tok):
                 return tok
@@ -46,8 +118,9 @@ def _qemu_datadir(qemu_bin: str) -> str | None:
     return None
 
 
+@functools.lru_cache(maxsize=1)
 def _resolve_qemu_bin_arm64() -> str:
-    """Resolve qemu-system-aarch64 binary path for ARM64 hosts."""
+    """Resolve qemu-system-aarch64 binary path for ARM64 hosts (looked up once)."""
     if settings.VM_QEMU_BIN:
         return settings.VM_QEMU_BIN
     cand = shutil.which("qemu-system-aarch64")
@@ -64,6 +137,21 @@ def _resolve_qemu_bin_arm64() -> str:
     return "qemu-system-aarch64"
 
 
+def _cellar_firmware(cellar: str) -> str | None:
+    """Firmware from the newest-named qemu version in a Homebrew Cellar, if any."""
+    try:
+        with os.scandir(cellar) as it:
+            versions = [e.name for e in it if e.is_dir()]
+    except OSError:
+        return None
+    for version in sorted(versions, reverse=True):
+        cand = os.path.join(cellar, version, "share", "qemu", "edk2-aarch64-code.fd")
+        if os.path.exists(cand):
+            return cand
+    return None
+
+
+@functools.lru_cache(maxsize=1)
 def _find_uefi_firmware_arm64() -> str | None:
     """
     Locate UEFI firmware for QEMU ARM64.
@@ -71,7 +159,11 @@ def _find_uefi_firmware_arm64() -> str | None:
     Priority:
       1. Explicit override via settings.VM_UEFI_ARM64
       2. Known distro-specific paths (Ubuntu, Fedora, Arch, Homebrew, MacPorts)
-      3. Paths discovered from QEMU's datadir
+      3. Versioned Homebrew Cellar installs (newest first)
+      4. Paths discovered from QEMU's datadir
+
+    Resolved once per process. A miss raises, and exceptions are not cached, so
+    firmware installed later is still picked up by the next VM start.
     """
     # 1) explicit override
     override: str | None = getattr(settings, "VM_UEFI_ARM64", None)
@@ -89,20 +181,17 @@ def _find_uefi_firmware_arm64() -> str | None:
         "/opt/local/share/qemu/edk2-aarch64-code.fd",  # MacPorts
     ]
 
-    # Add Homebrew Cellar versioned paths
-    hb_globs = [
-        "/opt/homebrew/Cellar/qemu/*/share/qemu/edk2-aarch64-code.fd",
-        "/usr/local/Cellar/qemu/*/share/qemu/edk2-aarch64-code.fd",
-    ]
-    for pattern in hb_globs:
-        matches = sorted(glob.glob(pattern), reverse=True)
-        candidates[:0] = matches
-
     found = _first_existing(candidates)
     if found:
         return found
 
-    # 3) fallback: QEMU datadir
+    # 3) Homebrew Cellar versioned paths, only listed when no stable path matched
+    for cellar in ("/opt/homebrew/Cellar/qemu", "/usr/local/Cellar/qemu"):
+        found = _cellar_firmware(cellar)
+        if found:
+            return found
+
+    # 4) fallback: QEMU datadir
     qemu_bin = _resolve_qemu_bin_arm64()
     datadir = _qemu_datadir(qemu_bin)
     if datadir:
@@ -121,6 +210,126 @@ def _find_uefi_firmware_arm64() -> str | None:
     )
 
 
+# Next starting index into the affinity mask for "auto" CPU pinning.
+_cpuset_next = 0
+_cpuset_lock = threading.Lock()
+
+
+def _cpu_list(cpus: list[int]) -> str:
+    """Format CPU ids as a taskset -c list, collapsing runs ("0-3,6")."""
+    runs: list[list[int]] = []
+    for cpu in sorted(cpus):
+        if runs and cpu == runs[-1][1] + 1:
+            runs[-1][1] = cpu
+        else:
+            runs.append([cpu, cpu])
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in runs)
+
+
+@functools.lru_cache(maxsize=1)
+def _usable_cpus() -> tuple[int, ...]:
+    """The cores this process may run on, sorted; read once, like the host arch."""
+    if hasattr(os, "sched_getaffinity"):
+        return tuple(sorted(os.sched_getaffinity(0)))
+    return tuple(range(os.cpu_count() or 1))
+
+
+def _auto_cpuset(vcpus: int) -> str:
+    """
+    Next round-robin slice of the host cores for a VM with ``vcpus`` vCPUs.
+
+    Slices are ``max(vcpus, 2)`` cores wide (capped at what we may use) and taken
+    from ``os.sched_getaffinity(0)``, so concurrent VMs land on different cores
+    instead of all contending for the same fixed set.
+    """
+    global _cpuset_next
+    avail = _usable_cpus()
+    width = min(max(int(vcpus), 2), len(avail))
+    with _cpuset_lock:
+        start = _cpuset_next % len(avail)
+        _cpuset_next = start + width
+    return _cpu_list([avail[(start + i) % len(avail)] for i in range(width)])
+
+
+# Fixed argv fragments, built once at import; the builders below only splice the
+# per-VM sizes, port and paths in between them.
+_ARM64_TCG = ("-accel", "tcg,thread=multi", "-cpu", "max", "-machine", "virt")
+_ARM64_HVF = ("-accel", "hvf", "-cpu", "max", "-machine", "virt")
+_ARM64_KVM = (
+    "-accel",
+    "kvm",
+    "-cpu",
+    "host",
+    "-M",
+    "virt-7.1,gic-version=3,its=off",
+)
+_ARM64_NET_DEVICE = ("-device", "virtio-net-device,netdev=n0")
+_ARM64_BLK_ROOT = ("-device", "virtio-blk-device,drive=vd0")
+_ARM64_BLK_SEED = ("-device", "virtio-blk-device,drive=cidata")
+_ARM64_SCSI_CONTROLLER = ("-device", "virtio-scsi-device,id=scsi0")
+_ARM64_SCSI_ROOT = ("-device", "scsi-hd,drive=vd0,bus=scsi0.0")
+_ARM64_SCSI_SEED = ("-device", "scsi-cd,drive=cidata,bus=scsi0.0")
+_ARM64_KVM_DEFAULTS = ("-nodefaults", "-no-user-config")
+
+_X86_KVM = ("-enable-kvm", "-machine", "accel=kvm,type=q35", "-cpu", "host")
+_X86_TCG = ("-machine", "type=q35", "-accel", "tcg,thread=multi", "-cpu", "max")
+_X86_NET_DEVICE = ("-device", "virtio-net-pci,netdev=n0")
+_X86_RNG_DEVICE = ("-device", "virtio-rng-pci")
+
+
+def _netdev(port: int) -> str:
+    return f"user,id=n0,hostfwd=tcp:127.0.0.1:{port}-:22"
+
+
+def _sizes(vcpus: int, mem_mib: int) -> tuple[str, ...]:
+    return ("-smp", str(vcpus), "-m", str(mem_mib))
+
+
+def _root_drive(overlay: str) -> tuple[str, ...]:
+    return ("-drive", f"if=none,format=qcow2,file={overlay},id=vd0")
+
+
+def _seed_drive(seed_iso: str) -> tuple[str, ...]:
+    return ("-drive", f"if=none,format=raw,readonly=on,file={seed_iso},id=cidata")
+
+
+def _pidfile(pidfile: str | None) -> tuple[str, ...]:
+    return ("-pidfile", pidfile) if pidfile else ()
+
+
+def _join(*parts: tuple[str, ...]) -> list[str]:
+    """Flatten argv fragments into the final list in a single pass."""
+    return list(itertools.chain.from_iterable(parts))
+
+
+def _virt_blk(
+    accel: tuple[str, ...],
+    arm_64_bin: str,
+    vcpus: int,
+    mem_mib: int,
+    console_log: str,
+    uefi: str,
+    port: int,
+    overlay: str,
+    seed_iso: str,
+    pidfile: str | None,
+) -> list[str]:
+    """Plain ``virt`` machine with virtio-blk disks (TCG and HVF share it)."""
+    return _join(
+        (arm_64_bin,),
+        accel,
+        _sizes(vcpus, mem_mib),
+        ("-bios", uefi, "-nographic", "-serial", f"file:{console_log}"),
+        ("-netdev", _netdev(port)),
+        _ARM64_NET_DEVICE,
+        _root_drive(overlay),
+        _ARM64_BLK_ROOT,
+        _pidfile(pidfile),
+        _seed_drive(seed_iso) if seed_iso else (),
+        _ARM64_BLK_SEED if seed_iso else (),
+    )
+
+
 def _no_kvm(
     arm_64_bin: str,
     vcpus: int,
@@ -132,43 +341,18 @@ def _no_kvm(
     seed_iso: str,
     pidfile: str | None,
 ):
-    args: list[str] = []
-    args += [
+    return _virt_blk(
+        _ARM64_TCG,
         arm_64_bin,
-        "-accel",
-        "tcg,thread=multi",
-        "-cpu",
-        "max",
-        "-machine",
-        "virt",
-        "-smp",
-        str(vcpus),
-        "-m",
-        str(mem_mib),
-        "-bios",
+        vcpus,
+        mem_mib,
+        console_log,
         uefi,
-        "-nographic",
-        "-serial",
-        f"file:{console_log}",
-        "-netdev",
-        f"user,id=n0,hostfwd=tcp:127.0.0.1:{port}-:22",
-        "-device",
-        "virtio-net-device,netdev=n0",
-        "-drive",
-        f"if=none,format=qcow2,file={overlay},id=vd0",
-        "-device",
-        "virtio-blk-device,drive=vd0",
-    ]
-    if pidfile:
-        args += ["-pidfile", pidfile]
-    if seed_iso:
-        args += [
-            "-drive",
-            f"if=none,format=raw,readonly=on,file={seed_iso},id=cidata",
-            "-device",
-            "virtio-blk-device,drive=cidata",
-        ]
-    return args
+        port,
+        overlay,
+        seed_iso,
+        pidfile,
+    )
 
 
 def _kvm(
@@ -182,52 +366,31 @@ def _kvm(
     seed_iso: str,
     pidfile: str | None,
 ):
-    args: list[str] = []
     # Optional CPU pinning. Off by default; set settings.VM_TASKSET_CPUS (taskset
-    # -c syntax, e.g. "0-3") to confine QEMU to specific cores for NUMA/isolation.
+    # -c syntax, e.g. "0-3") to confine QEMU to specific cores for NUMA/isolation,
+    # or "auto" to spread VMs round-robin over the cores this process may use.
     cpus = (getattr(settings, "VM_TASKSET_CPUS", "") or "").strip()
+    if cpus.lower() == "auto":
+        cpus = _auto_cpuset(vcpus)
+    taskset: tuple[str, ...] = ()
     if cpus and shutil.which("taskset"):
-        args += ["taskset", "-c", cpus]
-    args += [
-        arm_64_bin,
-        "-accel",
-        "kvm",
-        "-cpu",
-        "host",
-        "-M",
-        "virt-7.1,gic-version=3,its=off",
-        "-smp",
-        str(vcpus),
-        "-m",
-        str(mem_mib),
-        "-nographic",
-        "-serial",
-        f"file:{console_log}",
-        "-bios",
-        uefi,
-        "-nodefaults",
-        "-no-user-config",
-        "-netdev",
-        f"user,id=n0,hostfwd=tcp:127.0.0.1:{port}-:22",
-        "-device",
-        "virtio-net-device,netdev=n0",
-        "-device",
-        "virtio-scsi-device,id=scsi0",
-        "-drive",
-        f"if=none,format=qcow2,file={overlay},id=vd0",
-        "-device",
-        "scsi-hd,drive=vd0,bus=scsi0.0",
-    ]
-    if pidfile:
-        args += ["-pidfile", pidfile]
-    if seed_iso:
-        args += [
-            "-drive",
-            f"if=none,format=raw,readonly=on,file={seed_iso},id=cidata",
-            "-device",
-            "scsi-cd,drive=cidata,bus=scsi0.0",
-        ]
-    return args
+        taskset = ("taskset", "-c", cpus)
+    return _join(
+        taskset,
+        (arm_64_bin,),
+        _ARM64_KVM,
+        _sizes(vcpus, mem_mib),
+        ("-nographic", "-serial", f"file:{console_log}", "-bios", uefi),
+        _ARM64_KVM_DEFAULTS,
+        ("-netdev", _netdev(port)),
+        _ARM64_NET_DEVICE,
+        _ARM64_SCSI_CONTROLLER,
+        _root_drive(overlay),
+        _ARM64_SCSI_ROOT,
+        _pidfile(pidfile),
+        _seed_drive(seed_iso) if seed_iso else (),
+        _ARM64_SCSI_SEED if seed_iso else (),
+    )
 
 
 def _hvf(
@@ -242,43 +405,25 @@ def _hvf(
     pidfile: str | None,
 ):
     # For mac
-    args: list[str] = []
-    args += [
+    return _virt_blk(
+        _ARM64_HVF,
         arm_64_bin,
-        "-accel",
-        "hvf",
-        "-cpu",
-        "max",
-        "-machine",
-        "virt",
-        "-smp",
-        str(vcpus),
-        "-m",
-        str(mem_mib),
-        "-bios",
+        vcpus,
+        mem_mib,
+        console_log,
         uefi,
-        "-nographic",
-        "-serial",
-        f"file:{console_log}",
-        "-netdev",
-        f"user,id=n0,hostfwd=tcp:127.0.0.1:{port}-:22",
-        "-device",
-        "virtio-net-device,netdev=n0",
-        "-drive",
-        f"if=none,format=qcow2,file={overlay},id=vd0",
-        "-device",
-        "virtio-blk-device,drive=vd0",
-    ]
-    if pidfile:
-        args += ["-pidfile", pidfile]
-    if seed_iso:
-        args += [
-            "-drive",
-            f"if=none,format=raw,readonly=on,file={seed_iso},id=cidata",
-            "-device",
-            "virtio-blk-device,drive=cidata",
-        ]
-    return args
+        port,
+        overlay,
+        seed_iso,
+        pidfile,
+    )
+
+
+_ARM64_BUILDERS = {
+    "kvm": ("Using KVM", _kvm),
+    "hvf": ("Using HVF", _hvf),
+    "tcg": ("Not using KVM", _no_kvm),
+}
 
 
 def vm_qemu_arm64_args(
@@ -301,54 +446,35 @@ def vm_qemu_arm64_args(
     if not bool(arm_64_bin):
         raise FileNotFoundError("Not valid QEMU bin for arm64")
 
-    args: list[str] = []
+    # Darwin can only be HVF, so it is settled before any /dev/kvm probe; the KVM
+    # check only runs for Linux on an arm host.
+    sysname = _host_system()
+    if sysname == "Darwin":
+        accel = "hvf"
+    elif (
+        sysname == "Linux"
+        and _host_machine() in ("aarch64", "arm64")
+        and _kvm_available()
+    ):
+        accel = "kvm"
+    else:
+        accel = "tcg"
 
-    use_kvm = os.path.exists("/dev/kvm") and platform.machine() in ("aarch64", "arm64")
-    use_hvf = platform.system() == "Darwin"
+    print(f"[qemu] Using bin: {arm_64_bin}  using uefi: {uefi}  accel:{accel}")
 
-    print(
-        f"[qemu] Using bin: {arm_64_bin}  using uefi: {uefi}  kvm:{use_kvm}  hvf:{use_hvf}"
+    message, build = _ARM64_BUILDERS[accel]
+    print(message)
+    args = build(
+        arm_64_bin,
+        vcpus,
+        mem_mib,
+        console_log,
+        uefi,
+        port,
+        overlay,
+        seed_iso,
+        pidfile,
     )
-
-    if use_kvm:
-        print("Using KVM")
-        args += _kvm(
-            arm_64_bin,
-            vcpus,
-            mem_mib,
-            console_log,
-            uefi,
-            port,
-            overlay,
-            seed_iso,
-            pidfile,
-        )
-    elif use_hvf:
-        print("Using HVF")
-        args += _hvf(
-            arm_64_bin,
-            vcpus,
-            mem_mib,
-            console_log,
-            uefi,
-            port,
-            overlay,
-            seed_iso,
-            pidfile,
-        )
-    else:
-        print("Not using KVM")
-        args += _no_kvm(
-            arm_64_bin,
-            vcpus,
-            mem_mib,
-            console_log,
-            uefi,
-            port,
-            overlay,
-            seed_iso,
-            pidfile,
-        )
     print(args)
     return args
 
@@ -365,37 +491,27 @@ def vm_qemu_x86_args(
     """
     Build QEMU args for x86 hosts; writes serial output to console_log.
     """
-    args: list[str] = [settings.VM_QEMU_BIN]
-    if os.path.exists("/dev/kvm"):
+    if _kvm_available():
         print("Using KVM")
-        args += ["-enable-kvm", "-machine", "accel=kvm,type=q35", "-cpu", "host"]
+        accel = _X86_KVM
     else:
         print("Not using KVM")
-        args += ["-machine", "type=q35", "-accel", "tcg,thread=multi", "-cpu", "max"]
-
-    args += [
-        "-smp",
-        str(vcpus),
-        "-m",
-        str(mem_mib),
-        "-display",
-        "none",
-        "-serial",
-        f"file:{console_log}",
-        "-device",
-        "virtio-net-pci,netdev=n0",
-        "-netdev",
-        f"user,id=n0,hostfwd=tcp:127.0.0.1:{port}-:22",
-        "-device",
-        "virtio-rng-pci",
-        "-drive",
-        f"if=virtio,format=qcow2,file={overlay}",
-    ]
-
-    # Cloud-init seed is optional: pre-baked golden images don't need it.
-    if seed_iso:
-        args += ["-drive", f"if=virtio,format=raw,readonly=on,file={seed_iso}"]
-
-    if pidfile:
-        args += ["-pidfile", pidfile]
-    return args
+        accel = _X86_TCG
+
+    return _join(
+        (settings.VM_QEMU_BIN,),
+        accel,
+        _sizes(vcpus, mem_mib),
+        ("-display", "none", "-serial", f"file:{console_log}"),
+        _X86_NET_DEVICE,
+        ("-netdev", _netdev(port)),
+        _X86_RNG_DEVICE,
+        ("-drive", f"if=virtio,format=qcow2,file={overlay}"),
+        # Cloud-init seed is optional: pre-baked golden images don't need it.
+        (
+            ("-drive", f"if=virtio,format=raw,readonly=on,file={seed_iso}")
+            if seed_iso
+            else ()
+        ),
+        _pidfile(pidfile),
+    )
@@ -1,42 +1,48 @@
 import json
 import os
+import shlex
 import shutil
+import string
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import settings
 
 from .crypto import spec_hash
+from .proc import run_checked
+
+# Virtual size of backing images, keyed by (path, mtime_ns). The golden image is
+# shared by every VM, so `qemu-img info` only needs to run once per image version
+# instead of once per overlay.
+_virtual_size_cache: dict[tuple[str, int], int] = {}
 
 
 def _virtual_size_bytes(image: str) -> int | None:
     """Virtual size of an image in bytes, or None if it can't be read."""
     try:
-        out = subprocess.run(
+        key: tuple[str, int] | None = (image, os.stat(image).st_mtime_ns)
+    except OSError:
+        key = None
+    if key is not None and key in _virtual_size_cache:
+        return _virtual_size_cache[key]
+    try:
+        out = run_checked(
             ["qemu-img", "info", "--output=json", image],
-            check=True,
             capture_output=True,
             text=True,
         )
-        return int(json.loads(out.stdout)["virtual-size"])
+        size = int(json.loads(out.stdout)["virtual-size"])
     except Exception as e:
         print("Could not read virtual size of", image, e)
         return None
+    if key is not None:
+        _virtual_size_cache[key] = size
+    return size
 
 
-def make_overlay(base_image: str, overlay: str, disk_gib: int) -> None:
-    """
-    Create a qcow2 overlay disk if it doesn't already exist.
-
-    The overlay is floored to the backing image's virtual size: a qcow2 overlay
-    must never be smaller than its backing image. The backing's partition table
-    references blocks past a too-small overlay's end, so the root partition (and
-    its PARTUUID) is truncated and the guest can't boot ("PARTUUID ... does not
-    exist"). Larger is fine — the extra space stays unallocated until growpart.
-    """
-    print("Creating the overlay with: ", base_image, overlay, disk_gib)
-    if os.path.exists(overlay):
-        return
-
+def _overlay_size_bytes(base_image: str, disk_gib: int) -> int:
+    """Requested overlay size, floored to the backing image's virtual size."""
     size_bytes = int(disk_gib) * 1024**3
     backing_bytes = _virtual_size_bytes(base_image)
     if backing_bytes is not None and backing_bytes > size_bytes:
@@ -46,8 +52,11 @@ def make_overlay(base_image: str, overlay: str, disk_gib: int) -> None:
             "backing size so the guest can boot."
         )
         size_bytes = backing_bytes
+    return size_bytes
 
-    args = [
+
+def _overlay_args(base_image: str, overlay: str, size_bytes: int) -> list[str]:
+    return [
         "qemu-img",
         "create",
         "-f",
@@ -59,51 +68,69 @@ def make_overlay(base_image: str, overlay: str, disk_gib: int) -> None:
         overlay,
         str(size_bytes),
     ]
+
+
+def make_overlay(base_image: str, overlay: str, disk_gib: int) -> None:
+    """
+    Create a qcow2 overlay disk if it doesn't already exist.
+
+    The overlay is floored to the backing image's virtual size: a qcow2 overlay
+    must never be smaller than its backing image. The backing's partition table
+    references blocks past a too-small overlay's end, so the root partition (and
+    its PARTUUID) is truncated and the guest can't boot ("PARTUUID ... does not
+    exist"). Larger is fine — the extra space stays unallocated until growpart.
+    """
+    print("Creating the overlay with: ", base_image, overlay, disk_gib)
+    if os.path.exists(overlay):
+        return
+
+    args = _overlay_args(base_image, overlay, _overlay_size_bytes(base_image, disk_gib))
     print(args)
 
     try:
-        _ = subprocess.run(
-            args,
-            check=True,
-        )
+        _ = run_checked(args)
     except subprocess.CalledProcessError as e:
         print("Command failed with error:", e)
 
 
-def make_seed_iso(seed_iso: str, user: str, pubkey_path: str, instance_id: str) -> None:
+def make_overlays(specs: list[tuple[str, str, int]]) -> None:
     """
-    Create (or reuse) a cloud-init seed ISO with user+root SSH access and Docker setup.
+    Create several overlays ``(base_image, overlay, disk_gib)`` in one go.
 
-    NOTE: This intentionally preserves the original behavior, including:
-      - Spec hash based on (user, pubkey contents)
-      - Inline use of settings.VM_SSH_USER inside cloud-config
-      - Same packages and runcmd steps (root login allowed; /app perms 0777)
+    Same sizing rules as :func:`make_overlay`, but every missing overlay is
+    created by a single ``sh -c`` invocation, so bulk provisioning pays for one
+    subprocess launch instead of one per disk. Existing overlays are skipped.
+
+    The script stops at the first failing ``qemu-img`` and raises
+    ``CalledProcessError``; overlays created before it are left in place.
     """
-    print("Creating the seed iso: ", seed_iso, user, pubkey_path, instance_id)
-    spec_path = seed_iso + ".spec"
-    want = spec_hash(user, pubkey_path)
+    cmds: list[str] = []
+    for base_image, overlay, disk_gib in specs:
+        if os.path.exists(overlay):
+            continue
+        size_bytes = _overlay_size_bytes(base_image, disk_gib)
+        cmds.append(shlex.join(_overlay_args(base_image, overlay, size_bytes)))
+    if not cmds:
+        return
 
-    if os.path.exists(seed_iso) and os.path.exists(spec_path):
-        if open(spec_path, encoding="utf-8").read().strip() == want:
-            print("Already exist the seed_iso")
-            return
+    script = " && ".join(cmds)
+    print("Creating overlays:", script)
+    _ = run_checked(["sh", "-c", script])
 
-    assert os.path.exists(pubkey_path), f"No existe {pubkey_path}"
-    pubkey = open(pubkey_path, encoding="utf-8").read().strip()
 
-    user_data = f"""#cloud-config
+_USER_DATA_TMPL = string.Template("""#cloud-config
 disable_root: false
 ssh_pwauth: false
 
 users:
-  - name: {settings.VM_SSH_USER}   # e.g., ubuntu if you keep using that
+  - name: ${vm_ssh_user}   # e.g., ubuntu if you keep using that
     sudo: ALL=(ALL) NOPASSWD:ALL
     groups: sudo,docker
     ssh_authorized_keys:
-      - {pubkey}
+      - ${pubkey}
   - name: root
     ssh_authorized_keys:
-      - {pubkey}
+      - ${pubkey}
 
 write_files:
   - path: /etc/ssh/sshd_config.d/pequeroku.conf
@@ -113,27 +140,73 @@ write_files:
       PermitRootLogin yes
       PasswordAuthentication no
 
-"""
+""")
+
+# Rendered user-data keyed by (spec hash, VM_SSH_USER): the spec hash already
+# covers the pubkey contents, so a hit skips re-reading the key file too.
+_user_data_cache: dict[tuple[str, str], str] = {}
+
+
+def _user_data(want: str, pubkey_path: str) -> str:
+    key = (want, str(settings.VM_SSH_USER))
+    cached = _user_data_cache.get(key)
+    if cached is not None:
+        return cached
+    with open(pubkey_path, encoding="utf-8") as fh:
+        pubkey = fh.read().strip()
+    rendered = _USER_DATA_TMPL.substitute(
+        vm_ssh_user=settings.VM_SSH_USER, pubkey=pubkey
+    )
+    _user_data_cache[key] = rendered
+    return rendered
+
+
+# Only meta-data (instance-id/hostname) differs between VMs sharing a spec, so a
+# seed ISO is built once per spec with this placeholder and then copied and
+# patched in place per VM. It is as long as any id we stamp; the real id is
+# right-padded with spaces, which YAML strips from plain scalars.
+_INSTANCE_ID_PLACEHOLDER = "@@PEQUEROKU-INSTANCE-ID@@".ljust(64, "@")
 
-    meta_data = f"""instance-id: {instance_id}
+# Byte offsets of the placeholder inside each template ISO, found once.
+_template_offsets: dict[str, list[int]] = {}
+
+
+def _meta_data(instance_id: str) -> str:
+    return f"""instance-id: {instance_id}
 local-hostname: {instance_id}
 """
-    print("Writting spec")
-    open(spec_path, "w", encoding="utf-8").write(want)
 
-    wd = os.path.dirname(seed_iso)
-    ud = os.path.join(wd, "user-data")
-    md = os.path.join(wd, "meta-data")
-    print("writting user_data")
-    open(ud, "w", encoding="utf-8").write(user_data)
-    print("writting metadata")
-    open(md, "w", encoding="utf-8").write(meta_data)
 
+def _write_bytes(path: str, data: bytes) -> None:
+    """Create/truncate ``path`` and write ``data`` with raw fd calls (no buffering)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def _write_files(items: list[tuple[str, bytes]]) -> None:
+    """Write several small files concurrently; re-raises the first failure.
+
+    The seed files are independent, so on slow media their create+write cycles
+    overlap instead of running back to back.
+    """
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        futures = [pool.submit(_write_bytes, path, data) for path, data in items]
+    for fut in futures:
+        fut.result()
+
+
+def _build_iso(seed_iso: str, ud: str, md: str) -> None:
+    """Pack user-data/meta-data into a cidata ISO with cloud-localds or genisoimage."""
     cloud_localds = shutil.which("cloud-localds")
     geniso = shutil.which("genisoimage") or shutil.which("mkisofs")
     if cloud_localds:
         print("Using cloud localds")
-        _ = subprocess.run([cloud_localds, seed_iso, ud, md], check=True)
+        _ = run_checked([cloud_localds, seed_iso, ud, md])
     else:
         print("Using geniso image")
         input_data = [
@@ -147,5 +220,115 @@ local-hostname: {instance_id}
             ud,
             md,
         ]
-        # pyrefly: ignore  # no-matching-overload
-        subprocess.run(input_data, check=True)
+        # pyrefly: ignore  # bad-argument-type
+        _ = run_checked(input_data)
+
+
+def _seed_template(want: str, user_data: str) -> str:
+    """Path of the placeholder seed ISO for spec ``want``, building it once."""
+    tdir = os.path.join(settings.VM_BASE_DIR, "seed-templates")
+    template = os.path.join(tdir, f"{want}.iso")
+    if os.path.exists(template):
+        return template
+
+    os.makedirs(tdir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=tdir) as tmp:
+        ud = os.path.join(tmp, "user-data")
+        md = os.path.join(tmp, "meta-data")
+        _write_files(
+            [
+                (ud, user_data.encode()),
+                (md, _meta_data(_INSTANCE_ID_PLACEHOLDER).encode()),
+            ]
+        )
+        built = os.path.join(tmp, "seed.iso")
+        _build_iso(built, ud, md)
+        # Atomic publish: concurrent boots either see no template or a whole one.
+        os.replace(built, template)
+    return template
+
+
+def _stamp_from_template(template: str, seed_iso: str, instance_id: str) -> bool:
+    """Copy ``template`` to ``seed_iso`` and patch the real instance-id in place.
+
+    Returns False (nothing written) when the id doesn't fit the placeholder or
+    the template carries no placeholder, so the caller builds the ISO directly.
+    """
+    placeholder = _INSTANCE_ID_PLACEHOLDER.encode()
+    stamp = instance_id.encode()
+    if len(stamp) > len(placeholder):
+        return False
+
+    offsets = _template_offsets.get(template)
+    if offsets is None:
+        with open(template, "rb") as fh:
+            blob = fh.read()
+        offsets = []
+        pos = blob.find(placeholder)
+        while pos != -1:
+            offsets.append(pos)
+            pos = blob.find(placeholder, pos + len(placeholder))
+        _template_offsets[template] = offsets
+    if not offsets:
+        return False
+
+    # copyfile uses sendfile() on Linux: the bytes never enter Python.
+    shutil.copyfile(template, seed_iso)
+    stamp = stamp.ljust(len(placeholder), b" ")
+    fd = os.open(seed_iso, os.O_WRONLY)
+    try:
+        for off in offsets:
+            os.pwrite(fd, stamp, off)
+    finally:
+        os.close(fd)
+    return True
+
+
+def make_seed_iso(seed_iso: str, user: str, pubkey_path: str, instance_id: str) -> None:
+    """
+    Create (or reuse) a cloud-init seed ISO with user+root SSH access and Docker setup.
+
+    NOTE: This intentionally preserves the original behavior, including:
+      - Spec hash based on (user, pubkey contents)
+      - Inline use of settings.VM_SSH_USER inside cloud-config
+      - Same packages and runcmd steps (root login allowed; /app perms 0777)
+    """
+    print("Creating the seed iso: ", seed_iso, user, pubkey_path, instance_id)
+    spec_path = seed_iso + ".spec"
+    want = spec_hash(user, pubkey_path)
+
+    # Fast path on VM restart: one open() of the spec answers both "was a seed
+    # built?" and "does it match?", instead of stat'ing both files first.
+    try:
+        with open(spec_path, "rb") as fh:
+            got = fh.read().strip()
+    except FileNotFoundError:
+        got = b""
+    if got == want.encode() and os.path.exists(seed_iso):
+        print("Already exist the seed_iso")
+        return
+
+    assert os.path.exists(pubkey_path), f"No existe {pubkey_path}"
+    user_data = _user_data(want, pubkey_path)
+
+    wd = os.path.dirname(seed_iso)
+    ud = os.path.join(wd, "user-data")
+    md = os.path.join(wd, "meta-data")
+    print("Writting spec, user_data and metadata")
+    _write_files(
+        [
+            (spec_path, want.encode()),
+            (ud, user_data.encode()),
+            (md, _meta_data(instance_id).encode()),
+        ]
+    )
+
+    try:
+        template = _seed_template(want, user_data)
+        if _stamp_from_template(template, seed_iso, instance_id):
+            print("Seed iso stamped from template", template)
+            return
+    except Exception as e:
+        print("Could not use the seed template; building directly", e)
+
+    _build_iso(seed_iso, ud, md)
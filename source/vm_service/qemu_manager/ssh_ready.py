@@ -6,6 +6,33 @@ import settings
 from .crypto import load_pkey
 
 
+# Readiness probing backs off exponentially from these delays up to _MAX_BACKOFF_S.
+_PROBE_BASE_S = 0.05
+_AUTH_BASE_S = 0.15
+_MAX_BACKOFF_S = 1.0
+_PROBE_TIMEOUT_S = 1.0
+
+
+def _backoff(n: int, base: float) -> float:
+    return min(base * 1.3**n, _MAX_BACKOFF_S)
+
+
+def _ssh_banner_ready(port: int) -> bool:
+    """Cheap probe: TCP connect and wait for the server's ``SSH-`` banner.
+
+    With user-mode networking QEMU accepts on the forwarded port before the guest's
+    sshd listens (and then drops the connection), so a bare connect is not enough.
+    Seeing the banner means a full paramiko handshake is worth attempting.
+    """
+    try:
+        with socket.create_connection(
+            ("127.0.0.1", port), timeout=_PROBE_TIMEOUT_S
+        ) as sock:
+            return sock.recv(4) == b"SSH-"
+    except OSError:
+        return False
+
+
 def wait_ssh(
     port: int,
     timeout: int,
@@ -19,12 +46,19 @@ def wait_ssh(
     """
     print("Start the wait_ssh process...")
     start = time.time()
+    probes = 0
+    attempts = 0
 
     while time.time() - start < timeout:
+        # 1) sshd answering? Polled quietly and cheaply while the guest boots.
+        if not _ssh_banner_ready(port):
+            time.sleep(_backoff(probes, _PROBE_BASE_S))
+            probes += 1
+            if is_vm_alive is not None and not is_vm_alive():
+                print("QEMU process died while waiting for SSH")
+                return False
+            continue
         try:
-            # 1) TCP open?
-            with socket.create_connection(("127.0.0.1", port), timeout=1.0):
-                pass
             # 2) SSH auth with supplied key
             pkey = load_pkey(settings.VM_SSH_PRIVKEY)
             cli = paramiko.SSHClient()
@@ -34,10 +68,11 @@ def wait_ssh(
                 port=port,
                 username=user,
                 pkey=pkey,
-                banner_timeout=10,
+                banner_timeout=5,
                 auth_timeout=10,
                 timeout=3,
                 look_for_keys=False,
+                compress=bool(getattr(settings, "VM_SSH_COMPRESS", False)),
             )
 
             if vm_id is not None:
@@ -67,8 +102,8 @@ def wait_ssh(
             print(f"SSH Connection READY! TIME TAKEN: {waited}")
             return True
         except Exception as e:
-            waited = time.time() - start
-            time.sleep(0.15 if waited < 5 else 0.5)
+            time.sleep(_backoff(attempts, _AUTH_BASE_S))
+            attempts += 1
             if str(e).strip() != "":
                 print("Error opening ssh", e)
             if is_vm_alive is not None and not is_vm_alive():
@@ -1,17 +1,21 @@
 import os
-import platform
 import re
+import select
 import signal
+import stat
 import subprocess
 import time
 import errno
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 import settings
 
 from models import VMProc
 from .seed import make_overlay, make_seed_iso
+from .pool import claim_overlay
 from .ports import pick_free_port, release_port
-from .qemu_args import vm_qemu_arm64_args, vm_qemu_x86_args
+from .qemu_args import _host_machine, vm_qemu_arm64_args, vm_qemu_x86_args
 from .ssh_ready import wait_ssh
 
 # Extracts the forwarded SSH port from a QEMU "-netdev user,...,hostfwd=tcp:IP:PORT-:22" arg.
@@ -25,6 +29,38 @@ def _as_int(x: str | None, default: int | None = None) -> int | None:
         return default
 
 
+# Directories with at least this many entries get their chown/chmod calls spread
+# over a thread pool (the syscalls release the GIL); small workdirs stay serial.
+_PERMS_PARALLEL_MIN = 64
+_PERMS_WORKERS = 8
+# Fix the entries of a directory relative to an fd on it (fstatat/fchownat/
+# fchmodat) rather than by full path, so each syscall resolves one name instead of
+# walking the whole workdir path again.
+_PERMS_DIR_FD = {os.stat, os.chown, os.chmod} <= os.supports_dir_fd
+
+
+def _set_owner_and_mode(
+    path: str, uid: int, gid: int, mode: int, dir_fd: int | None = None
+) -> None:
+    """chown/chmod ``path``, skipping whichever call would be a no-op.
+
+    A VM's files keep their owner and mode across restarts, so on every boot after
+    the first one ``stat`` replaces both syscalls. With ``dir_fd``, ``path`` is a
+    name relative to that open directory.
+    """
+    try:
+        st = os.stat(path, dir_fd=dir_fd)
+    except FileNotFoundError:
+        return
+    if st.st_uid != uid or st.st_gid != gid:
+        try:
+            os.chown(path, uid, gid, dir_fd=dir_fd)
+        except PermissionError:
+            pass
+    if stat.S_IMODE(st.st_mode) != mode:
+        os.chmod(path, mode, dir_fd=dir_fd)
+
+
 def _ensure_owner_and_perms(
     path: str, uid: int, gid: int, dmode: int = 0o775, fmode: int = 0o664
 ):
@@ -32,29 +68,32 @@ def _ensure_owner_and_perms(
         return
 
     os.makedirs(path, exist_ok=True)
+    _set_owner_and_mode(path, uid, gid, dmode)
+
+    dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY) if _PERMS_DIR_FD else None
     try:
-        os.chown(path, uid, gid)
-    except PermissionError:
-        pass
-    os.chmod(path, dmode)
+        with os.scandir(path) as it:
+            jobs = [
+                (
+                    entry.name if dir_fd is not None else entry.path,
+                    dmode if entry.is_dir(follow_symlinks=False) else fmode,
+                )
+                for entry in it
+            ]
 
-    with os.scandir(path) as it:
-        for entry in it:
-            try:
-                if entry.is_dir(follow_symlinks=False):
-                    try:
-                        os.chown(entry.path, uid, gid)
-                    except PermissionError:
-                        pass
-                    os.chmod(entry.path, dmode)
-                else:
-                    try:
-                        os.chown(entry.path, uid, gid)
-                    except PermissionError:
-                        pass
-                    os.chmod(entry.path, fmode)
-            except FileNotFoundError:
-                continue
+        def _fix(job: tuple[str, int]) -> None:
+            _set_owner_and_mode(job[0], uid, gid, job[1], dir_fd=dir_fd)
+
+        if len(jobs) < _PERMS_PARALLEL_MIN:
+            for job in jobs:
+                _fix(job)
+            return
+        with ThreadPoolExecutor(max_workers=_PERMS_WORKERS) as pool:
+            for _ in pool.map(_fix, jobs):
+                pass
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
 
 
 def _ensure_paths_for_vm(run_uid: int, run_gid: int, workdir: str, files: list[str]):
@@ -62,21 +101,17 @@ def _ensure_paths_for_vm(run_uid: int, run_gid: int, workdir: str, files: list[s
     try:
         _ensure_owner_and_perms(workdir, run_uid, run_gid, dmode=0o775, fmode=0o664)
 
+        # Entries directly under the workdir were just fixed by the scan above
+        # (start_vm's files all are), so this loop usually does no syscalls.
+        wd = os.path.abspath(workdir)
         for p in files:
             d = os.path.dirname(p)
+            if d and os.path.abspath(d) == wd:
+                continue
             if d:
                 os.makedirs(d, exist_ok=True)
-                try:
-                    os.chown(d, run_uid, run_gid)
-                except PermissionError:
-                    pass
-                os.chmod(d, 0o775)
-            if os.path.exists(p):
-                try:
-                    os.chown(p, run_uid, run_gid)
-                except PermissionError:
-                    pass
-                os.chmod(p, 0o664)
+                _set_owner_and_mode(d, run_uid, run_gid, 0o775)
+            _set_owner_and_mode(p, run_uid, run_gid, 0o664)
     finally:
         _ = os.umask(old_umask)
 
@@ -114,7 +149,41 @@ def _drop_privs():
         os.setuid(run_uid)
 
 
+def _spawn_qemu(
+    args: list[str], run_uid: int | None, run_gid: int | None
+) -> subprocess.Popen[bytes]:
+    """Start QEMU in its own session (dropping privileges when configured).
+
+    Without a uid/gid to switch to, the new session and umask are plain Popen
+    options applied by the C child code, so no Python callable runs between fork
+    and exec (and CPython may use its vfork/posix_spawn fast path). Only switching
+    users still needs ``_drop_privs`` for the initgroups / kvm-group fallbacks.
+    Both calls spell their options out so type checkers pick the bytes overload.
+    """
+    if run_uid or run_gid:
+        return subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            preexec_fn=_drop_privs,
+        )
+    return subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        start_new_session=True,
+        umask=0o002,
+    )
+
+
+# Whether pids can be checked with a stat of /proc/<pid> (Linux with procfs
+# mounted) instead of a signal-0 kill.
+_PROC_PIDS = os.path.isdir("/proc/self")
+
+
 def _pid_alive(pid: int) -> bool:
+    if _PROC_PIDS:
+        return os.path.exists(f"/proc/{pid}")
     try:
         os.kill(pid, 0)
         return True
@@ -122,6 +191,36 @@ def _pid_alive(pid: int) -> bool:
         return e.errno != errno.ESRCH
 
 
+def _wait_pid_exit(pid: int, timeout: float) -> bool:
+    """Block until ``pid`` exits or ``timeout`` elapses; True if it is gone.
+
+    On Linux >= 5.3 this waits on a pidfd, which turns readable the instant the
+    process dies, so a clean shutdown returns right away instead of after a fixed
+    sleep. Elsewhere it falls back to polling ``_pid_alive``.
+    """
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is not None:
+        try:
+            fd = pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                ready, _, _ = select.select([fd], [], [], timeout)
+                return bool(ready)
+            finally:
+                os.close(fd)
+
+    deadline = time.monotonic() + timeout
+    while _pid_alive(pid):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
 def _read_pid(pidfile: str) -> int | None:
     try:
         if not pidfile or not os.path.exists(pidfile):
@@ -132,6 +231,33 @@ def _read_pid(pidfile: str) -> int | None:
         return None
 
 
+# The least tail_file reads from the end of a log (the boot-failure diagnostic and
+# the console tail route). Plenty for 120 lines of kernel/cloud-init output.
+_TAIL_BYTES = 65536
+
+
+def tail_file(path: str, n: int = 120) -> str:
+    """The last ``n`` lines of ``path``, read in place instead of forking ``tail``."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        # Room for ~200 bytes a line when more lines are asked for than fit.
+        window = max(_TAIL_BYTES, n * 200)
+        # One byte more than the window: everything before the first newline is
+        # then a partial line (or nothing, if the window starts on a line), which
+        # `tail -n` never returns.
+        start = max(0, size - window - 1)
+        chunk = os.pread(fd, size - start, start)
+    finally:
+        os.close(fd)
+    lines = chunk.split(b"\n")
+    if start:
+        lines = lines[1:]
+    if lines and not lines[-1]:
+        lines.pop()  # the log's trailing newline
+    return b"\n".join(lines[-n:]).decode("utf-8", "replace")
+
+
 def _port_from_cmdline(pid: int) -> int | None:
     """Recover a running QEMU's forwarded SSH port from /proc/<pid>/cmdline."""
     try:
@@ -148,7 +274,7 @@ def _kill_pgrp(pid: int) -> None:
     for sig in (signal.SIGTERM, signal.SIGKILL):
         try:
             os.killpg(pid, sig)
-            time.sleep(0.5)
+            _ = _wait_pid_exit(pid, 0.5)
         except Exception:
             break
 
@@ -196,6 +322,7 @@ def _adopt_running_vm(
         proc=None,
         console_log=console_log,
         pidfile=pidfile,
+        pid=pid,
     )
 
 
@@ -219,6 +346,28 @@ def _clear_stale_pidfile(pidfile: str) -> None:
         print("Error clearing stale pidfile", e)
 
 
+@dataclass(slots=True, frozen=True)
+class _VMPaths:
+    """The files ``start_vm`` manages inside a VM's workdir."""
+
+    overlay: str
+    seed_iso: str
+    console_log: str
+    pidfile: str
+
+
+def _vm_paths(workdir: str) -> _VMPaths:
+    # Plain concatenation: the names are fixed, so os.path.join's separator
+    # handling has nothing to do beyond a trailing separator on workdir.
+    base = workdir if workdir.endswith(os.sep) else workdir + os.sep
+    return _VMPaths(
+        overlay=f"{base}disk.qcow2",
+        seed_iso=f"{base}seed.iso",
+        console_log=f"{base}console.log",
+        pidfile=f"{base}qemu.pid",
+    )
+
+
 def start_vm(
     workdir: str, vcpus: int, mem_mib: int, disk_gib: int, vm_id: str | None = None
 ) -> VMProc:
@@ -228,10 +377,10 @@ def start_vm(
     """
     print("Starting vm...")
     os.makedirs(workdir, exist_ok=True)
-    overlay = os.path.join(workdir, "disk.qcow2")
-    seed_iso = os.path.join(workdir, "seed.iso")
-    console_log = os.path.join(workdir, "console.log")
-    pidfile = os.path.join(workdir, "qemu.pid")
+    paths = _vm_paths(workdir)
+    overlay = paths.overlay
+    console_log = paths.console_log
+    pidfile = paths.pidfile
 
     # If a QEMU is already running for this VM, adopt it rather than launching a
     # duplicate that would die on the pidfile lock. Only if it is unusable do we
@@ -261,7 +410,9 @@ def start_vm(
 
     use_cloud_init = bool(getattr(settings, "VM_USE_CLOUD_INIT", True))
 
-    make_overlay(vm_base_image, overlay, disk_gib=disk_gib)
+    if not claim_overlay(vm_base_image, overlay, disk_gib):
+        make_overlay(vm_base_image, overlay, disk_gib=disk_gib)
+    seed_iso = paths.seed_iso
     if use_cloud_init:
         make_seed_iso(
             seed_iso,
@@ -287,7 +438,7 @@ def start_vm(
     # succeeded) or the boot failed — then release it. This keeps any concurrent
     # start_vm from being handed the same port during our whole boot window.
     try:
-        if platform.machine() in ("aarch64", "arm64"):
+        if _host_machine() in ("aarch64", "arm64"):
             print("Using arm64...")
             args = vm_qemu_arm64_args(
                 vcpus=vcpus,
@@ -310,12 +461,7 @@ def start_vm(
                 pidfile=pidfile,
             )
 
-        proc = subprocess.Popen(
-            args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            preexec_fn=_drop_privs,
-        )
+        proc = _spawn_qemu(args, run_uid, run_gid)
         print("Process executed", proc)
 
         try:
@@ -331,13 +477,8 @@ def start_vm(
         except Exception as e:
             print("Error waiting for ssh", e)
             try:
-                tail = subprocess.run(
-                    ["tail", "-n", "120", console_log],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                )
-                print("=== console.log (tail) ===\n", tail.stdout)
+                tail = tail_file(console_log, n=120)
+                print("=== console.log (tail) ===\n", tail)
             except Exception as ex:
                 print("Error reading the diagnostic", ex)
             if proc.poll() is not None and proc.stdout is not None:
@@ -352,6 +493,8 @@ def start_vm(
             proc=proc,
             console_log=console_log,
             pidfile=pidfile,
+            # QEMU wrote its pidfile long before SSH came up; read it once here.
+            pid=_read_pid(pidfile),
         )
     finally:
         # QEMU now owns the port (success) or the attempt failed (port freed).
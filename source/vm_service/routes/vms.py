@@ -4,12 +4,11 @@ import os
 import shutil
 import threading
 import uuid
-import shlex
 
 from zipfile import error
 
-from fastapi import HTTPException, Depends, APIRouter, Query
-from fastapi.responses import Response, StreamingResponse
+from fastapi import HTTPException, APIRouter, Query
+from fastapi.responses import StreamingResponse
 
 from implementations.read_from_vm import list_dirs
 import settings
@@ -28,6 +27,7 @@ from models import (
     VMPath,
     VMPaths,
     FileContent,
+    ConsoleTail,
     VMSh,
     SearchHit,
     SearchRequest,
@@ -55,23 +55,35 @@ from implementations import (
     process_status,
     stop_process,
     listening_ports,
+    search_vm,
+    SearchError,
     proxy_request,
     proxy_request_stream,
 )
 
-from implementations.ssh_cache import exec_and_close, exec_and_close_status
+from implementations.ssh_cache import exec_and_close_status
 from implementations.ssh_pool import borrow
-from middleware import verify_bearer_token
+from qemu_manager import tail_file
+from qemu_manager.vm import _vm_paths
 
 store = RedisStore(settings.REDIS_URL, settings.REDIS_PREFIX)
 runner = Runner(store, settings.NODE_NAME)
+# Schedules the delayed restart of a reboot. A seam so tests can swap in an
+# immediate timer on this module instead of patching threading.Timer globally.
+timer_factory = threading.Timer
 
-vms_router = APIRouter(prefix="/vms", dependencies=[Depends(verify_bearer_token)])
+# Auth is enforced by middleware.BearerAuthMiddleware for everything under /vms,
+# NOT by this router: it must only be mounted on an app running that middleware
+# with this prefix (main.py does; test_api checks it).
+vms_router = APIRouter(prefix="/vms")
 
 
 # ---- REST Endpoints ----
+# Every endpoint is a plain `def`: they all block on Redis, SSH or disk I/O, so
+# FastAPI runs them on its threadpool instead of stalling the event loop that also
+# serves every open terminal websocket.
 @vms_router.post("/", response_model=VMOut, status_code=201)
-async def create_vm(req: VMCreate) -> VMOut:
+def create_vm(req: VMCreate) -> VMOut:
     vm_id = str(uuid.uuid4())
     wd = runner.workdir(vm_id)
     vm = VMRecord(
@@ -88,7 +100,7 @@ async def create_vm(req: VMCreate) -> VMOut:
 
 
 @vms_router.post("/{vm_id}/duplicate", response_model=VMOut, status_code=201)
-async def duplicate_vm(vm_id: str, req: VMDuplicate) -> VMOut:
+def duplicate_vm(vm_id: str, req: VMDuplicate) -> VMOut:
     """Clone an existing VM into a brand-new one.
 
     Copies the source VM's qcow2 overlay (``disk.qcow2``) verbatim into a fresh
@@ -147,7 +159,7 @@ async def duplicate_vm(vm_id: str, req: VMDuplicate) -> VMOut:
 
 
 @vms_router.post("/{vm_id}/ensure", response_model=VMOut)
-async def ensure_vm(vm_id: str, req: VMEnsure) -> VMOut:
+def ensure_vm(vm_id: str, req: VMEnsure) -> VMOut:
     """
     Idempotently guarantee a VMRecord exists for ``vm_id``.
 
@@ -178,20 +190,22 @@ async def ensure_vm(vm_id: str, req: VMEnsure) -> VMOut:
 
 
 @vms_router.get("/list/{vm_ids}", response_model=list[VMOut])
-async def get_vms(vm_ids: str) -> list[VMOut]:
+def get_vms(vm_ids: str) -> list[VMOut]:
     vm_ids_keys = vm_ids.split(",")
+    # One MGET for the whole list instead of a Redis round-trip per id.
+    records = store.mget(vm_ids_keys)
     vm_records: list["VMOut"] = []
     for vm_id in vm_ids_keys:
-        try:
-            vm: "VMOut" = VMOut.from_record(store.get(vm_id), runner)
-            vm_records.append(vm)
-        except KeyError as e:
-            print("Error with id: ", vm_id, e)
+        vm = records.get(vm_id)
+        if vm is None:
+            print("Error with id: ", vm_id, KeyError(vm_id))
+            continue
+        vm_records.append(VMOut.from_record(vm, runner))
     return vm_records
 
 
 @vms_router.get("/{vm_id}", response_model=VMOut)
-async def get_vm(vm_id: str) -> VMOut:
+def get_vm(vm_id: str) -> VMOut:
     try:
         vm: "VMRecord" = store.get(vm_id)
         return VMOut.from_record(vm, runner)
@@ -200,12 +214,12 @@ async def get_vm(vm_id: str) -> VMOut:
 
 
 @vms_router.get("/", response_model=list[VMOut])
-async def list_vms() -> list[VMOut]:
+def list_vms() -> list[VMOut]:
     return [VMOut.from_record(v, runner) for v in store.all().values()]
 
 
 @vms_router.post("/{vm_id}/actions", response_model=VMOut)
-async def action_vm(vm_id: str, act: VMAction) -> VMOut:
+def action_vm(vm_id: str, act: VMAction) -> VMOut:
     try:
         vm: "VMRecord" = store.get(vm_id)
     except KeyError as e:
@@ -222,7 +236,7 @@ async def action_vm(vm_id: str, act: VMAction) -> VMOut:
         # clear_port=False: the restart below re-picks a fresh port on this same vm
         # object; nulling ssh_port in the stop thread could clobber that new port.
         runner.stop(vm, clear_port=False)
-        threading.Timer(1.0, lambda: runner.start(vm)).start()
+        timer_factory(1.0, lambda: runner.start(vm)).start()
         store.set_status(vm, VMState.provisioning)
     else:
         raise HTTPException(400, "Unsupported action")
@@ -273,8 +287,23 @@ def create_dir_endpoint(vm_id: str, path: VMPath) -> ElementResponse:
     return create_dir(vm, path.path)
 
 
+@vms_router.get("/{vm_id}/console/tail", response_model=ConsoleTail)
+def tail_console(vm_id: str, lines: int = Query(120, ge=1, le=5000)) -> ConsoleTail:
+    try:
+        vm: "VMRecord" = store.get(vm_id)
+    except KeyError as e:
+        raise HTTPException(404, "VM not found") from e
+    # Reads a bounded window from the end of the log, never the whole file: a
+    # long-lived VM's console.log keeps growing.
+    try:
+        log = tail_file(_vm_paths(vm.workdir).console_log, lines)
+    except FileNotFoundError:
+        return ConsoleTail(log="", found=False)
+    return ConsoleTail(log=log, found=True)
+
+
 @vms_router.delete("/{vm_id}", response_model=VMOut)
-async def delete_vm(vm_id: str) -> VMOut:
+def delete_vm(vm_id: str) -> VMOut:
     try:
         vm: "VMRecord" = store.get(vm_id)
     except KeyError as e:
@@ -292,56 +321,13 @@ def search_in_vm(vm_id: str, req: SearchRequest) -> list[SearchHit]:
     if vm.state != VMState.running or not vm.ssh_port or not vm.ssh_user:
         raise HTTPException(status_code=400, detail="VM is not running")
 
-    cmd_parts = [
-        "grep",
-        "-RInI",
-    ]  # -R recursive, -I ignore binaries, -n show line numbers
-    if req.case_insensitive:
-        cmd_parts.append("-i")
-
-    for d in req.exclude_dirs:
-        cmd_parts.append(f"--exclude-dir={d}")
-
-    for g in req.include_globs:
-        if g.strip() == "*" or g.strip() == "":
-            continue
-        cmd_parts.append(f"--include={g}")
-
-    cmd_parts.extend(["-e", req.pattern, req.root])
-    command = " ".join(shlex.quote(p) for p in cmd_parts)
-
     try:
-        with borrow(vm) as conn:
-            # exec_and_close drains the output and CLOSES the channel (no leak).
-            out_bytes, _ = exec_and_close(conn.cli, command, req.timeout_seconds)
+        return search_vm(vm, req)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Remote exec error: {e}")
 
-    results: dict[str, list[str]] = {}
-    total = 0
-
-    for raw_line in out_bytes.splitlines():
-        try:
-            decoded = raw_line.decode("utf-8", errors="replace")
-            parts = decoded.split(":", 2)
-            if len(parts) < 3:
-                continue
-            file_path, line_num_txt, content_txt = parts[0], parts[1], parts[2]
-            match_str = f"L{line_num_txt}: {content_txt}"
-            results.setdefault(file_path, []).append(match_str)
-
-            total += 1
-            if req.max_results_total and total >= req.max_results_total:
-                break
-        except Exception:
-            continue
-
-    response: list[SearchHit] = [
-        SearchHit(path=path, matchs=lines) for path, lines in results.items()
-    ]
-
-    return response
-
 
 @vms_router.post("/{vm_id}/execute-sh", response_model=VMShResponse)
 def execute_sh(vm_id: str, vm_command: VMSh) -> VMShResponse:
@@ -529,7 +515,7 @@ def download_file_ep(
     if not data:
         return ElementResponse(ok=False, reason="Issue with the file")
 
-    return Response(**data)
+    return StreamingResponse(**data)
 
 
 @vms_router.get("/{vm_id}/download-folder")
@@ -553,4 +539,4 @@ def download_folder_ep(
     if not data:
         return ElementResponse(ok=False, reason="Issue with the file")
 
-    return Response(**data)
+    return StreamingResponse(**data)
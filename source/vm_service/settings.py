@@ -1,13 +1,18 @@
+import functools
 import json
 import os
 import platform
-from pathlib import Path
-from pwd import getpwnam
 from dotenv import load_dotenv
 
-_ = load_dotenv()
+# .env is parsed once per process tree: the flag is inherited by forked/spawned
+# workers (which already got the values through the environment) and lets the test
+# suite opt out so a developer's local .env can't leak into the tests.
+if not os.environ.get("_DOTENV_LOADED"):
+    _ = load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
 
-BASE_DIR = Path(__file__).resolve().parent
+# Plain string ops (no realpath/lstat walk) and a str, like every other path here.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 VM_BASE_DIR = os.path.join(BASE_DIR, "vm_data")
 
 VM_SSH_USER = os.environ.get("VM_SSH_USER", "root")
@@ -37,9 +42,16 @@ VM_TIMEOUT_BOOT_S = int(os.environ.get("VM_TIMEOUT_BOOT_S", "600"))
 NODE_NAME = os.environ.get("NODE_NAME", "local-node")
 
 # CPU affinity for QEMU on the KVM path, in `taskset -c` syntax (e.g. "0-3" or
-# "0,2,4"). Empty disables pinning and lets the kernel scheduler place threads.
+# "0,2,4"), or "auto" to give each VM the next round-robin slice of the cores this
+# process may run on. Empty disables pinning and lets the kernel scheduler place
+# threads.
 VM_TASKSET_CPUS: str = os.environ.get("VM_TASKSET_CPUS", "")
 
+# Blank qcow2 overlays kept pre-created per (base image, disk size) so a VM boot
+# claims one with a rename instead of running qemu-img. 0 disables the pool.
+VM_OVERLAY_POOL_SIZE = int(os.environ.get("VM_OVERLAY_POOL_SIZE", "0"))
+
+
 # Whether to build and attach a cloud-init seed ISO at boot. Off when VM_BASE_IMAGE
 # is a pre-baked golden image (user + SSH key + sshd config already inside) so VMs
 # skip the ~40s cloud-init pipeline and SSH is ready as soon as sshd starts.
@@ -89,18 +101,41 @@ print(
     f"(source={_cloud_init_source}, base_image={VM_BASE_IMAGE})"
 )
 
+# Negotiate zlib compression on VM SSH connections. Off by default: on loopback the
+# CPU cost outweighs the bandwidth saved; enable it for remote or slow links.
+VM_SSH_COMPRESS = _truthy(os.environ.get("VM_SSH_COMPRESS", "false"))
+
+# Pooled SSH connections per VM for file/exec operations (the terminal has its
+# own). Keep it under the guest sshd's MaxSessions/MaxStartups.
+VM_SSH_POOL_SIZE = int(os.environ.get("VM_SSH_POOL_SIZE", "4"))
+
 REDIS_URL: str = os.environ.get("REDIS_URL", "redis://redis:6379/1")
 REDIS_PREFIX: str = os.environ.get("REDIS_PREFIX", "vmservice:")
 
 AUTH_TOKEN: str = os.environ.get("AUTH_TOKEN", "")
 
-vm_run_as_uid = None
-vm_run_as_gid = None
-try:
-    vm_run_as_uid = getpwnam("vmnet").pw_uid
-    vm_run_as_gid = getpwnam("vmnet").pw_gid
-except Exception as e:
-    print("Could not load vmnet", e)
 
-VM_RUN_AS_UID = vm_run_as_uid
-VM_RUN_AS_GID = vm_run_as_gid
+@functools.lru_cache(maxsize=1)
+def _vmnet_ids() -> "tuple[int | None, int | None]":
+    """uid/gid of the ``vmnet`` user QEMU runs as, or ``(None, None)``.
+
+    Looked up on first use rather than at import: getpwnam goes through NSS (which
+    may mean LDAP/SSSD), and most importers of settings never drop privileges.
+    """
+    try:
+        from pwd import getpwnam
+
+        pw = getpwnam("vmnet")
+        return pw.pw_uid, pw.pw_gid
+    except Exception as e:
+        print("Could not load vmnet", e)
+        return None, None
+
+
+def __getattr__(name: str):
+    # PEP 562: VM_RUN_AS_UID / VM_RUN_AS_GID resolve lazily through _vmnet_ids().
+    if name == "VM_RUN_AS_UID":
+        return _vmnet_ids()[0]
+    if name == "VM_RUN_AS_GID":
+        return _vmnet_ids()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
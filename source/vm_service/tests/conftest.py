@@ -1,24 +1,20 @@
 # conftest.py
 import os
-import sys
 import time
 import types
-import pathlib
-from typing import Tuple
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Iterator, Mapping, Tuple
 
 import pytest
 from fastapi.testclient import TestClient
 
-# ----------------------
-# Path setup: ensure vm_service package root is importable as top-level
-# so imports like `import settings` resolve to vm_service/settings.py
-# ----------------------
-_THIS_DIR = pathlib.Path(__file__).resolve().parent
-_PKG_ROOT = _THIS_DIR.parent  # vm_service/
-if str(_PKG_ROOT) not in sys.path:
-    sys.path.insert(0, str(_PKG_ROOT))
+# The vm_service root is put on sys.path by `pythonpath` in pytest.ini, so imports
+# like `import settings` resolve to vm_service/settings.py.
+
+# Tests run against defaults + monkeypatching, never a developer's local .env.
+os.environ.setdefault("_DOTENV_LOADED", "1")
 
-# After adjusting sys.path, import project modules
 import settings  # noqa: E402
 import models  # noqa: E402
 from routes import vms  # noqa: E402
@@ -41,8 +37,13 @@ class InMemoryStore:
             raise KeyError(vm_id)
         return self._data[vm_id]
 
-    def all(self) -> dict[str, models.VMRecord]:
-        return dict(self._data)
+    def mget(self, vm_ids: list[str]) -> dict[str, models.VMRecord]:
+        return {i: self._data[i] for i in vm_ids if i in self._data}
+
+    def all(self) -> Mapping[str, models.VMRecord]:
+        # Read-only live view instead of a copy; the only caller (list_vms) just
+        # iterates it.
+        return MappingProxyType(self._data)
 
     def set_status(
         self,
@@ -60,10 +61,14 @@ class FakeRunner:
         self.store = store
         self.node_name = node_name
         self._base_dir = base_dir
+        # Workdirs already created, so repeated lookups skip the mkdir syscalls.
+        self._created: set[str] = set()
 
     def workdir(self, vm_id: str) -> str:
         wd = os.path.join(self._base_dir, "vms", vm_id)
-        os.makedirs(wd, exist_ok=True)
+        if wd not in self._created:
+            os.makedirs(wd, exist_ok=True)
+            self._created.add(wd)
         return wd
 
     def start(self, vm: models.VMRecord) -> None:
@@ -128,84 +133,94 @@ class FakeFile:
         self._data = data
         self.channel = FakeChannel()
 
-    def read(self) -> bytes:
-        return self._data
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = len(self._data)
+        out, self._data = self._data[:size], self._data[size:]
+        return out
+
+
+class _FakeSFTPWriter:
+    """Writer returned by ``_FakeSFTP.open``; stores the bytes on close."""
+
+    def __init__(self, files: dict[str, bytes], p: str):
+        self._files = files
+        self._p = p
+        self._chunks: list[bytes] = []
+
+    def write(self, b: bytes):
+        self._chunks.append(bytes(b))
+
+    def close(self):
+        # Joined once, instead of growing a bytearray and copying it out.
+        self._files[self._p] = b"".join(self._chunks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _FakeSFTP:
+    """Minimal fake SFTP client with file/stat behavior."""
+
+    def __init__(self, files: dict[str, bytes] | None = None):
+        self._files = files or {}
+        self._cwd = "/"
+
+    def file(self, path, mode="rb"):
+        # Return a file-like that supports read()
+        data = self._files.get(path, b"")
+        return types.SimpleNamespace(read=lambda: data)
+
+    def open(self, path, mode="wb"):
+        # Return a writer that writes into our dict
+        return _FakeSFTPWriter(self._files, path)
+
+    def stat(self, path):
+        if path not in self._files and not path.endswith("/"):
+            raise FileNotFoundError(path)
+        # Return a minimal object with an int st_mode, like paramiko's SFTPAttributes
+        is_dir = path.endswith("/")
+        mode = 0o040000 if is_dir else 0o100644
+        return types.SimpleNamespace(st_mode=mode)
+
+    def normalize(self, path):
+        if not path or not path.startswith("/"):
+            return "/" + (path or "")
+        return path
+
+    def mkdir(self, path):
+        # No-op in fake
+        return None
+
+    def chmod(self, path, mode):
+        # No-op in fake
+        return None
 
 
 class FakeSSHClient:
     def __init__(self, stdout_data: bytes = b"", stderr_data: bytes = b""):
         self._stdout = stdout_data
         self._stderr = stderr_data
+        # The fake shell is stateless, so one instance serves every invoke_shell().
+        self._shell = types.SimpleNamespace(
+            closed=False,
+            recv=lambda n: b"",
+            send=lambda data: None,
+            settimeout=lambda t: None,
+            close=lambda: None,
+        )
 
     def exec_command(self, command: str):
         return None, FakeFile(self._stdout), FakeFile(self._stderr)
 
     def open_sftp(self):
-        # Minimal fake SFTP client with file/stat behavior
-        class _SFTP:
-            def __init__(self, files: dict[str, bytes] | None = None):
-                self._files = files or {}
-                self._cwd = "/"
-
-            def file(self, path, mode="rb"):
-                # Return a file-like that supports read()
-                data = self._files.get(path, b"")
-                return types.SimpleNamespace(read=lambda: data)
-
-            def open(self, path, mode="wb"):
-                # Return a writer that writes into our dict
-                class _W:
-                    def __init__(self, files: dict[str, bytes], p: str):
-                        self._files = files
-                        self._p = p
-                        self._buf = bytearray()
-
-                    def write(self, b: bytes):
-                        self._buf.extend(b)
-
-                    def close(self):
-                        self._files[self._p] = bytes(self._buf)
-
-                    def __enter__(self):
-                        return self
-
-                    def __exit__(self, exc_type, exc, tb):
-                        self.close()
-
-                return _W(self._files, path)
-
-            def stat(self, path):
-                if path not in self._files and not path.endswith("/"):
-                    raise FileNotFoundError(path)
-                # Return a minimal object with st_mode
-                # Use "100644"-like string for file and "4..."-ish for dir (simulate)
-                is_dir = path.endswith("/")
-                mode = 0o040000 if is_dir else 0o100644
-                return types.SimpleNamespace(st_mode=str(mode))
-
-            def normalize(self, path):
-                if not path or not path.startswith("/"):
-                    return "/" + (path or "")
-                return path
-
-            def mkdir(self, path):
-                # No-op in fake
-                return None
-
-            def chmod(self, path, mode):
-                # No-op in fake
-                return None
-
-        return _SFTP()
+        return _FakeSFTP()
 
     def invoke_shell(self, width=120, height=32):
-        return types.SimpleNamespace(
-            closed=False,
-            recv=lambda n: b"",
-            send=lambda data: None,
-            settimeout=lambda t: None,
-            close=lambda: None,
-        )
+        return self._shell
 
 
 class FakeTTYBridge:
@@ -237,47 +252,73 @@ def patch_auth_token(monkeypatch):
     monkeypatch.setattr(settings, "AUTH_TOKEN", "testtoken", raising=False)
 
 
-@pytest.fixture
-def auth_header():
-    return {"Authorization": "Bearer testtoken"}
+@pytest.fixture(scope="session")
+def auth_header() -> Mapping[str, str]:
+    # Built once and read-only, so no test can alter what the next one sends.
+    return MappingProxyType({"Authorization": "Bearer testtoken"})
 
 
-@pytest.fixture
-def store_and_runner(tmp_path, monkeypatch) -> Tuple[InMemoryStore, FakeRunner, str]:
+def _patch_many(mp: pytest.MonkeyPatch, patches: list[tuple[object, str, object]]):
+    """Apply several ``(target, name, value)`` patches through one MonkeyPatch."""
+    for target, name, value in patches:
+        mp.setattr(target, name, value, raising=False)
+
+
+@pytest.fixture(scope="module")
+def _app_env(tmp_path_factory) -> Iterator[Tuple[InMemoryStore, FakeRunner, str]]:
     """
-    Provide an in-memory store and a fake runner patched into the app modules.
-    Also set a VM_BASE_DIR in a temp path and make threading.Timer deterministic.
+    Module-wide in-memory store and fake runner patched into the app modules, built
+    once per test module instead of per test. The module-scoped patches go through
+    their own MonkeyPatch, since the ``monkeypatch`` fixture is function-scoped.
     """
-    base_dir = tmp_path / "vm_data"
-    os.makedirs(base_dir, exist_ok=True)
+    base_dir = tmp_path_factory.mktemp("vm_data")
 
     test_store = InMemoryStore()
     test_runner = FakeRunner(test_store, "test-node", str(base_dir))
 
-    # patch base dir for any file paths (console, pidfile, etc.)
-    monkeypatch.setattr(settings, "VM_BASE_DIR", str(base_dir), raising=False)
+    with pytest.MonkeyPatch.context() as mp:
+        _patch_many(
+            mp,
+            [
+                # base dir for any file paths (console, pidfile, etc.)
+                (settings, "VM_BASE_DIR", str(base_dir)),
+                # store/runner in API modules
+                (vms, "store", test_store),
+                (vms, "runner", test_runner),
+                (main, "store", test_store),
+                (main, "runner", test_runner),
+                # reboot timer acts immediately (scoped to routes.vms, not the
+                # global threading module)
+                (vms, "timer_factory", FakeTimer),
+                # TTY bridge mocked out for deterministic websocket behavior
+                (main, "TTYBridge", FakeTTYBridge),
+            ],
+        )
+        yield test_store, test_runner, str(base_dir)
 
-    # patch store/runner in API modules
-    monkeypatch.setattr(vms, "store", test_store, raising=False)
-    monkeypatch.setattr(vms, "runner", test_runner, raising=False)
-    monkeypatch.setattr(main, "store", test_store, raising=False)
-    monkeypatch.setattr(main, "runner", test_runner, raising=False)
 
-    # Make Timer act immediately for reboot actions
-    import threading
+@pytest.fixture
+def store_and_runner(_app_env) -> Tuple[InMemoryStore, FakeRunner, str]:
+    """
+    Provide the module's in-memory store and fake runner, emptied for this test.
+    Also set a VM_BASE_DIR in a temp path and make the reboot timer deterministic.
+    """
+    test_store = _app_env[0]
+    test_store._data.clear()
+    return _app_env
 
-    monkeypatch.setattr(threading, "Timer", FakeTimer, raising=True)
 
-    return test_store, test_runner, str(base_dir)
+@pytest.fixture(scope="module")
+def _module_client(_app_env) -> TestClient:
+    return TestClient(main.app)
 
 
 @pytest.fixture
-def client(store_and_runner, monkeypatch) -> TestClient:
+def client(store_and_runner, _module_client) -> TestClient:
     """
-    FastAPI TestClient with the TTY bridge mocked out for deterministic behavior.
+    FastAPI TestClient (shared by the module) over a freshly emptied store.
     """
-    monkeypatch.setattr(main, "TTYBridge", FakeTTYBridge, raising=False)
-    return TestClient(main.app)
+    return _module_client
 
 
 @pytest.fixture
@@ -290,3 +331,20 @@ def fake_ssh_factory():
         return FakeSSHClient(stdout_data=stdout_data, stderr_data=stderr_data)
 
     return _make
+
+
+@pytest.fixture
+def fake_borrow():
+    """
+    Helper factory for a fake ssh_pool.borrow that yields a connection with the
+    given cli/sftp.
+    """
+
+    def _make(cli=None, sftp=None):
+        @contextmanager
+        def _cm(container):
+            yield types.SimpleNamespace(cli=cli, sftp=sftp)
+
+        return _cm
+
+    return _make
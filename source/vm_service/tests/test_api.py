@@ -1,225 +1,41 @@
 import os
-import sys
-import time
-import types
-import pathlib
-from contextlib import contextmanager
 
-import pytest
 from fastapi.testclient import TestClient
 
-_THIS_DIR = pathlib.Path(__file__).resolve().parent
-_PKG_ROOT = _THIS_DIR.parent  # vm_service/
-sys.path.insert(0, str(_PKG_ROOT))
-
-import settings  # noqa: E402
-import models  # noqa: E402
-from routes import vms  # noqa: E402
-import main  # noqa: E402
-
-
-# ----------------------
-# Test Utilities / Fakes
-# ----------------------
-class InMemoryStore:
-    def __init__(self):
-        self._data: dict[str, models.VMRecord] = {}
-
-    def put(self, vm: models.VMRecord) -> None:
-        vm.updated_at = time.time()
-        self._data[vm.id] = vm
-
-    def get(self, vm_id: str) -> models.VMRecord:
-        if vm_id not in self._data:
-            raise KeyError(vm_id)
-        return self._data[vm_id]
-
-    def all(self) -> dict[str, models.VMRecord]:
-        return dict(self._data)
-
-    def set_status(
-        self,
-        vm: models.VMRecord,
-        status: models.VMState,
-        error_reason: str | None = None,
-    ):
-        vm.state = status
-        vm.error_reason = error_reason
-        self.put(vm)
-
-
-class FakeRunner:
-    def __init__(self, store: InMemoryStore, node_name: str, base_dir: str):
-        self.store = store
-        self.node_name = node_name
-        self._base_dir = base_dir
-
-    def workdir(self, vm_id: str) -> str:
-        wd = os.path.join(self._base_dir, "vms", vm_id)
-        os.makedirs(wd, exist_ok=True)
-        return wd
-
-    def start(self, vm: models.VMRecord) -> None:
-        vm.ssh_port = 2222
-        vm.ssh_user = "root"
-        # minimal proc structure for endpoints like tail_console
-        vm.proc = models.VMProc(
-            workdir=vm.workdir,
-            overlay=os.path.join(vm.workdir, "disk.qcow2"),
-            seed_iso=os.path.join(vm.workdir, "seed.iso"),
-            port_ssh=vm.ssh_port,
-            proc=None,
-            console_log=os.path.join(vm.workdir, "console.log"),
-            pidfile=os.path.join(vm.workdir, "qemu.pid"),
-        )
-        self.store.set_status(vm, models.VMState.running)
-
-    def stop(
-        self,
-        vm: models.VMRecord,
-        cleanup_disks: bool = False,
-        clear_port: bool = True,
-    ) -> None:
-        if clear_port:
-            vm.ssh_port = None
-        self.store.set_status(vm, models.VMState.stopped)
-
-
-class FakeTimer:
-    def __init__(self, interval: float, func, *args, **kwargs):
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-
-    def start(self):
-        # Run immediately for deterministic tests
-        self.func(*self.args, **self.kwargs)
-
-
-class FakeChannel:
-    def __init__(self):
-        self._timeout = None
-
-    def settimeout(self, t):
-        self._timeout = t
-
-    def recv_exit_status(self) -> int:
-        return 0
-
-
-class FakeFile:
-    def __init__(self, data: bytes):
-        self._data = data
-        self.channel = FakeChannel()
-
-    def read(self) -> bytes:
-        return self._data
-
-
-class FakeSSHClient:
-    def __init__(self, stdout_data: bytes = b"", stderr_data: bytes = b""):
-        self._stdout = stdout_data
-        self._stderr = stderr_data
-
-    def exec_command(self, command: str):
-        return None, FakeFile(self._stdout), FakeFile(self._stderr)
-
-    # For TTY usage we won't use invoke_shell here (mocked elsewhere),
-    # but define it for safety.
-    def invoke_shell(self, width=120, height=32):
-        return types.SimpleNamespace(
-            closed=False,
-            recv=lambda n: b"",
-            send=lambda data: None,
-            settimeout=lambda t: None,
-            close=lambda: None,
-        )
-
-
-def _fake_borrow(cli=None, sftp=None):
-    """Build a fake ssh_pool.borrow that yields a connection with the given cli/sftp."""
-
-    @contextmanager
-    def _cm(container):
-        yield types.SimpleNamespace(cli=cli, sftp=sftp)
-
-    return _cm
-
-
-class FakeTTYBridge:
-    def __init__(self, ws, vm, loop=None):
-        self.ws = ws
-        self.vm = vm
-        self.loop = loop
-        self.started = False
-        self.closed = False
-
-    def start(self):
-        # Do nothing; we won't spawn any background thread
-        self.started = True
-
-    async def send(self, text: str):
-        # Echo back to the websocket
-        await self.ws.send_text(f"REMOTE:{text}")
-
-    def close(self):
-        self.closed = True
-
-
-# ----------------------
-# Pytest Fixtures
-# ----------------------
-@pytest.fixture(autouse=True)
-def patch_auth_token(monkeypatch):
-    # Force a known token for tests
-    monkeypatch.setattr(settings, "AUTH_TOKEN", "testtoken", raising=False)
+# Fakes and fixtures (store_and_runner, client, auth_header, fake_ssh_factory,
+# fake_borrow) come from conftest.py.
+import models
+from routes import vms
+import main
+from middleware import BearerAuthMiddleware
 
 
-@pytest.fixture
-def auth_header():
-    return {"Authorization": "Bearer testtoken"}
-
-
-@pytest.fixture
-def store_and_runner(tmp_path, monkeypatch):
-    # Replace the global stores/runners in modules
-    base_dir = tmp_path / "vm_data"
-    os.makedirs(base_dir, exist_ok=True)
-
-    test_store = InMemoryStore()
-    test_runner = FakeRunner(test_store, "test-node", str(base_dir))
-
-    # Patch settings VM_BASE_DIR so endpoints that read files work under tmpdir
-    monkeypatch.setattr(settings, "VM_BASE_DIR", str(base_dir), raising=False)
-
-    # Patch in modules
-    monkeypatch.setattr(vms, "store", test_store, raising=False)
-    monkeypatch.setattr(vms, "runner", test_runner, raising=False)
-    monkeypatch.setattr(main, "store", test_store, raising=False)
-    monkeypatch.setattr(main, "runner", test_runner, raising=False)
-
-    # Patch Timer in vms for deterministic reboot
-    import threading
-
-    monkeypatch.setattr(threading, "Timer", FakeTimer, raising=True)
+def test_health_ok(client: TestClient):
+    r = client.get("/health")
+    assert r.status_code == 200
+    assert r.json() == {"ok": "True"}
 
-    return test_store, test_runner, str(base_dir)
 
+def test_vms_router_is_mounted_behind_the_auth_middleware():
+    # The router carries no auth of its own: the middleware must cover its prefix.
+    guards = [
+        m.kwargs.get("prefix")
+        for m in main.app.user_middleware
+        if m.cls is BearerAuthMiddleware
+    ]
+    assert guards == [vms.vms_router.prefix]
+    assert all(r.path.startswith(vms.vms_router.prefix) for r in vms.vms_router.routes)
 
-@pytest.fixture
-def client(store_and_runner, monkeypatch):
-    # Patch TTYBridge so WS endpoint is deterministic
-    monkeypatch.setattr(main, "TTYBridge", FakeTTYBridge, raising=False)
-    return TestClient(main.app)
 
+def test_openapi_declares_bearer_auth_on_vms_routes(client: TestClient):
+    schema = client.get("/openapi.json").json()
 
-# ----------------------
-# Tests
-# ----------------------
-def test_health_ok(client: TestClient):
-    r = client.get("/health")
-    assert r.status_code == 200
-    assert r.json() == {"ok": "True"}
+    assert schema["components"]["securitySchemes"]["HTTPBearer"] == {
+        "type": "http",
+        "scheme": "bearer",
+    }
+    assert schema["paths"]["/vms/"]["get"]["security"] == [{"HTTPBearer": []}]
+    assert "security" not in schema["paths"]["/health"]["get"]
 
 
 def test_auth_required_for_vms_endpoints(client: TestClient):
@@ -231,6 +47,23 @@ def test_auth_required_for_vms_endpoints(client: TestClient):
     r = client.get("/vms/", headers={"Authorization": "Bearer wrong"})
     assert r.status_code == 403
 
+    # Right prefix, wrong length: still rejected by the constant-time compare
+    r = client.get("/vms/", headers={"Authorization": "Bearer testtoken1"})
+    assert r.status_code == 403
+
+    # Scheme other than Bearer counts as missing credentials
+    r = client.get("/vms/", headers={"Authorization": "Basic testtoken"})
+    assert r.status_code == 401
+
+    r = client.get("/vms/", headers={"Authorization": "Bearer testtoken"})
+    assert r.status_code == 200
+    r = client.get("/vms/", headers={"Authorization": "bearer testtoken"})
+    assert r.status_code == 200
+
+    # Only paths under /vms are guarded; a look-alike prefix is not.
+    assert client.get("/vms").status_code == 401
+    assert client.get("/vmsx").status_code == 404
+
 
 def test_create_get_list_delete_vm_flow(
     client: TestClient, auth_header, store_and_runner
@@ -414,7 +247,9 @@ def test_upload_files_and_dirs_endpoints(
     assert r.json()["ok"] is True
 
 
-def test_search_in_vm(client: TestClient, auth_header, monkeypatch):
+def test_search_in_vm(
+    client: TestClient, auth_header, monkeypatch, fake_ssh_factory, fake_borrow
+):
     # Create VM
     r = client.post(
         "/vms/", headers=auth_header, json={"vcpus": 1, "mem_mib": 256, "disk_gib": 5}
@@ -422,11 +257,13 @@ def test_search_in_vm(client: TestClient, auth_header, monkeypatch):
     vm_id = r.json()["id"]
 
     # Mock SSH for search (the route borrows a pooled connection)
-    cli = FakeSSHClient(
+    cli = fake_ssh_factory(
         stdout_data=b"/app/a.txt:1:hello\n/app/b.txt:2:world\n",
         stderr_data=b"",
     )
-    monkeypatch.setattr(vms, "borrow", _fake_borrow(cli=cli))
+    import implementations.search as search_mod
+
+    monkeypatch.setattr(search_mod, "borrow", fake_borrow(cli=cli))
     body = {
         "pattern": "o",
         "root": "/app",
@@ -454,15 +291,17 @@ def test_search_in_vm(client: TestClient, auth_header, monkeypatch):
     assert total == 1
 
 
-def test_execute_sh(client: TestClient, auth_header, monkeypatch):
+def test_execute_sh(
+    client: TestClient, auth_header, monkeypatch, fake_ssh_factory, fake_borrow
+):
     r = client.post(
         "/vms/", headers=auth_header, json={"vcpus": 1, "mem_mib": 256, "disk_gib": 5}
     )
     vm_id = r.json()["id"]
 
     # Mock SSH for execute_sh (the route borrows a pooled connection)
-    cli = FakeSSHClient(stdout_data=b"ok\n", stderr_data=b"")
-    monkeypatch.setattr(vms, "borrow", _fake_borrow(cli=cli))
+    cli = fake_ssh_factory(stdout_data=b"ok\n", stderr_data=b"")
+    monkeypatch.setattr(vms, "borrow", fake_borrow(cli=cli))
     r = client.post(
         f"/vms/{vm_id}/execute-sh", headers=auth_header, json={"command": "echo ok"}
     )
@@ -475,7 +314,9 @@ def test_execute_sh(client: TestClient, auth_header, monkeypatch):
     assert (reason == "") or ("ok" in reason)
 
 
-def test_listening_ports_endpoint(client: TestClient, auth_header, monkeypatch):
+def test_listening_ports_endpoint(
+    client: TestClient, auth_header, monkeypatch, fake_ssh_factory, fake_borrow
+):
     import importlib
 
     # NB: `from implementations import listening_ports` yields the *function*
@@ -499,8 +340,8 @@ def test_listening_ports_endpoint(client: TestClient, auth_header, monkeypatch):
         b'LISTEN 0 4096 127.0.0.53%lo:53 0.0.0.0:* users:(("systemd-resolve",pid=300,fd=18))\n'
         b'LISTEN 0 4096   127.0.0.1:5355 0.0.0.0:* users:(("systemd-resolve",pid=300,fd=10))\n'
     )
-    cli = FakeSSHClient(stdout_data=ss_out)
-    monkeypatch.setattr(lp_mod, "borrow", _fake_borrow(cli=cli))
+    cli = fake_ssh_factory(stdout_data=ss_out)
+    monkeypatch.setattr(lp_mod, "borrow", fake_borrow(cli=cli))
 
     r = client.get(f"/vms/{vm_id}/listening-ports", headers=auth_header)
     assert r.status_code == 200
@@ -692,7 +533,7 @@ def test_download_file_and_folder(client: TestClient, auth_header, monkeypatch):
     # Mock single file download
     def _fake_download_file(vm, path):
         return {
-            "content": b"abc",
+            "content": iter([b"a", b"bc"]),
             "media_type": "text/plain",
             "headers": {"Content-Disposition": 'attachment; filename="file.txt"'},
         }
@@ -709,7 +550,7 @@ def test_download_file_and_folder(client: TestClient, auth_header, monkeypatch):
     # Mock folder archive download
     def _fake_download_folder(vm, root, prefer_fmt):
         return {
-            "content": b"ZIPDATA",
+            "content": iter([b"ZIP", b"DATA"]),
             "media_type": "application/zip",
             "headers": {"Content-Disposition": 'attachment; filename="app.zip"'},
         }
@@ -808,3 +649,42 @@ def test_duplicate_endpoint_missing_disk(client, auth_header, store_and_runner):
         json={"vcpus": 1, "mem_mib": 256, "disk_gib": 5},
     )
     assert r.status_code == 404
+
+
+def test_tail_console_endpoint(client, auth_header, store_and_runner):
+    store, runner, base_dir = store_and_runner
+    vm_id = "tail-vm"
+    wd = runner.workdir(vm_id)
+    store.put(
+        models.VMRecord(
+            id=vm_id,
+            state=models.VMState.running,
+            workdir=wd,
+            vcpus=1,
+            mem_mib=256,
+            disk_gib=5,
+        )
+    )
+
+    r = client.get(f"/vms/{vm_id}/console/tail", headers=auth_header)
+    assert r.status_code == 200
+    assert r.json() == {"log": "", "found": False}
+
+    with open(os.path.join(wd, "console.log"), "w", encoding="utf-8") as f:
+        f.write("".join(f"line {i}\n" for i in range(500)))
+    r = client.get(
+        f"/vms/{vm_id}/console/tail", headers=auth_header, params={"lines": 3}
+    )
+    assert r.json() == {"log": "line 497\nline 498\nline 499", "found": True}
+
+    r = client.get("/vms/nope/console/tail", headers=auth_header)
+    assert r.status_code == 404
+
+
+def test_vm_endpoints_run_off_the_event_loop():
+    # Blocking Redis/SSH/disk work must go to FastAPI's threadpool, never run as a
+    # coroutine on the loop that also serves the terminal websockets.
+    import inspect
+
+    for route in vms.vms_router.routes:
+        assert not inspect.iscoroutinefunction(route.endpoint), route.path
@@ -0,0 +1,204 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import implementations.bridge as bridge
+
+
+class PipeChannel:
+    """Channel fake whose fileno() is a real pipe, like paramiko's event pipe."""
+
+    def __init__(self):
+        self._r, self._w = os.pipe()
+        self._buf = bytearray()
+        self._eof = False
+        self._lock = threading.Lock()
+        self.closed = False
+        self.sent = []
+
+    def fileno(self):
+        return self._r
+
+    def settimeout(self, t):
+        self.timeout = t
+
+    def feed(self, data=b"", eof=False):
+        with self._lock:
+            self._buf += data
+            self._eof = self._eof or eof
+            os.write(self._w, b"x")
+
+    def recv(self, n):
+        with self._lock:
+            if not self._buf:
+                if self._eof:
+                    return b""
+                raise socket.timeout()
+            out = bytes(self._buf[:n])
+            del self._buf[:n]
+            if not self._buf and not self._eof:
+                os.read(self._r, 4096)
+            return out
+
+    def recv_ready(self):
+        return bool(self._buf)
+
+    @property
+    def eof_received(self):
+        return self._eof
+
+    def sendall(self, payload):
+        self.sent.append(bytes(payload))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCli:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWS:
+    def __init__(self):
+        self.frames = []
+
+    async def send_bytes(self, data):
+        self.frames.append(data)
+
+
+def wait_for(pred, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+@pytest.fixture
+def loop():
+    lp = asyncio.new_event_loop()
+    t = threading.Thread(target=lp.run_forever, daemon=True)
+    t.start()
+    yield lp
+    lp.call_soon_threadsafe(lp.stop)
+    t.join(timeout=2)
+    lp.close()
+
+
+def test_terminals_share_one_reader_thread(monkeypatch, loop):
+    conns = {"a": (FakeCli(), PipeChannel()), "b": (FakeCli(), PipeChannel())}
+    monkeypatch.setattr(bridge, "generate_console", lambda vm: conns[vm])
+
+    ws_a, ws_b = FakeWS(), FakeWS()
+    br_a = bridge.TTYBridge(ws_a, vm="a", loop=loop)
+    br_b = bridge.TTYBridge(ws_b, vm="b", loop=loop)
+    asyncio.run_coroutine_threadsafe(br_a.send("ls\n"), loop).result()
+    br_a.start()
+    br_b.start()
+    assert wait_for(lambda: br_a._ready and br_b._ready)
+
+    conns["a"][1].feed(b"out-a")
+    conns["b"][1].feed(b"out-b")
+    assert wait_for(lambda: ws_a.frames == [b"out-a"] and ws_b.frames == [b"out-b"])
+
+    # Input typed before the shell existed is flushed in order.
+    assert conns["a"][1].sent == [b"ls\n"]
+    hubs = [t for t in threading.enumerate() if t.name == "tty-reader-hub"]
+    assert len(hubs) == 1
+
+    # EOF on one terminal tears down only that one.
+    conns["a"][1].feed(eof=True)
+    assert wait_for(lambda: conns["a"][0].closed and conns["a"][1].closed)
+    conns["b"][1].feed(b"more")
+    assert wait_for(lambda: ws_b.frames == [b"out-b", b"more"])
+    assert not conns["b"][1].closed
+
+    br_b.close()
+    assert wait_for(lambda: conns["b"][0].closed and conns["b"][1].closed)
+
+
+def test_send_writes_the_whole_payload_once_ready(loop):
+    class ShortWriteChannel:
+        closed = False
+
+        def __init__(self):
+            self.data = bytearray()
+
+        def send(self, s):
+            # Like paramiko when the SSH window is nearly full: partial writes.
+            n = min(len(s), 3)
+            self.data += s[:n]
+            return n
+
+        def sendall(self, s):
+            while s:
+                s = s[self.send(s) :]
+
+    br = bridge.TTYBridge(FakeWS(), vm="a", loop=loop)
+    br.chan = ShortWriteChannel()
+    br._ready = True
+
+    asyncio.run_coroutine_threadsafe(br.send("échö hello\n"), loop).result()
+    asyncio.run_coroutine_threadsafe(br.send("ctrlc"), loop).result()
+    assert bytes(br.chan.data) == "échö hello\n".encode() + b"\x03"
+
+
+class WindowChannel(PipeChannel):
+    """Like paramiko's sendall: waits for the peer's window, or raises
+    socket.timeout at once if the channel was made non-blocking."""
+
+    def __init__(self, window):
+        super().__init__()
+        self.window = window
+        self.timeout = 0.2
+        self.received = bytearray()
+        self._cv = threading.Condition()
+
+    def sendall(self, payload):
+        data = bytes(payload)
+        while data:
+            with self._cv:
+                if not self.window:
+                    if self.timeout is not None:
+                        raise socket.timeout()
+                    self._cv.wait_for(lambda: self.window > 0)
+                n = min(self.window, len(data))
+                self.received += data[:n]
+                self.window -= n
+                data = data[n:]
+
+    def consume(self, n):
+        with self._cv:
+            self.window += n
+            self._cv.notify_all()
+
+
+def test_input_waits_for_a_full_window_instead_of_being_dropped(monkeypatch, loop):
+    chan = WindowChannel(window=4)
+    monkeypatch.setattr(bridge, "generate_console", lambda vm: (FakeCli(), chan))
+
+    br = bridge.TTYBridge(FakeWS(), vm="w", loop=loop)
+    early = b"e" * 10  # buffered before the shell exists, flushed on connect
+    late = bytes(range(200))
+    asyncio.run_coroutine_threadsafe(br.send(early), loop).result()
+    br.start()
+    assert wait_for(lambda: br._ready or chan.received)
+
+    sent = asyncio.run_coroutine_threadsafe(br.send(late), loop)
+    # The remote side reads stdin slowly, a few bytes at a time.
+    while not sent.done():
+        chan.consume(8)
+        time.sleep(0.001)
+    sent.result()
+
+    assert bytes(chan.received) == early + late
+    br.close()
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import qemu_manager.crypto as crypto
+
+
+@pytest.fixture
+def counting_ed25519(monkeypatch):
+    loads = []
+
+    class FakeEd25519:
+        @staticmethod
+        def from_private_key_file(path):
+            loads.append(path)
+            return object()
+
+    crypto._cached_pkey.cache_clear()
+    monkeypatch.setattr(crypto.paramiko, "Ed25519Key", FakeEd25519)
+    yield loads
+    crypto._cached_pkey.cache_clear()
+
+
+def test_load_pkey_parses_once_per_mtime(tmp_path, counting_ed25519):
+    key = tmp_path / "id_vm"
+    key.write_text("key")
+
+    first = crypto.load_pkey(str(key))
+    assert crypto.load_pkey(str(key)) is first
+    assert counting_ed25519 == [str(key)]
+
+    # Rotating the key file invalidates the cached entry.
+    st = os.stat(key)
+    os.utime(key, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert crypto.load_pkey(str(key)) is not first
+    assert len(counting_ed25519) == 2
+
+
+def test_load_pkey_missing_file_is_not_cached(counting_ed25519):
+    crypto.load_pkey("/nonexistent/key")
+    crypto.load_pkey("/nonexistent/key")
+    assert len(counting_ed25519) == 2
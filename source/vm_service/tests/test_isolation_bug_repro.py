@@ -174,7 +174,7 @@ class _FakeRedis:
         self._data: dict[str, str] = {}
         self._sets: dict[str, set[str]] = {}
 
-    def pipeline(self):
+    def pipeline(self, transaction=True):
         return _FakePipeline(self)
 
     def get(self, key):
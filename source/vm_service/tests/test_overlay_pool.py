@@ -0,0 +1,109 @@
+import os
+import subprocess
+
+import qemu_manager.pool as pool
+
+
+class _InlineThread:
+    """threading.Thread stand-in that runs the refill synchronously."""
+
+    def __init__(self, target, args=(), daemon=None):
+        self._target = target
+        self._args = args
+
+    def start(self):
+        self._target(*self._args)
+
+
+def _setup(monkeypatch, tmp_path, size):
+    base = tmp_path / "golden.qcow2"
+    base.write_bytes(b"GOLDEN")
+    created = []
+
+    def fake_make_overlays(specs):
+        for _base, path, _gib in specs:
+            created.append(path)
+            with open(path, "wb") as fh:
+                fh.write(b"OVERLAY")
+
+    monkeypatch.setattr(pool.settings, "VM_BASE_DIR", str(tmp_path), raising=False)
+    monkeypatch.setattr(pool.settings, "VM_OVERLAY_POOL_SIZE", size, raising=False)
+    monkeypatch.setattr(pool, "make_overlays", fake_make_overlays)
+    monkeypatch.setattr(pool.threading, "Thread", _InlineThread)
+    return str(base), created
+
+
+def test_claim_misses_then_hits_after_refill(monkeypatch, tmp_path):
+    base, created = _setup(monkeypatch, tmp_path, 2)
+
+    first = tmp_path / "vm1.qcow2"
+    assert pool.claim_overlay(base, str(first), 10) is False  # empty pool
+    assert not first.exists()
+    assert len(created) == 2  # the miss topped the pool up
+
+    second = tmp_path / "vm2.qcow2"
+    assert pool.claim_overlay(base, str(second), 10) is True
+    assert second.read_bytes() == b"OVERLAY"
+    assert len(created) == 3  # refilled the one we took
+
+    # A different disk size lives in its own bucket.
+    assert pool.claim_overlay(base, str(tmp_path / "vm3.qcow2"), 20) is False
+
+
+def test_claim_disabled_by_default(monkeypatch, tmp_path):
+    base, created = _setup(monkeypatch, tmp_path, 0)
+
+    assert pool.claim_overlay(base, str(tmp_path / "vm.qcow2"), 10) is False
+    assert created == []
+
+
+def test_failed_refill_drops_temp_overlays(monkeypatch, tmp_path):
+    base, _created = _setup(monkeypatch, tmp_path, 2)
+
+    def failing_make_overlays(specs):
+        # The first create succeeds, the second fails: nothing may be promoted.
+        with open(specs[0][1], "wb") as fh:
+            fh.write(b"OVERLAY")
+        raise subprocess.CalledProcessError(1, ["sh", "-c"])
+
+    monkeypatch.setattr(pool, "make_overlays", failing_make_overlays)
+    bucket = pool._bucket(base, 10)
+    os.makedirs(bucket)
+    with open(os.path.join(bucket, "leftover.tmp"), "wb") as fh:
+        fh.write(b"HALF")
+
+    assert pool.claim_overlay(base, str(tmp_path / "vm.qcow2"), 10) is False
+    assert os.listdir(bucket) == []  # no .tmp promoted, leftovers removed
+
+
+def test_refill_prunes_buckets_of_an_older_golden(monkeypatch, tmp_path):
+    base, _created = _setup(monkeypatch, tmp_path, 1)
+
+    pool.claim_overlay(base, str(tmp_path / "vm1.qcow2"), 10)
+    pool.claim_overlay(base, str(tmp_path / "vm2.qcow2"), 20)
+    old_10, old_20 = pool._bucket(base, 10), pool._bucket(base, 20)
+    assert os.path.isdir(old_10) and os.path.isdir(old_20)  # other sizes are kept
+
+    os.utime(base, ns=(0, os.stat(base).st_mtime_ns + 10**9))  # golden rebuilt
+    pool.claim_overlay(base, str(tmp_path / "vm3.qcow2"), 10)
+
+    root = os.path.dirname(old_10)
+    assert sorted(os.listdir(root)) == [os.path.basename(pool._bucket(base, 10))]
+    assert not os.path.exists(old_10) and not os.path.exists(old_20)
+
+
+def test_refills_of_different_buckets_do_not_skip_each_other(monkeypatch, tmp_path):
+    base, created = _setup(monkeypatch, tmp_path, 1)
+
+    # A refill of the 10 GiB bucket is in progress...
+    busy = pool._refill_lock(pool._bucket(base, 10))
+    busy.acquire()
+    try:
+        pool.claim_overlay(base, str(tmp_path / "vm1.qcow2"), 10)
+        pool.claim_overlay(base, str(tmp_path / "vm2.qcow2"), 20)
+    finally:
+        busy.release()
+
+    # ...so only its own bucket skipped; the 20 GiB one was still topped up.
+    assert len(created) == 1
+    assert os.listdir(pool._bucket(base, 20)) != []
@@ -1,10 +1,4 @@
-import pathlib
-import sys
-
-_PKG_ROOT = pathlib.Path(__file__).resolve().parent.parent  # vm_service/
-sys.path.insert(0, str(_PKG_ROOT))
-
-from implementations.preview_proxy import (  # noqa: E402
+from implementations.preview_proxy import (
     _dechunk,
     _framing,
     _limit,
@@ -96,3 +90,10 @@ def test_read_head_empty_when_no_header_terminator():
     head, rest = _read_head(chan, 1.0)
     assert head == b""
     assert rest == b""
+
+
+def test_read_head_terminator_split_across_reads():
+    chan = _FakeChan([b"HTTP/1.1 204 No Content\r", b"\n\r", b"\nbody"])
+    head, rest = _read_head(chan, 1.0)
+    assert head == b"HTTP/1.1 204 No Content"
+    assert rest == b"body"
@@ -0,0 +1,54 @@
+import qemu_manager.proc as proc
+
+
+def test_run_checked_resolves_executable_once(monkeypatch):
+    proc._which.cache_clear()
+    lookups = []
+
+    def fake_which(name):
+        lookups.append(name)
+        return f"/opt/bin/{name}"
+
+    runs = []
+
+    def fake_run(args, **kwargs):
+        runs.append((args, kwargs))
+
+    monkeypatch.setattr(proc.shutil, "which", fake_which)
+    monkeypatch.setattr(proc.subprocess, "run", fake_run)
+
+    proc.run_checked(["qemu-img", "info", "x"])
+    proc.run_checked(["qemu-img", "create", "y"])
+
+    assert lookups == ["qemu-img"]  # PATH searched only once
+    assert runs[0][0] == ["/opt/bin/qemu-img", "info", "x"]
+    assert runs[1][1]["check"] is True and runs[1][1]["close_fds"] is False
+    proc._which.cache_clear()
+
+
+def test_which_keeps_paths_and_unknown_names(monkeypatch):
+    proc._which.cache_clear()
+    monkeypatch.setattr(proc.shutil, "which", lambda name: None)
+
+    assert proc._which("/usr/bin/qemu-img") == "/usr/bin/qemu-img"
+    assert proc._which("not-installed") == "not-installed"
+    proc._which.cache_clear()
+
+
+def test_run_checked_keeps_kwargs_that_allow_posix_spawn(monkeypatch):
+    # CPython only takes the posix_spawn path with close_fds off and no
+    # preexec_fn; everything else the caller passes goes through untouched.
+    runs = []
+    monkeypatch.setattr(proc.subprocess, "run", lambda args, **kw: runs.append(kw))
+
+    proc.run_checked(["/bin/true"], capture_output=True, text=True)
+    proc.run_checked(["/bin/true"], close_fds=True)
+
+    assert runs[0] == {
+        "check": True,
+        "close_fds": False,
+        "capture_output": True,
+        "text": True,
+    }
+    assert "preexec_fn" not in runs[0]
+    assert runs[1]["close_fds"] is True  # an explicit choice is respected
@@ -1,6 +1,24 @@
+import pytest
+
 import qemu_manager.qemu_args as qemu_args
 
 
+@pytest.fixture(autouse=True)
+def _clear_lookup_caches():
+    # The resolvers are memoized per process; each test patches their inputs.
+    cached = (
+        qemu_args._find_uefi_firmware_arm64,
+        qemu_args._resolve_qemu_bin_arm64,
+        qemu_args._qemu_datadir_at,
+        qemu_args._usable_cpus,
+    )
+    for fn in cached:
+        fn.cache_clear()
+    yield
+    for fn in cached:
+        fn.cache_clear()
+
+
 def _make_paths(tmp_path):
     console = str(tmp_path / "console.log")
     overlay = str(tmp_path / "disk.qcow2")
@@ -13,9 +31,7 @@ def test_vm_qemu_x86_args_with_kvm(monkeypatch, tmp_path):
     console, overlay, seed, pid = _make_paths(tmp_path)
 
     # Force KVM present
-    monkeypatch.setattr(
-        qemu_args.os.path, "exists", lambda p: True if p == "/dev/kvm" else False
-    )
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: True)
     monkeypatch.setattr(
         qemu_args.settings, "VM_QEMU_BIN", "/usr/bin/qemu-system-x86_64", raising=False
     )
@@ -46,7 +62,7 @@ def test_vm_qemu_x86_args_without_kvm(monkeypatch, tmp_path):
     console, overlay, seed, pid = _make_paths(tmp_path)
 
     # Force no KVM
-    monkeypatch.setattr(qemu_args.os.path, "exists", lambda p: False)
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: False)
     monkeypatch.setattr(
         qemu_args.settings, "VM_QEMU_BIN", "/usr/bin/qemu-system-x86_64", raising=False
     )
@@ -80,11 +96,9 @@ def test_vm_qemu_arm64_args_kvm(monkeypatch, tmp_path):
     )
 
     # Platform and KVM available
-    monkeypatch.setattr(qemu_args.platform, "machine", lambda: "arm64")
-    monkeypatch.setattr(qemu_args.platform, "system", lambda: "Linux")
-    monkeypatch.setattr(
-        qemu_args.os.path, "exists", lambda p: True if p == "/dev/kvm" else False
-    )
+    monkeypatch.setattr(qemu_args, "_host_machine", lambda: "arm64")
+    monkeypatch.setattr(qemu_args, "_host_system", lambda: "Linux")
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: True)
 
     args = qemu_args.vm_qemu_arm64_args(
         vcpus=2,
@@ -115,11 +129,9 @@ def test_vm_qemu_arm64_args_kvm_with_taskset(monkeypatch, tmp_path):
     monkeypatch.setattr(
         qemu_args, "_resolve_qemu_bin_arm64", lambda: "/bin/qemu-system-aarch64"
     )
-    monkeypatch.setattr(qemu_args.platform, "machine", lambda: "arm64")
-    monkeypatch.setattr(qemu_args.platform, "system", lambda: "Linux")
-    monkeypatch.setattr(
-        qemu_args.os.path, "exists", lambda p: True if p == "/dev/kvm" else False
-    )
+    monkeypatch.setattr(qemu_args, "_host_machine", lambda: "arm64")
+    monkeypatch.setattr(qemu_args, "_host_system", lambda: "Linux")
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: True)
 
     # Enable CPU pinning via settings and make taskset resolvable
     monkeypatch.setattr(qemu_args.settings, "VM_TASKSET_CPUS", "0-3", raising=False)
@@ -149,10 +161,14 @@ def test_vm_qemu_arm64_args_hvf_on_darwin(monkeypatch, tmp_path):
         qemu_args, "_resolve_qemu_bin_arm64", lambda: "/bin/qemu-system-aarch64"
     )
 
-    # macOS HVF path, no KVM
-    monkeypatch.setattr(qemu_args.platform, "system", lambda: "Darwin")
-    monkeypatch.setattr(qemu_args.platform, "machine", lambda: "arm64")
-    monkeypatch.setattr(qemu_args.os.path, "exists", lambda p: False)
+    # macOS HVF path: decided without probing for /dev/kvm at all
+    monkeypatch.setattr(qemu_args, "_host_system", lambda: "Darwin")
+    monkeypatch.setattr(qemu_args, "_host_machine", lambda: "arm64")
+
+    def no_kvm_probe():
+        raise AssertionError("/dev/kvm probed on Darwin")
+
+    monkeypatch.setattr(qemu_args, "_kvm_available", no_kvm_probe)
 
     args = qemu_args.vm_qemu_arm64_args(
         vcpus=2,
@@ -181,9 +197,9 @@ def test_vm_qemu_arm64_args_no_kvm_no_hvf(monkeypatch, tmp_path):
     )
 
     # Linux without /dev/kvm (fallback to TCG)
-    monkeypatch.setattr(qemu_args.platform, "system", lambda: "Linux")
-    monkeypatch.setattr(qemu_args.platform, "machine", lambda: "arm64")
-    monkeypatch.setattr(qemu_args.os.path, "exists", lambda p: False)
+    monkeypatch.setattr(qemu_args, "_host_system", lambda: "Linux")
+    monkeypatch.setattr(qemu_args, "_host_machine", lambda: "arm64")
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: False)
 
     args = qemu_args.vm_qemu_arm64_args(
         vcpus=1,
@@ -232,3 +248,123 @@ def test_find_uefi_firmware_arm64_datadir_fallback(monkeypatch):
 
     found = qemu_args._find_uefi_firmware_arm64()
     assert found == "/share/qemu/edk2-aarch64-code.fd"
+
+
+def test_auto_cpuset_round_robins_over_affinity(monkeypatch):
+    monkeypatch.setattr(
+        qemu_args.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3, 4, 5}
+    )
+    monkeypatch.setattr(qemu_args, "_cpuset_next", 0)
+
+    assert qemu_args._auto_cpuset(2) == "0-1"
+    assert qemu_args._auto_cpuset(3) == "2-4"
+    # Wraps around the mask; 1 vCPU still gets a 2-core slice.
+    assert qemu_args._auto_cpuset(1) == "0,5"
+    # Never wider than the cores we may use.
+    assert qemu_args._auto_cpuset(16) == "0-5"
+
+
+def test_auto_cpuset_reads_affinity_once(monkeypatch):
+    calls = []
+
+    def fake_affinity(pid):
+        calls.append(pid)
+        return {0, 1, 2, 3}
+
+    monkeypatch.setattr(qemu_args.os, "sched_getaffinity", fake_affinity)
+    monkeypatch.setattr(qemu_args, "_cpuset_next", 0)
+
+    assert qemu_args._auto_cpuset(2) == "0-1"
+    assert qemu_args._auto_cpuset(2) == "2-3"
+    assert calls == [0]
+
+
+def test_vm_qemu_arm64_args_kvm_with_auto_taskset(monkeypatch, tmp_path):
+    console, overlay, seed, pid = _make_paths(tmp_path)
+
+    monkeypatch.setattr(qemu_args, "_find_uefi_firmware_arm64", lambda: "/fw/uefi.fd")
+    monkeypatch.setattr(
+        qemu_args, "_resolve_qemu_bin_arm64", lambda: "/bin/qemu-system-aarch64"
+    )
+    monkeypatch.setattr(qemu_args, "_host_machine", lambda: "arm64")
+    monkeypatch.setattr(qemu_args, "_host_system", lambda: "Linux")
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: True)
+    monkeypatch.setattr(qemu_args.settings, "VM_TASKSET_CPUS", "auto", raising=False)
+    monkeypatch.setattr(qemu_args.shutil, "which", lambda name: "/usr/bin/taskset")
+    monkeypatch.setattr(qemu_args, "_auto_cpuset", lambda vcpus: f"slice-{vcpus}")
+
+    args = qemu_args.vm_qemu_arm64_args(
+        vcpus=4,
+        mem_mib=1024,
+        console_log=console,
+        port=2222,
+        overlay=overlay,
+        seed_iso=seed,
+        pidfile=pid,
+    )
+
+    assert args[0:3] == ["taskset", "-c", "slice-4"]
+
+
+def test_qemu_datadir_cached_on_disk(monkeypatch, tmp_path):
+    qemu_bin = tmp_path / "qemu-system-aarch64"
+    qemu_bin.write_text("#!/bin/sh\n")
+    monkeypatch.setattr(
+        qemu_args, "_DATADIR_CACHE_PATH", str(tmp_path / "cache" / "datadir.json")
+    )
+
+    probes = []
+
+    def fake_probe(q):
+        probes.append(q)
+        return "/share/qemu"
+
+    monkeypatch.setattr(qemu_args, "_probe_qemu_datadir", fake_probe)
+
+    assert qemu_args._qemu_datadir(str(qemu_bin)) == "/share/qemu"
+    assert qemu_args._qemu_datadir(str(qemu_bin)) == "/share/qemu"
+    assert len(probes) == 1  # second lookup served from the cache
+
+    # A fresh process (empty in-memory memo) still reads the disk cache.
+    qemu_args._qemu_datadir_at.cache_clear()
+    assert qemu_args._qemu_datadir(str(qemu_bin)) == "/share/qemu"
+    assert len(probes) == 1
+
+    # Replacing the binary (new mtime) invalidates the entry.
+    import os
+
+    st = os.stat(qemu_bin)
+    os.utime(qemu_bin, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert qemu_args._qemu_datadir(str(qemu_bin)) == "/share/qemu"
+    assert len(probes) == 2
+
+
+def test_cellar_firmware_picks_newest_version(tmp_path):
+    cellar = tmp_path / "Cellar" / "qemu"
+    for version in ("8.2.0", "9.1.2", "9.0.1"):
+        fw = cellar / version / "share" / "qemu"
+        fw.mkdir(parents=True)
+        if version != "9.1.2":
+            (fw / "edk2-aarch64-code.fd").write_bytes(b"fw")
+
+    # Newest version without firmware is skipped; falls back to the next one.
+    found = qemu_args._cellar_firmware(str(cellar))
+    assert found == str(cellar / "9.0.1" / "share" / "qemu" / "edk2-aarch64-code.fd")
+    assert qemu_args._cellar_firmware(str(tmp_path / "missing")) is None
+
+
+def test_kvm_available_probes_dev_kvm_once(monkeypatch):
+    calls = []
+
+    def fake_exists(path):
+        calls.append(path)
+        return True
+
+    monkeypatch.setattr(qemu_args.os.path, "exists", fake_exists)
+    qemu_args._kvm_available.cache_clear()
+    try:
+        assert qemu_args._kvm_available() is True
+        assert qemu_args._kvm_available() is True
+        assert calls == ["/dev/kvm"]
+    finally:
+        qemu_args._kvm_available.cache_clear()
@@ -1,4 +1,5 @@
 import os
+import subprocess
 import types
 import pytest
 
@@ -6,8 +7,23 @@ import models
 import qemu_manager.vm as qvm
 
 
+def _settings(**overrides):
+    """Stand-in for the settings module with what start_vm reads."""
+    values = dict(
+        VM_BASE_IMAGE="/img/base.qcow2",
+        VM_SSH_USER="root",
+        VM_SSH_PRIVKEY="/keys/id_vm",
+        VM_TIMEOUT_BOOT_S=5,
+        VM_USE_CLOUD_INIT=True,
+        VM_RUN_AS_UID=None,
+        VM_RUN_AS_GID=None,
+    )
+    values.update(overrides)
+    return types.SimpleNamespace(**values)
+
+
 class FakePopen:
-    def __init__(self, args, stdout=None, stderr=None, preexec_fn=None):
+    def __init__(self, args, stdout=None, stderr=None, **kwargs):
         self.args = args
         self._rc = None
         # emulate a file-like with read() in failure path
@@ -24,17 +40,11 @@ def test_start_vm_success_x86(monkeypatch, tmp_path):
     workdir = str(tmp_path / "wd")
     os.makedirs(workdir, exist_ok=True)
 
-    # Settings
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "root", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 5, raising=False)
-    # Disable ownership/perms adjustments
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", None, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", None, raising=False)
+    # Settings (no VM_RUN_AS_UID/GID: ownership/perms adjustments are skipped)
+    monkeypatch.setattr(qvm, "settings", _settings())
 
     # Platform and port
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "x86_64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2200)
 
     # Spy on qemu args builder
@@ -69,12 +79,12 @@ def test_start_vm_success_x86(monkeypatch, tmp_path):
     # Popen and wait_ssh
     popen_calls = {}
 
-    def fake_popen(args, stdout=None, stderr=None, preexec_fn=None):
+    def fake_popen(args, stdout=None, stderr=None, **kwargs):
         popen_calls["args"] = list(args)
         popen_calls["stdout"] = stdout
         popen_calls["stderr"] = stderr
-        popen_calls["preexec_fn"] = preexec_fn
-        return FakePopen(args, stdout, stderr, preexec_fn)
+        popen_calls["kwargs"] = kwargs
+        return FakePopen(args, stdout, stderr)
 
     monkeypatch.setattr(qvm.subprocess, "Popen", fake_popen)
     monkeypatch.setattr(qvm, "wait_ssh", lambda **kwargs: True)
@@ -123,8 +133,9 @@ def test_start_vm_success_x86(monkeypatch, tmp_path):
         os.path.basename(workdir),
     )
 
-    # Popen called with our args and preexec_fn passed
+    # Popen called with our args; no uid/gid to switch to, so no preexec_fn
     assert popen_calls["args"] == ["QEMU-X86", "-dummy"]
+    assert popen_calls["kwargs"] == {"start_new_session": True, "umask": 0o002}
 
     # Stale pidfile removed by _clear_stale_pidfile
     assert not os.path.exists(pidfile)
@@ -134,16 +145,10 @@ def test_start_vm_skips_seed_when_cloud_init_disabled(monkeypatch, tmp_path):
     workdir = str(tmp_path / "wd")
     os.makedirs(workdir, exist_ok=True)
 
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "root", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 5, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", None, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", None, raising=False)
     # Pre-baked golden image: cloud-init disabled.
-    monkeypatch.setattr(qvm.settings, "VM_USE_CLOUD_INIT", False, raising=False)
+    monkeypatch.setattr(qvm, "settings", _settings(VM_USE_CLOUD_INIT=False))
 
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "x86_64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2200)
 
     captured = {}
@@ -175,7 +180,7 @@ def test_start_vm_skips_seed_when_cloud_init_disabled(monkeypatch, tmp_path):
 def test_x86_args_omit_seed_drive_when_empty(monkeypatch, tmp_path):
     import qemu_manager.qemu_args as qemu_args
 
-    monkeypatch.setattr(qemu_args.os.path, "exists", lambda p: False)
+    monkeypatch.setattr(qemu_args, "_kvm_available", lambda: False)
     monkeypatch.setattr(
         qemu_args.settings, "VM_QEMU_BIN", "/usr/bin/qemu-system-x86_64", raising=False
     )
@@ -199,15 +204,10 @@ def test_start_vm_timeout_shows_tail(monkeypatch, tmp_path):
     os.makedirs(workdir, exist_ok=True)
 
     # Settings
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "root", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 2, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", None, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", None, raising=False)
+    monkeypatch.setattr(qvm, "settings", _settings(VM_TIMEOUT_BOOT_S=2))
 
     # Platform to x86
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "x86_64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2300)
 
     # Args, overlay/seed
@@ -225,26 +225,44 @@ def test_start_vm_timeout_shows_tail(monkeypatch, tmp_path):
         lambda **kwargs: (_ for _ in ()).throw(TimeoutError("SSH timeout")),
     )
 
-    # Capture tail subprocess.run call
-    run_calls = {}
+    # Capture the tail read
+    tail_calls = {}
 
-    def fake_run(args, capture_output=False, text=False, check=False):
-        run_calls["args"] = args
-        run_calls["capture_output"] = capture_output
-        run_calls["text"] = text
-        run_calls["check"] = check
-        return types.SimpleNamespace(stdout="console tail")
+    def fake_tail(path, n=120):
+        tail_calls["path"] = path
+        tail_calls["n"] = n
+        return "console tail"
 
-    monkeypatch.setattr(qvm.subprocess, "run", fake_run)
+    monkeypatch.setattr(qvm, "tail_file", fake_tail)
 
     with pytest.raises(TimeoutError):
         _ = qvm.start_vm(workdir, vcpus=1, mem_mib=512, disk_gib=4, vm_id="vm-2")
 
     console_log_path = os.path.join(workdir, "console.log")
-    assert run_calls["args"] == ["tail", "-n", "120", console_log_path]
-    assert run_calls["capture_output"] is True
-    assert run_calls["text"] is True
-    assert run_calls["check"] is True
+    assert tail_calls == {"path": console_log_path, "n": 120}
+
+
+def test_tail_file_returns_last_lines(tmp_path):
+    log = tmp_path / "console.log"
+    log.write_bytes(b"".join(b"line %d\n" % i for i in range(20000)) + b"\xff end\n")
+
+    out = qvm.tail_file(str(log), n=3)
+    assert out == "line 19998\nline 19999\n\ufffd end"
+    assert qvm.tail_file(str(log), n=1) == "\ufffd end"
+
+
+def test_tail_file_never_returns_a_partial_first_line(monkeypatch, tmp_path):
+    monkeypatch.setattr(qvm, "_TAIL_BYTES", 0)  # window = n * 200 = 400 bytes
+    log = tmp_path / "console.log"
+
+    # The window starts inside the long first line: only the full line comes
+    # back, even though fewer than the 2 lines asked for fit.
+    log.write_bytes(b"a" * 500 + b"\n" + b"b" * 10 + b"\n")
+    assert qvm.tail_file(str(log), n=2) == "b" * 10
+
+    # A window that starts exactly on a line keeps that line.
+    log.write_bytes(b"a" * 99 + b"\n" + b"b" * 399 + b"\n")
+    assert qvm.tail_file(str(log), n=2) == "b" * 399
 
 
 def test_start_vm_uses_arm64_args(monkeypatch, tmp_path):
@@ -252,15 +270,10 @@ def test_start_vm_uses_arm64_args(monkeypatch, tmp_path):
     os.makedirs(workdir, exist_ok=True)
 
     # Settings
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "ubuntu", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 5, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", None, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", None, raising=False)
+    monkeypatch.setattr(qvm, "settings", _settings(VM_SSH_USER="ubuntu"))
 
     # Platform arm64 triggers arm args
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "arm64")
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "arm64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2400)
 
     # Spy arm64 args
@@ -308,14 +321,11 @@ def test_start_vm_ensures_paths_when_uid_gid_set(monkeypatch, tmp_path):
     os.makedirs(workdir, exist_ok=True)
 
     # Set run as UID/GID so _ensure_paths_for_vm is invoked
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", 1000, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", 1000, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "root", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 5, raising=False)
-
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(
+        qvm, "settings", _settings(VM_RUN_AS_UID=1000, VM_RUN_AS_GID=1000)
+    )
+
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "x86_64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2500)
     monkeypatch.setattr(qvm, "vm_qemu_x86_args", lambda *a, **k: ["QEMU-X86", "-dummy"])
     monkeypatch.setattr(qvm, "make_overlay", lambda *a, **k: None)
@@ -347,20 +357,11 @@ def test_start_vm_ensures_paths_when_uid_gid_set(monkeypatch, tmp_path):
     assert console_log_path in seen["ensure"]["files"]
 
 
-def _base_settings(monkeypatch):
-    monkeypatch.setattr(qvm.settings, "VM_BASE_IMAGE", "/img/base.qcow2", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_USER", "root", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_SSH_PRIVKEY", "/keys/id_vm", raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_TIMEOUT_BOOT_S", 5, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_UID", None, raising=False)
-    monkeypatch.setattr(qvm.settings, "VM_RUN_AS_GID", None, raising=False)
-
-
 def test_start_vm_adopts_running_vm(monkeypatch, tmp_path):
     """A live QEMU already owning the pidfile is adopted, not duplicated."""
     workdir = str(tmp_path / "wd")
     os.makedirs(workdir, exist_ok=True)
-    _base_settings(monkeypatch)
+    monkeypatch.setattr(qvm, "settings", _settings())
 
     pidfile = os.path.join(workdir, "qemu.pid")
     with open(pidfile, "w", encoding="utf-8") as f:
@@ -393,8 +394,8 @@ def test_start_vm_relaunches_when_running_vm_unusable(monkeypatch, tmp_path):
     """A live QEMU we can't adopt is killed, then a clean VM is launched."""
     workdir = str(tmp_path / "wd")
     os.makedirs(workdir, exist_ok=True)
-    _base_settings(monkeypatch)
-    monkeypatch.setattr(qvm.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(qvm, "settings", _settings())
+    monkeypatch.setattr(qvm, "_host_machine", lambda: "x86_64")
     monkeypatch.setattr(qvm, "pick_free_port", lambda: 2200)
     monkeypatch.setattr(qvm, "vm_qemu_x86_args", lambda **kw: ["QEMU-X86", "-dummy"])
     monkeypatch.setattr(qvm, "make_overlay", lambda *a, **k: None)
@@ -414,9 +415,9 @@ def test_start_vm_relaunches_when_running_vm_unusable(monkeypatch, tmp_path):
 
     launched = {"v": False}
 
-    def fake_popen(args, stdout=None, stderr=None, preexec_fn=None):
+    def fake_popen(args, stdout=None, stderr=None, **kwargs):
         launched["v"] = True
-        return FakePopen(args, stdout, stderr, preexec_fn)
+        return FakePopen(args, stdout, stderr)
 
     monkeypatch.setattr(qvm.subprocess, "Popen", fake_popen)
 
@@ -426,3 +427,104 @@ def test_start_vm_relaunches_when_running_vm_unusable(monkeypatch, tmp_path):
     assert launched["v"] is True
     assert proc.proc is not None
     assert proc.port_ssh == 2200
+
+
+@pytest.mark.parametrize("use_pidfd", [True, False])
+def test_wait_pid_exit_returns_when_process_dies(monkeypatch, use_pidfd):
+    import subprocess
+    import time
+
+    if not use_pidfd:
+        monkeypatch.delattr(qvm.os, "pidfd_open", raising=False)
+    elif not hasattr(os, "pidfd_open"):
+        pytest.skip("no pidfd_open on this platform")
+
+    p = subprocess.Popen(["sleep", "5"])
+    try:
+        assert qvm._wait_pid_exit(p.pid, 0.05) is False
+        p.terminate()
+        if not use_pidfd:
+            p.wait()  # reap: kill(pid, 0) still sees an unreaped zombie
+        t0 = time.monotonic()
+        assert qvm._wait_pid_exit(p.pid, 3.0) is True
+        assert time.monotonic() - t0 < 1.0
+    finally:
+        p.kill()
+        p.wait()
+
+
+@pytest.mark.parametrize("parallel_min", [64, 1])
+def test_ensure_owner_and_perms_skips_noop_syscalls(
+    monkeypatch, tmp_path, parallel_min
+):
+    monkeypatch.setattr(qvm, "_PERMS_PARALLEL_MIN", parallel_min)
+    wd = tmp_path / "wd"
+    (wd / "sub").mkdir(parents=True)
+    for name in ("disk.qcow2", "console.log"):
+        (wd / name).write_bytes(b"")
+        os.chmod(wd / name, 0o600)
+    uid, gid = os.getuid(), os.getgid()
+
+    calls = []
+    real_chmod = os.chmod
+    monkeypatch.setattr(qvm.os, "chown", lambda *a, **kw: calls.append(("chown", a)))
+    monkeypatch.setattr(
+        qvm.os,
+        "chmod",
+        lambda p, m, **kw: calls.append(("chmod", p)) or real_chmod(p, m, **kw),
+    )
+
+    qvm._ensure_owner_and_perms(str(wd), uid, gid)
+    assert os.stat(wd / "disk.qcow2").st_mode & 0o777 == 0o664
+    if qvm._PERMS_DIR_FD:
+        # Entries are fixed by name relative to the directory's fd.
+        assert sorted(p for _, p in calls) == [
+            str(wd),
+            "console.log",
+            "disk.qcow2",
+            "sub",
+        ]
+    assert os.stat(wd / "sub").st_mode & 0o777 == 0o775
+    assert not [c for c in calls if c[0] == "chown"]  # already owned by us
+
+    calls.clear()
+    qvm._ensure_owner_and_perms(str(wd), uid, gid)
+    assert calls == []  # second pass: nothing to change, no syscalls
+
+
+def test_vm_paths_match_os_path_join():
+    for workdir in ("/srv/vms/vm-1", "/srv/vms/vm-1/", "/"):
+        paths = qvm._vm_paths(workdir)
+        assert paths.overlay == os.path.join(workdir, "disk.qcow2")
+        assert paths.seed_iso == os.path.join(workdir, "seed.iso")
+        assert paths.console_log == os.path.join(workdir, "console.log")
+        assert paths.pidfile == os.path.join(workdir, "qemu.pid")
+
+
+@pytest.mark.parametrize("use_proc", [True, False])
+def test_pid_alive(monkeypatch, use_proc):
+    monkeypatch.setattr(qvm, "_PROC_PIDS", use_proc and os.path.isdir("/proc/self"))
+    assert qvm._pid_alive(os.getpid()) is True
+
+    child = subprocess.Popen(["true"])
+    child.wait()  # reaped: the pid no longer exists
+    assert qvm._pid_alive(child.pid) is False
+
+
+def test_spawn_qemu_only_uses_preexec_fn_to_switch_users(monkeypatch):
+    calls = []
+
+    def fake_popen(args, **kwargs):
+        calls.append(kwargs)
+        return FakePopen(args, **kwargs)
+
+    monkeypatch.setattr(qvm.subprocess, "Popen", fake_popen)
+
+    qvm._spawn_qemu(["qemu"], None, None)
+    qvm._spawn_qemu(["qemu"], 1000, 1000)
+
+    pipes = {"stdout": subprocess.PIPE, "stderr": subprocess.STDOUT}
+    assert calls == [
+        {**pipes, "start_new_session": True, "umask": 0o002},
+        {**pipes, "preexec_fn": qvm._drop_privs},
+    ]
@@ -1,5 +1,7 @@
+import re
 import types
 from contextlib import contextmanager
+from dataclasses import dataclass
 
 import pytest
 
@@ -17,12 +19,16 @@ def _fake_borrow(cli=None, sftp=None):
     return _cm
 
 
+@dataclass(slots=True)
 class FakeSFTPFile:
-    def __init__(self, data: bytes):
-        self._data = data
+    _data: bytes
+    _pos: int = 0
 
-    def read(self) -> bytes:
-        return self._data
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._pos + size
+        out = self._data[self._pos : end]
+        self._pos += len(out)
+        return out
 
     def __enter__(self):
         return self
@@ -31,14 +37,19 @@ class FakeSFTPFile:
         return False
 
 
+# Shared stat results: the fakes hand out the same namespace on every call.
+_DIR_STAT = types.SimpleNamespace(st_mode=0o040755)
+_FILE_STAT = types.SimpleNamespace(st_mode=0o100644)
+
+
 class FakeSFTP:
     def __init__(
         self, files: dict[str, bytes] | None = None, dirs: set[str] | None = None
     ):
         # files maps absolute path -> bytes
         self._files = files or {}
-        # dirs is a set of absolute dir paths (no trailing slash enforced)
-        self._dirs = {d.rstrip("/") for d in (dirs or set())}
+        # dirs holds absolute dir paths, normalized once (no trailing slash)
+        self._dirs = frozenset(d.rstrip("/") for d in (dirs or ()))
 
     # read_from_vm uses `.file(path, "rb")` as context manager
     def file(self, path: str, mode: str = "rb"):
@@ -51,12 +62,10 @@ class FakeSFTP:
         return FakeSFTPFile(b"")
 
     def stat(self, path: str):
-        # simulate directory if path is in dirs
-        norm = path.rstrip("/")
-        if norm in self._dirs:
-            return types.SimpleNamespace(st_mode="040000")  # directory
         if path in self._files:
-            return types.SimpleNamespace(st_mode="100644")  # regular file
+            return _FILE_STAT
+        if path in self._dirs or path.rstrip("/") in self._dirs:
+            return _DIR_STAT
         # treat unknown path as not found
         raise FileNotFoundError(path)
 
@@ -66,18 +75,14 @@ class FakeSFTP:
         return path
 
     def mkdir(self, path: str):
-        self._dirs.add(path.rstrip("/"))
+        self._dirs = self._dirs | {path.rstrip("/")}
 
     def chmod(self, path: str, mode: int):
         return None
 
 
-class FakeStdout:
-    def __init__(self, data: bytes):
-        self._data = data
-
-    def read(self) -> bytes:
-        return self._data
+# exec_command's stdout/stderr expose the same read(size) interface.
+FakeStdout = FakeSFTPFile
 
 
 class FakeSSH:
@@ -87,17 +92,30 @@ class FakeSSH:
         default: tuple[bytes, bytes] = (b"", b""),
     ):
         """
-        responses: maps a substring key to (stdout, stderr) bytes. First matching substring in command wins.
+        responses: maps a substring key to (stdout, stderr) bytes. The key found
+            earliest in the command wins.
         default: returned if no key matches.
         """
         self._responses = responses or {}
         self._default = default
+        # All keys in one alternation: a single scan of the command per call.
+        self._pattern = (
+            re.compile("|".join(map(re.escape, self._responses)))
+            if self._responses
+            else None
+        )
 
     def exec_command(self, command: str):
-        for key, (out, err) in self._responses.items():
-            if key in command:
-                return None, FakeStdout(out), FakeStdout(err)
-        return None, FakeStdout(self._default[0]), FakeStdout(self._default[1])
+        m = self._pattern.search(command) if self._pattern else None
+        out, err = self._responses[m.group(0)] if m else self._default
+        return None, FakeStdout(out), FakeStdout(err)
+
+
+@pytest.fixture(autouse=True)
+def _clear_zip_cache():
+    read_from_vm._zip_cache.clear()
+    yield
+    read_from_vm._zip_cache.clear()
 
 
 @pytest.fixture
@@ -115,13 +133,8 @@ def vm_record(tmp_path):
 
 
 def test_list_dirs_parses_find_output(monkeypatch, vm_record):
-    # Simulate the `find` output: path||type-char
-    stdout = (
-        b"/app||d\n"
-        b"/app/dir1||d\n"
-        b"/app/dir1/file1.txt||f\n"
-        b"/app/file2.log||f\n"
-    )
+    # Simulate the `find` output: type-char + path, NUL-terminated
+    stdout = b"d/app\0" b"d/app/dir1\0" b"f/app/dir1/file1.txt\0" b"f/app/file2.log\0"
     cli = FakeSSH(responses={"find ": (stdout, b"")})
 
     # The impl borrows a pooled connection; patch that seam to yield our fake cli.
@@ -143,7 +156,7 @@ def test_list_dirs_parses_find_output(monkeypatch, vm_record):
 
 
 def test_list_dir_single_path(monkeypatch, vm_record):
-    stdout = b"/home||d\n/home/readme.md||f\n"
+    stdout = b"d/home\0f/home/readme.md\0"
     cli = FakeSSH(responses={"find ": (stdout, b"")})
     monkeypatch.setattr(read_from_vm, "borrow", _fake_borrow(cli=cli), raising=False)
 
@@ -153,6 +166,22 @@ def test_list_dir_single_path(monkeypatch, vm_record):
     assert "readme.md" in names
 
 
+def test_list_dir_names_with_newlines_and_separators(monkeypatch, vm_record):
+    stdout = b"d/srv\0d/srv/a||b\0f/srv/two\nlines.txt\0l/srv/link\0"
+    cli = FakeSSH(responses={"find ": (stdout, b"")})
+    monkeypatch.setattr(read_from_vm, "borrow", _fake_borrow(cli=cli), raising=False)
+
+    types_by_path = {
+        it.path: it.path_type for it in read_from_vm.list_dir(vm_record, "/srv")
+    }
+    assert types_by_path == {
+        "/srv": "directory",
+        "/srv/a||b": "directory",
+        "/srv/two\nlines.txt": "file",
+        "/srv/link": "file",
+    }
+
+
 def test_read_file_found(monkeypatch, vm_record):
     sftp = FakeSFTP(files={"/etc/hosts": b"127.0.0.1 localhost\n"})
     monkeypatch.setattr(read_from_vm, "borrow", _fake_borrow(sftp=sftp), raising=False)
@@ -179,7 +208,7 @@ def test_download_file_success(monkeypatch, vm_record):
 
     resp = read_from_vm.download_file(vm_record, "/app/hello.txt")
     assert resp is not None
-    assert resp["content"] == b"hello world"
+    assert b"".join(resp["content"]) == b"hello world"
     assert resp["media_type"] in ("text/plain", "application/octet-stream")
     assert "hello.txt" in resp["headers"].get("Content-Disposition", "")
 
@@ -211,7 +240,7 @@ def test_download_folder_zip_success(monkeypatch, vm_record):
 
     resp = read_from_vm.download_folder(vm_record, "/app", "zip")
     assert resp is not None
-    assert resp["content"] == b"ZIPDATA"
+    assert b"".join(resp["content"]) == b"ZIPDATA"
     assert resp["media_type"] == "application/zip"
     assert 'filename="app.zip"' in resp["headers"].get("Content-Disposition", "")
 
@@ -230,7 +259,7 @@ def test_download_folder_tar_gz_when_zip_unavailable(monkeypatch, vm_record):
 
     resp = read_from_vm.download_folder(vm_record, "/data", "zip")
     assert resp is not None
-    assert resp["content"] == b"TARDATA"
+    assert b"".join(resp["content"]) == b"TARDATA"
     assert resp["media_type"] == "application/gzip"
     assert 'filename="data.tar.gz"' in resp["headers"].get("Content-Disposition", "")
 
@@ -258,3 +287,56 @@ def test_download_folder_empty_output_returns_none(monkeypatch, vm_record):
 
     resp = read_from_vm.download_folder(vm_record, "/app", "zip")
     assert resp is None
+
+
+def test_download_file_streams_in_chunks(monkeypatch, vm_record):
+    sftp = FakeSFTP(files={"/app/big.bin": b"abcdefghij"})
+    monkeypatch.setattr(read_from_vm, "borrow", _fake_borrow(sftp=sftp), raising=False)
+    monkeypatch.setattr(read_from_vm, "_DOWNLOAD_CHUNK", 4)
+
+    resp = read_from_vm.download_file(vm_record, "/app/big.bin")
+    assert resp is not None
+    assert list(resp["content"]) == [b"abcd", b"efgh", b"ij"]
+
+
+def test_download_folder_keeps_connection_until_streamed(monkeypatch, vm_record):
+    monkeypatch.setattr(read_from_vm, "_zip_available", lambda cli: True, raising=False)
+    monkeypatch.setattr(read_from_vm, "_DOWNLOAD_CHUNK", 3)
+    sftp = FakeSFTP(files={}, dirs={"/app"})
+    cli = FakeSSH(responses={"zip -r - .": (b"ZIPDATA", b"")})
+    returned = []
+
+    @contextmanager
+    def _borrow(container):
+        yield types.SimpleNamespace(cli=cli, sftp=sftp)
+        returned.append(container.id)
+
+    monkeypatch.setattr(read_from_vm, "borrow", _borrow, raising=False)
+
+    resp = read_from_vm.download_folder(vm_record, "/app", "zip")
+    assert resp is not None
+    assert returned == []  # still borrowed while the body is pending
+    assert list(resp["content"]) == [b"ZIP", b"DAT", b"A"]
+    assert returned == ["vm-test"]
+
+
+def test_zip_probe_is_cached_per_vm(monkeypatch, vm_record):
+    probes = []
+
+    def fake_probe(cli):
+        probes.append(cli)
+        return True
+
+    monkeypatch.setattr(read_from_vm, "_zip_available", fake_probe)
+    cli = object()
+
+    assert read_from_vm._zip_available_cached(vm_record.id, cli) is True
+    assert read_from_vm._zip_available_cached(vm_record.id, cli) is True
+    assert len(probes) == 1
+
+    # Expired entries and stopped VMs are probed again.
+    monkeypatch.setattr(read_from_vm, "_ZIP_TTL_S", 0.0)
+    assert read_from_vm._zip_available_cached(vm_record.id, cli) is True
+    assert len(probes) == 2
+    read_from_vm.clear_zip_cache(vm_record.id)
+    assert vm_record.id not in read_from_vm._zip_cache
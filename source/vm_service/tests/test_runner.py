@@ -1,4 +1,6 @@
+import dataclasses
 import os
+import threading
 import time
 
 import pytest
@@ -12,6 +14,10 @@ from implementations import RedisStore as _RedisStore
 class InMemoryStore(_RedisStore):
     def __init__(self):
         self._data: dict[str, models.VMRecord] = {}
+        # Signalled by set_status, so tests wake on the transition itself instead
+        # of polling the record.
+        self._events: dict[tuple[str, models.VMState], threading.Event] = {}
+        self._lock = threading.Lock()
 
     def put(self, vm: models.VMRecord) -> None:
         vm.updated_at = time.time()
@@ -31,33 +37,49 @@ class InMemoryStore(_RedisStore):
         vm.state = status
         vm.error_reason = error_reason
         self.put(vm)
-
-
-def wait_until(predicate, timeout=2.0, interval=0.01):
-    end = time.time() + timeout
-    while time.time() < end:
-        if predicate():
-            return True
-        time.sleep(interval)
-    return False
-
-
-@pytest.fixture
-def base_env(tmp_path, monkeypatch):
-    base_dir = tmp_path / "vm_data"
-    os.makedirs(base_dir, exist_ok=True)
-    monkeypatch.setattr(settings, "VM_BASE_DIR", str(base_dir), raising=False)
-    monkeypatch.setattr(settings, "VM_SSH_USER", "testuser", raising=False)
-    return str(base_dir)
-
-
-@pytest.fixture
+        with self._lock:
+            event = self._events.get((vm.id, status))
+        if event is not None:
+            event.set()
+
+    def wait_for(
+        self, vm_id: str, status: models.VMState, timeout: float = 2.0
+    ) -> bool:
+        """Block until ``vm_id`` reaches ``status``; False if ``timeout`` passes."""
+        with self._lock:
+            vm = self._data.get(vm_id)
+            if vm is not None and vm.state == status:
+                return True
+            event = self._events.setdefault((vm_id, status), threading.Event())
+        return event.wait(timeout)
+
+
+# Module-scoped: the base dir, settings patch and Runner are built once for the
+# file. Every test uses its own vm_id, so workdirs never collide.
+@pytest.fixture(scope="module")
+def base_env(tmp_path_factory):
+    base_dir = tmp_path_factory.mktemp("vm_data")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "VM_BASE_DIR", str(base_dir), raising=False)
+        mp.setattr(settings, "VM_SSH_USER", "testuser", raising=False)
+        yield str(base_dir)
+
+
+@pytest.fixture(scope="module")
 def store_and_runner(base_env):
     store = InMemoryStore()
     runner = Runner(store, node_name="test-node")
     return store, runner
 
 
+@pytest.fixture(autouse=True)
+def _reset_store(store_and_runner):
+    store, runner = store_and_runner
+    store._data.clear()
+    store._events.clear()
+    runner._procs.clear()
+
+
 def _make_vm(runner: Runner, vm_id: str = "vm-1") -> models.VMRecord:
     wd = runner.workdir(vm_id)
     return models.VMRecord(
@@ -99,7 +121,7 @@ def test_start_success_sets_running_and_ports(monkeypatch, store_and_runner):
     t0 = time.time()
     runner.start(vm)
 
-    assert wait_until(lambda: vm.state == models.VMState.running, timeout=2.0)
+    assert store.wait_for(vm.id, models.VMState.running)
     assert vm.ssh_port == 2222
     assert vm.ssh_user == "testuser"
     assert vm.proc is not None and vm.proc.port_ssh == 2222
@@ -118,7 +140,7 @@ def test_start_failure_sets_error(monkeypatch, store_and_runner):
     store.put(vm)
     runner.start(vm)
 
-    assert wait_until(lambda: vm.state == models.VMState.error, timeout=2.0)
+    assert store.wait_for(vm.id, models.VMState.error)
     assert "boom-start" in (vm.error_reason or "")
 
 
@@ -145,18 +167,18 @@ def test_stop_with_pidfile_kills_and_removes_pidfile(
     )
     vm.state = models.VMState.running
 
-    calls = []
+    killed_pids: set[int] = set()
 
     def fake_killpg(pid, sig):
-        calls.append((pid, sig))
+        killed_pids.add(pid)
 
     monkeypatch.setattr(os, "killpg", fake_killpg)
 
     runner.stop(vm, cleanup_disks=False)
 
-    assert wait_until(lambda: vm.state == models.VMState.stopped, timeout=2.0)
+    assert store.wait_for(vm.id, models.VMState.stopped)
     # Should have tried to kill the pid via os.killpg at least once
-    assert any(pid == 12345 for pid, _ in calls)
+    assert 12345 in killed_pids
     # pidfile should be removed
     assert not os.path.exists(pidfile_path)
 
@@ -201,12 +223,80 @@ def test_stop_without_pidfile_uses_popen(monkeypatch, store_and_runner, base_env
 
     runner.stop(vm, cleanup_disks=False)
 
-    assert wait_until(lambda: vm.state == models.VMState.stopped, timeout=2.0)
+    assert store.wait_for(vm.id, models.VMState.stopped)
     assert fp.terminated is True
     # kill shouldn't be necessary if wait returns promptly
     assert fp.killed is False
 
 
+def test_stop_uses_pid_cached_at_start(monkeypatch, store_and_runner, base_env):
+    store, runner = store_and_runner
+
+    def fake_start_vm(workdir, vcpus, mem_mib, disk_gib, vm_id):
+        return models.VMProc(
+            workdir=workdir,
+            overlay=os.path.join(workdir, "disk.qcow2"),
+            seed_iso=os.path.join(workdir, "seed.iso"),
+            port_ssh=2222,
+            pidfile=os.path.join(workdir, "qemu.pid"),
+            pid=4242,
+        )
+
+    monkeypatch.setattr("implementations.runner.start_vm", fake_start_vm)
+    monkeypatch.setattr("implementations.runner._wait_pid_exit", lambda p, t: True)
+    monkeypatch.setattr("implementations.runner._pid_alive", lambda p: p == 4242)
+    killed_pids: set[int] = set()
+    monkeypatch.setattr(os, "killpg", lambda pid, sig: killed_pids.add(pid))
+
+    vm = _make_vm(runner, "vm-cached-pid")
+    store.put(vm)
+    runner.start(vm)
+    assert store.wait_for(vm.id, models.VMState.running)
+
+    # Records coming back from Redis carry no proc and there is no pidfile to read:
+    # the handle kept by the runner still knows which process group to kill.
+    fresh = dataclasses.replace(vm, proc=None)
+    runner.stop(fresh, cleanup_disks=False)
+
+    assert store.wait_for(fresh.id, models.VMState.stopped)
+    assert killed_pids == {4242}
+
+
+def test_stop_ignores_cached_pid_of_exited_qemu(
+    monkeypatch, store_and_runner, base_env
+):
+    store, runner = store_and_runner
+    vm = _make_vm(runner, "vm-stale-pid")
+    store.put(vm)
+
+    pidfile_path = os.path.join(base_env, "vms", vm.id, "qemu.pid")
+    os.makedirs(os.path.dirname(pidfile_path), exist_ok=True)
+    with open(pidfile_path, "w", encoding="utf-8") as f:
+        f.write("5151")
+
+    class ExitedPopen:
+        def poll(self):
+            return 0  # QEMU is gone; its old pid may now be someone else's
+
+    vm.proc = models.VMProc(
+        workdir=vm.workdir,
+        overlay=os.path.join(vm.workdir, "disk.qcow2"),
+        seed_iso=os.path.join(vm.workdir, "seed.iso"),
+        port_ssh=2222,
+        proc=ExitedPopen(),
+        pidfile=pidfile_path,
+        pid=4242,
+    )
+    monkeypatch.setattr("implementations.runner._wait_pid_exit", lambda p, t: True)
+    killed_pids: set[int] = set()
+    monkeypatch.setattr(os, "killpg", lambda pid, sig: killed_pids.add(pid))
+
+    runner.stop(vm, cleanup_disks=False)
+
+    assert store.wait_for(vm.id, models.VMState.stopped)
+    assert killed_pids == {5151}  # the pidfile wins over the stale cached pid
+
+
 def test_stop_with_cleanup_removes_vm_files(monkeypatch, store_and_runner, base_env):
     store, runner = store_and_runner
     vm = _make_vm(runner, "vm-cleanup")
@@ -257,7 +347,8 @@ def test_stop_with_cleanup_removes_vm_files(monkeypatch, store_and_runner, base_
 
     runner.stop(vm, cleanup_disks=True)
 
-    assert wait_until(lambda: vm.state == models.VMState.stopped, timeout=2.0)
-    # All target files should be gone
-    for p in target_files:
-        assert not os.path.exists(p)
+    assert store.wait_for(vm.id, models.VMState.stopped)
+    # All target files should be gone; one listing instead of a stat per file.
+    remaining = set(os.listdir(vm.workdir)) if os.path.isdir(vm.workdir) else set()
+    leftover = remaining & frozenset(os.path.basename(p) for p in target_files)
+    assert not leftover, f"leftover: {leftover}"
@@ -0,0 +1,183 @@
+import gzip
+import json
+import subprocess
+import types
+from contextlib import contextmanager
+
+import pytest
+
+import implementations.search as search
+from models import SearchRequest
+
+
+class FakeStream:
+    def __init__(self, data: bytes):
+        self._data = data
+        self.channel = types.SimpleNamespace(
+            settimeout=lambda t: None, close=lambda: None
+        )
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0:
+            size = len(self._data)
+        out, self._data = self._data[:size], self._data[size:]
+        return out
+
+
+class FakeCli:
+    def __init__(self, out: bytes, err: bytes = b"", status: int | None = None):
+        self.out = out
+        self.err = err
+        self.status = status
+        self.commands: list[str] = []
+
+    def exec_command(self, command):
+        self.commands.append(command)
+        stdout = FakeStream(self.out)
+        if self.status is not None:
+            stdout.channel.recv_exit_status = lambda: self.status
+        return None, stdout, FakeStream(self.err)
+
+
+def _borrow(cli):
+    @contextmanager
+    def _cm(container):
+        yield types.SimpleNamespace(cli=cli)
+
+    return _cm
+
+
+def _rg(*messages) -> bytes:
+    return b"".join(
+        json.dumps(m, separators=(",", ":")).encode() + b"\n" for m in messages
+    )
+
+
+def _match(path, n, text):
+    return {
+        "type": "match",
+        "data": {"path": {"text": path}, "lines": text, "line_number": n},
+    }
+
+
+def test_search_parses_ripgrep_json(monkeypatch):
+    out = _rg(
+        {"type": "begin", "data": {"path": {"text": "/app/a:b.py"}}},
+        _match("/app/a:b.py", 3, {"text": "x = 1\n"}),
+        _match("/app/c.py", 7, {"bytes": "aGk="}),
+        {"type": "end", "data": {}},
+        {"type": "summary", "data": {}},
+    )
+    cli = FakeCli(out)
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    hits = search.search_vm(None, SearchRequest(pattern="x", root="/app"))
+
+    # A ":" in the path no longer breaks the parse.
+    assert {h.path: h.matchs for h in hits} == {
+        "/app/a:b.py": ["L3: x = 1"],
+        "/app/c.py": ["L7: hi"],
+    }
+    assert cli.commands[0].startswith("if command -v rg ")
+
+
+def test_search_falls_back_to_grep_output_and_caps(monkeypatch):
+    cli = FakeCli(b"/app/a.txt:1:hello\n/app/a.txt:2:there\n/app/b.txt:5:world\n")
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    req = SearchRequest(pattern="o", root="/app", max_results_total=2)
+    hits = search.search_vm(None, req)
+
+    assert [(h.path, h.matchs) for h in hits] == [
+        ("/app/a.txt", ["L1: hello", "L2: there"])
+    ]
+    assert "--max-count=2" in cli.commands[0]
+
+
+def test_rg_argv_mirrors_grep_filters():
+    req = SearchRequest(
+        pattern="-x",
+        root="/app",
+        case_insensitive=True,
+        include_globs=["*.py", "*"],
+        exclude_dirs=[".git", "node_modules"],
+    )
+    assert search._rg_args(req) == [
+        "-i",
+        "--glob=*.py",
+        "--glob=!.git/",
+        "--glob=!node_modules/",
+        "-e",
+        "-x",
+        "/app",
+    ]
+
+
+def test_parse_grep_decodes_fields_from_bytes():
+    assert search._parse_grep("/app/é.py:3:a:b ü".encode()) == (
+        "/app/é.py",
+        "L3: a:b ü",
+    )
+    assert search._parse_grep(b"/app/x.bin:1:\xff") == ("/app/x.bin", "L1: �")
+    assert search._parse_grep(b"Binary file matches") is None
+
+
+def test_command_quotes_only_request_fields():
+    req = SearchRequest(pattern="it's", root="/my app", exclude_dirs=[])
+    cmd = search._command(req)
+    assert "rg --json --no-ignore --hidden --follow -e 'it'\"'\"'s' '/my app';" in cmd
+    assert "else grep -RInI -E -e 'it'\"'\"'s' '/my app'; fi" in cmd
+
+
+def test_search_compressed_output_is_inflated(monkeypatch):
+    out = b"".join(b"/app/a.txt:%d:hello\n" % i for i in range(1, 2001))
+    cli = FakeCli(gzip.compress(out))
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    req = SearchRequest(pattern="hello", root="/app", compress=True)
+    hits = search.search_vm(None, req)
+
+    assert "; fi; echo $? >&4; } | gzip -1 >&3;" in cli.commands[0]
+    assert len(hits) == 1 and len(hits[0].matchs) == 2000
+    assert hits[0].matchs[-1] == "L2000: hello"
+
+
+def test_search_error_with_no_matches_is_raised(monkeypatch):
+    cli = FakeCli(b"", err=b"grep: Unmatched ( or \\(\n", status=2)
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    with pytest.raises(search.SearchError, match="Unmatched"):
+        search.search_vm(None, SearchRequest(pattern="(", root="/app"))
+
+
+def test_search_keeps_matches_despite_per_file_errors(monkeypatch):
+    cli = FakeCli(b"/app/a.txt:1:hello\n", err=b"Permission denied\n", status=2)
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    hits = search.search_vm(None, SearchRequest(pattern="hello", root="/app"))
+
+    assert [(h.path, h.matchs) for h in hits] == [("/app/a.txt", ["L1: hello"])]
+
+
+def test_compressed_command_exits_with_the_search_status(tmp_path):
+    req = SearchRequest(pattern="(", root=str(tmp_path), compress=True)
+    proc = subprocess.run(["sh", "-c", search._command(req)], capture_output=True)
+
+    assert proc.returncode == 2  # grep's status, not gzip's 0
+
+
+def test_fixed_strings_match_literally_with_either_tool(monkeypatch, tmp_path):
+    (tmp_path / "a.py").write_text("foo(bar)\nfoo bar\n")
+    req = SearchRequest(pattern="foo(", root=str(tmp_path), fixed_strings=True)
+    assert search._rg_args(req)[0] == "-F" and search._grep_args(req)[0] == "-F"
+
+    # Run the real command locally: "foo(" is an invalid regex for rg and grep -E.
+    out = subprocess.run(["sh", "-c", search._command(req)], capture_output=True)
+    cli = FakeCli(out.stdout, err=out.stderr, status=out.returncode)
+    monkeypatch.setattr(search, "borrow", _borrow(cli))
+
+    hits = search.search_vm(None, req)
+
+    assert [(h.path, h.matchs) for h in hits] == [
+        (str(tmp_path / "a.py"), ["L1: foo(bar)"])
+    ]
@@ -1,5 +1,7 @@
 import json
 
+import pytest
+
 import qemu_manager.seed as seed
 
 GOLDEN_BYTES = 10 * 1024**3
@@ -56,3 +58,98 @@ def test_make_overlay_noop_when_overlay_exists(monkeypatch, tmp_path):
     seed.make_overlay("/base/golden.qcow2", str(overlay), disk_gib=5)
 
     assert calls == []  # nothing created, nothing inspected
+
+
+def test_make_seed_iso_reuses_matching_spec(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(seed.subprocess, "run", _fake_run_factory(calls))
+
+    pub = tmp_path / "id_vm.pub"
+    pub.write_text("ssh-ed25519 AAAA test")
+    iso = tmp_path / "seed.iso"
+    iso.write_bytes(b"ISO")
+    (tmp_path / "seed.iso.spec").write_text(seed.spec_hash("root", str(pub)))
+
+    seed.make_seed_iso(str(iso), "root", str(pub), "vm-1")
+
+    assert calls == []  # spec matches an existing ISO: nothing rebuilt
+    assert not (tmp_path / "user-data").exists()
+
+
+def test_make_overlays_single_invocation(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.setattr(seed.subprocess, "run", _fake_run_factory(calls))
+
+    existing = tmp_path / "b.qcow2"
+    existing.write_text("already here")
+    seed.make_overlays(
+        [
+            ("/base/golden.qcow2", str(tmp_path / "a.qcow2"), 5),
+            ("/base/golden.qcow2", str(existing), 5),
+            ("/base/golden.qcow2", str(tmp_path / "c.qcow2"), 25),
+        ]
+    )
+
+    shells = [c for c in calls if c[1:2] == ["-c"]]
+    assert len(shells) == 1  # all creates batched into one subprocess
+    script = shells[0][2]
+    assert script.count("qemu-img create") == 2  # existing overlay skipped
+    assert str(tmp_path / "a.qcow2") in script and str(existing) not in script
+    assert " && " in script and "; " not in script  # stop at the first failure
+
+
+def test_make_overlays_raises_when_a_create_fails(monkeypatch, tmp_path):
+    calls = []
+    ok = _fake_run_factory(calls)
+
+    def fake_run(args, **kwargs):
+        if args[1:2] == ["-c"]:
+            raise seed.subprocess.CalledProcessError(1, args)
+        return ok(args, **kwargs)
+
+    monkeypatch.setattr(seed.subprocess, "run", fake_run)
+
+    with pytest.raises(seed.subprocess.CalledProcessError):
+        seed.make_overlays([("/base/golden.qcow2", str(tmp_path / "a.qcow2"), 5)])
+
+
+def _fake_geniso(builds):
+    """subprocess.run fake for genisoimage: the "ISO" is just the inputs concatenated."""
+
+    def fake_run(args, **kwargs):
+        builds.append(list(args))
+        out = args[args.index("-output") + 1]
+        with open(out, "wb") as fh:
+            for src in args[-2:]:
+                with open(src, "rb") as inp:
+                    fh.write(inp.read())
+        return type("R", (), {"returncode": 0})()
+
+    return fake_run
+
+
+def test_make_seed_iso_stamps_copies_of_one_template(monkeypatch, tmp_path):
+    builds = []
+    monkeypatch.setattr(seed.subprocess, "run", _fake_geniso(builds))
+    monkeypatch.setattr(
+        seed.shutil,
+        "which",
+        lambda name: "/usr/bin/genisoimage" if name == "genisoimage" else None,
+    )
+    monkeypatch.setattr(seed.settings, "VM_BASE_DIR", str(tmp_path), raising=False)
+
+    pub = tmp_path / "id_vm.pub"
+    pub.write_text("ssh-ed25519 AAAA test")
+
+    isos = []
+    for vm_id in ("vm-one", "vm-two"):
+        wd = tmp_path / vm_id
+        wd.mkdir()
+        seed.make_seed_iso(str(wd / "seed.iso"), "root", str(pub), vm_id)
+        isos.append((wd / "seed.iso").read_bytes())
+
+    assert len(builds) == 1  # the template is packed once, then reused
+    assert b"instance-id: vm-one " in isos[0]
+    assert b"local-hostname: vm-two " in isos[1]
+    assert b"@@PEQUEROKU" not in isos[0] + isos[1]
+    assert len(isos[0]) == len(isos[1])
@@ -1,13 +1,19 @@
 import base64
 import types
-import time
 import errno
 from contextlib import contextmanager
 
+import pytest
+
 import models
 from implementations import send_file as sf
 
 
+@pytest.fixture(autouse=True)
+def _no_settle_delay(monkeypatch):
+    monkeypatch.setattr(sf, "_sleep", lambda x: None)
+
+
 def _fake_borrow(cli=None, sftp=None):
     """Patch target for send_file.borrow: yields a conn with the given cli/sftp."""
 
@@ -29,10 +35,18 @@ class DummyChannel:
 class DummyFile:
     def __init__(self, data: bytes = b"", status: int = 0):
         self._data = data
+        # Sliced without copying for sized reads, like a streamed channel read.
+        self._mv = memoryview(data)
+        self._pos = 0
         self.channel = DummyChannel(status=status)
 
-    def read(self) -> bytes:
-        return self._data
+    def read(self, n: int = -1) -> bytes:
+        start = self._pos
+        if n < 0:
+            self._pos = len(self._mv)
+            return self._data if start == 0 else bytes(self._mv[start:])
+        self._pos = min(start + n, len(self._mv))
+        return bytes(self._mv[start : self._pos])
 
 
 class DummyCLI:
@@ -59,13 +73,13 @@ class MemSFTPWriter:
     def __init__(self, store: dict, path: str):
         self._store = store
         self._path = path
-        self._buf = bytearray()
+        self._chunks: list[bytes] = []
 
     def write(self, data: bytes):
-        self._buf.extend(data)
+        self._chunks.append(bytes(data))
 
     def close(self):
-        self._store[self._path] = bytes(self._buf)
+        self._store[self._path] = b"".join(self._chunks)
 
     def __enter__(self):
         return self
@@ -81,7 +95,8 @@ class MemSFTP:
 
     def __init__(self):
         self.files: dict[str, bytes] = {}
-        self.made_dirs: list[str] = []
+        # Insertion-ordered like a list, with O(1) membership for stat().
+        self.made_dirs: dict[str, None] = {}
         self.chmod_calls: list[tuple[str, int]] = []
         self.raise_chmod = False
 
@@ -95,10 +110,10 @@ class MemSFTP:
     def stat(self, path: str):
         # Only known paths in files are files; any other returns not found
         if path in self.files:
-            return types.SimpleNamespace(st_mode="100644")
+            return types.SimpleNamespace(st_mode=0o100644)
         # treat explicitly created dirs as present
         if path in self.made_dirs:
-            return types.SimpleNamespace(st_mode="040000")
+            return types.SimpleNamespace(st_mode=0o040000)
         # not found
         raise OSError(errno.ENOENT, "not found")
 
@@ -110,8 +125,7 @@ class MemSFTP:
         return path
 
     def mkdir(self, path: str):
-        if path not in self.made_dirs:
-            self.made_dirs.append(path)
+        self.made_dirs.setdefault(path, None)
 
     def chmod(self, path: str, mode: int):
         if self.raise_chmod:
@@ -161,8 +175,6 @@ def test_prepare_vm_clean_calls_clean_dest(monkeypatch, tmp_path):
 
     monkeypatch.setattr(sf, "borrow", _fake_borrow(cli=cli, sftp=sftp))
     monkeypatch.setattr(sf, "_clean_dest", _clean_dest_spy)
-    # avoid sleeps inside _save_file_bytes even though we won't reach it
-    monkeypatch.setattr(time, "sleep", lambda x: None)
 
     files = models.VMUploadFiles(dest_path="/app", files=[], clean=True)
     resp = sf.send_files(vm, files)
@@ -182,7 +194,6 @@ def test_prepare_vm_not_clean_mkdir(monkeypatch, tmp_path):
 
     monkeypatch.setattr(sf, "borrow", _fake_borrow(cli=cli, sftp=sftp))
     monkeypatch.setattr(sf, "_run_and_check", _run_and_check_spy)
-    monkeypatch.setattr(time, "sleep", lambda x: None)
 
     files = models.VMUploadFiles(dest_path="/app", files=[], clean=False)
     resp = sf.send_files(vm, files)
@@ -203,7 +214,6 @@ def test_norm_join_security_violation(monkeypatch, tmp_path):
     monkeypatch.setattr(sf, "borrow", _fake_borrow(cli=cli, sftp=sftp))
     monkeypatch.setattr(sf, "_clean_dest", lambda c, d: None)
     monkeypatch.setattr(sf, "_save_file_bytes", _save_file_bytes_spy)
-    monkeypatch.setattr(time, "sleep", lambda x: None)
 
     up = models.VMUploadFiles(
         dest_path="/app",
@@ -227,15 +237,17 @@ def test_send_files_text_and_b64_and_chmod_fallback(monkeypatch, tmp_path):
     sftp.raise_chmod = True  # force fallback to remote chmod
     cli = DummyCLI()
 
-    chmod_cmds = []
+    # Indexed by path as the commands come in: "chmod <mode> <path>".
+    chmod_by_path: dict[str, str] = {}
 
     def _run_and_check_spy(cli_arg, cmd: str, timeout=None):
-        chmod_cmds.append(cmd)
+        _, mode, path = cmd.split(" ", 2)
+        assert path not in chmod_by_path, f"chmod repeated for {path}"
+        chmod_by_path[path] = mode
 
     monkeypatch.setattr(sf, "borrow", _fake_borrow(cli=cli, sftp=sftp))
     monkeypatch.setattr(sf, "_clean_dest", lambda c, d: None)
     monkeypatch.setattr(sf, "_run_and_check", _run_and_check_spy)
-    monkeypatch.setattr(time, "sleep", lambda x: None)
 
     up = models.VMUploadFiles(
         dest_path="/app",
@@ -257,9 +269,7 @@ def test_send_files_text_and_b64_and_chmod_fallback(monkeypatch, tmp_path):
     assert sftp.files.get("/app/b.txt") == b"mundo"
 
     # Fallback chmod via _run_and_check called for each file
-    assert len(chmod_cmds) == 2
-    assert any("chmod 0o644 /app/a.txt" in cmd for cmd in chmod_cmds)
-    assert any("chmod 0o640 /app/b.txt" in cmd for cmd in chmod_cmds)
+    assert chmod_by_path == {"/app/a.txt": "0o644", "/app/b.txt": "0o640"}
 
 
 def test_create_dir_success(monkeypatch, tmp_path):
@@ -315,7 +325,6 @@ def test_send_files_collects_failed_files(monkeypatch, tmp_path):
     monkeypatch.setattr(sf, "borrow", _fake_borrow(cli=cli, sftp=sftp))
     monkeypatch.setattr(sf, "_clean_dest", lambda c, d: None)
     monkeypatch.setattr(sf, "_save_file_bytes", _save_file_bytes_conditional)
-    monkeypatch.setattr(time, "sleep", lambda x: None)
 
     up = models.VMUploadFiles(
         dest_path="/app",
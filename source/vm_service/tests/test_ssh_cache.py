@@ -9,10 +9,18 @@ class FakeChannel:
     def __init__(self):
         self.closed = False
         self._timeout = None
+        self.pty: tuple[int, int] | None = None
+        self.shell = False
 
     def settimeout(self, t):
         self._timeout = t
 
+    def get_pty(self, width=80, height=24):
+        self.pty = (width, height)
+
+    def invoke_shell(self):
+        self.shell = True
+
 
 class FakeSFTPClient:
     pass
@@ -22,6 +30,20 @@ class FakeTransport:
     def __init__(self, active=True):
         self.active = active
         self.keepalive = None
+        # paramiko's defaults, so a test can tell what _tune_transport changed.
+        self.default_window_size = 2097152
+        self.packetizer = types.SimpleNamespace(
+            REKEY_BYTES=1 << 29, REKEY_PACKETS=1 << 29
+        )
+        # Every session opened, in order, and the window each one asked for.
+        self.sessions: list[FakeChannel] = []
+        self.session_windows: list[int | None] = []
+
+    def open_session(self, window_size=None):
+        chan = FakeChannel()
+        self.sessions.append(chan)
+        self.session_windows.append(window_size)
+        return chan
 
     def is_active(self):
         return self.active
@@ -35,9 +57,10 @@ class FakeSSHClient:
         self._policy = None
         self.connected = False
         self.connect_args = {}
-        self.exec_calls = []
+        # Every command run, in order; exec_count is the shorthand for its length.
+        self.exec_calls: list[str] = []
+        self.exec_count = 0
         self.raise_on_exec = False
-        self.channels_created = 0
         self._sftp = FakeSFTPClient()
         self._transport = FakeTransport(active=True)
 
@@ -61,22 +84,31 @@ class FakeSSHClient:
         return self._sftp
 
     def exec_command(self, command: str):
+        self.exec_count += 1
         self.exec_calls.append(command)
         if self.raise_on_exec:
             raise RuntimeError("boom")
         # Minimal tuple-like expected by callers; they don't use the streams here
         return None, None, None
 
+    @property
+    def channels_created(self):
+        return len(self._transport.session_windows)
+
     def invoke_shell(self, width=120, height=32):
-        self.channels_created += 1
-        ch = FakeChannel()
+        ch = self._transport.open_session()
+        ch.get_pty(width=width, height=height)
+        ch.invoke_shell()
         return ch
 
 
 @pytest.fixture(autouse=True)
-def reset_cache(monkeypatch):
-    # Reset cache per test to isolate
-    monkeypatch.setattr(sc, "cache_data", {})
+def reset_cache():
+    # Reset cache per test to isolate. Cleared in place: ssh_ready imports
+    # cache_data by name, so rebinding the module attribute would leave it stale.
+    sc.cache_data.clear()
+    yield
+    sc.cache_data.clear()
 
 
 @pytest.fixture
@@ -98,6 +130,21 @@ def fake_paramiko(monkeypatch):
     return FakeSSHClient
 
 
+def _make_generator(called: dict):
+    """Stand-in for _generate_ssh_and_sftp_by_id that counts calls in ``called``."""
+
+    def _generator(container_id, ssh_port, ssh_user):
+        called["times"] += 1
+        c = FakeSSHClient()
+        s = c.open_sftp()
+        ch = c.invoke_shell(width=120, height=32)
+        ch.settimeout(0.0)
+        sc.cache_data[container_id] = {"cli": c, "sftp": s, "chan": ch}
+        return c, s, ch
+
+    return _generator
+
+
 @pytest.fixture
 def vm_record():
     return models.VMRecord(
@@ -119,7 +166,8 @@ def test_cache_generate_by_id(monkeypatch, fake_paramiko):
     out = sc.cache_ssh_and_sftp_by_id("abc", 2222, "root")
     assert "abc" in sc.cache_data
     assert isinstance(out.get("cli"), FakeSSHClient)
-    assert isinstance(out.get("sftp"), FakeSFTPClient)
+    # SFTP is only opened once something needs it (exec-only callers never do).
+    assert out.get("sftp") is None
     assert isinstance(out.get("chan"), FakeChannel)
 
     cli: FakeSSHClient = out["cli"]  # type: ignore[assignment]
@@ -147,7 +195,7 @@ def test_cache_reuse_when_valid(monkeypatch, fake_paramiko):
     assert data["cli"] is cli
     assert data["sftp"] is sftp
     # Validity check is local (transport state); it must not run a remote command.
-    assert cli.exec_calls == []
+    assert cli.exec_count == 0
 
 
 def test_cache_regenerate_when_missing_cli(monkeypatch, fake_paramiko):
@@ -155,17 +203,9 @@ def test_cache_regenerate_when_missing_cli(monkeypatch, fake_paramiko):
     sc.cache_data["id2"] = {"sftp": FakeSFTPClient()}
 
     called = {"times": 0}
-
-    def _generator(container_id, ssh_port, ssh_user):
-        called["times"] += 1
-        c = FakeSSHClient()
-        s = c.open_sftp()
-        ch = c.invoke_shell(width=120, height=32)
-        ch.settimeout(0.0)
-        sc.cache_data[container_id] = {"cli": c, "sftp": s, "chan": ch}
-        return c, s, ch
-
-    monkeypatch.setattr(sc, "_generate_ssh_and_sftp_by_id", _generator, raising=True)
+    monkeypatch.setattr(
+        sc, "_generate_ssh_and_sftp_by_id", _make_generator(called), raising=True
+    )
     data = sc.cache_ssh_and_sftp_by_id("id2", 2222, "root")
     assert called["times"] == 1
     assert isinstance(data["cli"], FakeSSHClient)
@@ -177,17 +217,9 @@ def test_cache_regenerate_when_missing_sftp(monkeypatch, fake_paramiko):
     sc.cache_data["id3"] = {"cli": FakeSSHClient()}
 
     called = {"times": 0}
-
-    def _generator(container_id, ssh_port, ssh_user):
-        called["times"] += 1
-        c = FakeSSHClient()
-        s = c.open_sftp()
-        ch = c.invoke_shell(width=120, height=32)
-        ch.settimeout(0.0)
-        sc.cache_data[container_id] = {"cli": c, "sftp": s, "chan": ch}
-        return c, s, ch
-
-    monkeypatch.setattr(sc, "_generate_ssh_and_sftp_by_id", _generator, raising=True)
+    monkeypatch.setattr(
+        sc, "_generate_ssh_and_sftp_by_id", _make_generator(called), raising=True
+    )
     data = sc.cache_ssh_and_sftp_by_id("id3", 2222, "root")
     assert called["times"] == 1
     assert isinstance(data["cli"], FakeSSHClient)
@@ -200,23 +232,36 @@ def test_cache_regenerate_when_transport_inactive(monkeypatch, fake_paramiko):
     sc.cache_data["id4"] = {"cli": bad_cli, "sftp": FakeSFTPClient()}
 
     called = {"times": 0}
-
-    def _generator(container_id, ssh_port, ssh_user):
-        called["times"] += 1
-        c = FakeSSHClient()
-        s = c.open_sftp()
-        ch = c.invoke_shell(width=120, height=32)
-        ch.settimeout(0.0)
-        sc.cache_data[container_id] = {"cli": c, "sftp": s, "chan": ch}
-        return c, s, ch
-
-    monkeypatch.setattr(sc, "_generate_ssh_and_sftp_by_id", _generator, raising=True)
+    monkeypatch.setattr(
+        sc, "_generate_ssh_and_sftp_by_id", _make_generator(called), raising=True
+    )
     data = sc.cache_ssh_and_sftp_by_id("id4", 22, "root")
     assert called["times"] == 1
     assert isinstance(data["cli"], FakeSSHClient)
     assert data["cli"] is not bad_cli  # replaced
 
 
+def test_open_sftp_opens_the_subsystem_once(monkeypatch, fake_paramiko):
+    cli = FakeSSHClient()
+    sc.cache_data["id5"] = {"cli": cli, "sftp": None}
+    opened = []
+    monkeypatch.setattr(cli, "open_sftp", lambda: opened.append(1) or cli._sftp)
+    vm = models.VMRecord(
+        id="id5",
+        state=models.VMState.running,
+        workdir="/tmp",
+        vcpus=1,
+        mem_mib=256,
+        disk_gib=5,
+    )
+
+    first = sc.open_sftp(vm)
+    sftp, same_cli = sc.open_ssh_and_sftp(vm)
+    assert first is sftp is cli._sftp
+    assert same_cli is cli
+    assert opened == [1]
+
+
 def test_open_helpers_and_generate_console(monkeypatch, fake_paramiko, vm_record):
     monkeypatch.setattr(sc.settings, "VM_SSH_PRIVKEY", "/fake/key", raising=False)
 
@@ -326,3 +371,32 @@ def test_clear_cache_and_clear_all(monkeypatch, fake_paramiko):
 
     sc.clear_all_cache()
     assert sc.cache_data == {}
+
+
+def test_tune_transport_widens_window_but_keeps_rekey_limits():
+    cli = FakeSSHClient()
+
+    sc._tune_transport(cli)
+
+    t = cli._transport
+    assert t.keepalive == 30
+    assert t.default_window_size == sc._CHANNEL_WINDOW
+    assert t.packetizer.REKEY_BYTES == 1 << 29  # paramiko's defaults stay
+    assert t.packetizer.REKEY_PACKETS == 1 << 29
+
+
+def test_shell_channel_uses_the_modest_window():
+    cli = FakeSSHClient()
+
+    sc._invoke_shell(cli)
+
+    assert cli._transport.session_windows == [sc._SHELL_WINDOW]
+    (chan,) = cli._transport.sessions
+    assert chan.pty == (120, 32) and chan.shell
+
+
+def test_compress_kwargs_follow_setting(monkeypatch):
+    monkeypatch.setattr(sc.settings, "VM_SSH_COMPRESS", False, raising=False)
+    assert sc._compress_kwargs() == {}
+    monkeypatch.setattr(sc.settings, "VM_SSH_COMPRESS", True, raising=False)
+    assert sc._compress_kwargs() == {"compress": True}
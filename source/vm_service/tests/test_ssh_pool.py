@@ -106,3 +106,40 @@ def test_drop_pool_closes_idle(reset_pool):
     ssh_pool.drop_pool("vm-drop")
     assert conn1.closed is True
     assert "vm-drop" not in ssh_pool._idle
+
+
+def test_sftp_opened_only_when_used(reset_pool):
+    vm = _vm()
+    opened = []
+    with ssh_pool.borrow(vm) as conn:
+        conn.cli.open_sftp = lambda: opened.append(1) or conn.cli.sftp
+    assert opened == []  # exec-only borrow never opens the subsystem
+    with ssh_pool.borrow(vm) as conn:
+        assert conn.sftp is conn.cli.sftp
+        assert conn.sftp is conn.cli.sftp
+    assert opened == [1]
+
+
+def test_idle_connections_are_reaped(reset_pool, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(ssh_pool.time, "monotonic", lambda: clock[0])
+    with ssh_pool.borrow(_vm("vm-old")) as c1:
+        old = c1.cli
+
+    clock[0] += ssh_pool._IDLE_TIMEOUT_S + 1
+    with ssh_pool.borrow(_vm("vm-other")):
+        pass
+
+    assert old.closed is True
+    assert ssh_pool._idle["vm-old"] == []
+
+
+def test_pool_size_comes_from_settings(reset_pool, monkeypatch):
+    monkeypatch.setattr(ssh_pool.settings, "VM_SSH_POOL_SIZE", 1, raising=False)
+    vm = _vm("vm-one")
+    with ssh_pool.borrow(vm):
+        # The only slot is taken: another borrow for this VM would block.
+        assert ssh_pool._sem("vm-one").acquire(blocking=False) is False
+    with ssh_pool.borrow(vm):
+        pass
+    assert len(reset_pool) == 1
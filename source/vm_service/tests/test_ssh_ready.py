@@ -0,0 +1,45 @@
+import socket
+import threading
+
+import qemu_manager.ssh_ready as ssh_ready
+
+
+def _serve_once(payload: bytes) -> int:
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+
+    def _accept():
+        conn, _ = srv.accept()
+        if payload:
+            conn.sendall(payload)
+        conn.close()
+        srv.close()
+
+    threading.Thread(target=_accept, daemon=True).start()
+    return srv.getsockname()[1]
+
+
+def test_banner_probe_requires_ssh_banner():
+    assert ssh_ready._ssh_banner_ready(_serve_once(b"SSH-2.0-OpenSSH\r\n")) is True
+    # QEMU's hostfwd accepts and drops while the guest sshd isn't up yet.
+    assert ssh_ready._ssh_banner_ready(_serve_once(b"")) is False
+
+
+def test_wait_ssh_polls_probe_without_handshake(monkeypatch):
+    sleeps = []
+    alive = iter([True, True, False])
+    monkeypatch.setattr(ssh_ready, "_ssh_banner_ready", lambda port: False)
+    monkeypatch.setattr(ssh_ready.time, "sleep", sleeps.append)
+
+    def no_handshake():
+        raise AssertionError("paramiko must not be touched before the banner")
+
+    monkeypatch.setattr(ssh_ready.paramiko, "SSHClient", no_handshake)
+
+    ok = ssh_ready.wait_ssh(
+        2222, timeout=30, user="root", is_vm_alive=lambda: next(alive)
+    )
+
+    assert ok is False
+    assert sleeps == sorted(sleeps) and sleeps[0] == ssh_ready._PROBE_BASE_S
@@ -24,7 +24,7 @@ class _FakePipeline:
         self._ops.append(("sadd", (key, member)))
         return self
 
-    def get(self, key):  # not used in code under test via pipeline
+    def get(self, key):
         self._ops.append(("get", (key,)))
         return self
 
@@ -50,13 +50,18 @@ class _FakeRedis:
     def __init__(self):
         self._data: dict[str, str] = {}
         self._sets: dict[str, set[str]] = {}
+        self.pipelines = 0
 
-    def pipeline(self):
+    def pipeline(self, transaction=True):
+        self.pipelines += 1
         return _FakePipeline(self)
 
     def get(self, key):
         return self._data.get(key)
 
+    def mget(self, keys):
+        return [self._data.get(k) for k in keys]
+
     def smembers(self, key):
         return set(self._sets.get(key, set()))
 
@@ -151,6 +156,24 @@ def test_set_status_updates_state_and_updated_at():
     assert after.updated_at >= before
 
 
+def test_mget_fetches_known_ids_in_one_call():
+    store = RedisStore(url="redis://dummy/0", namespace="ns")
+    store.put(_make_vm("m1"))
+    store.put(_make_vm("m2"))
+
+    calls = []
+    real_mget = store.r.mget
+    store.r.mget = lambda keys: calls.append(keys) or real_mget(keys)
+
+    store._cache.clear()
+    out = store.mget(["m2", "missing", "m1", "m2"])
+
+    assert list(out) == ["m2", "m1"]
+    assert out["m1"].workdir == "/tmp/m1"
+    assert calls == [["ns:vm:m2", "ns:vm:missing", "ns:vm:m1"]]
+    assert store.mget([]) == {}
+
+
 def test_get_missing_raises_keyerror():
     store = RedisStore(url="redis://dummy/0", namespace="ns")
     with pytest.raises(KeyError):
@@ -245,3 +268,69 @@ def test_reconcile_all_counts_only_existing():
     # and not count toward cnt
     cnt = store.reconcile_all()
     assert cnt == 1
+
+
+def test_all_loads_with_one_mget_and_writes_back_in_one_pipeline(monkeypatch):
+    store = RedisStore(url="redis://dummy/0", namespace="ns")
+    for id_ in ("e1", "e2", "e3"):
+        vm = _make_vm(id_)
+        vm.state = VMState.running
+        vm.ssh_port = 2222
+        store.put(vm)
+
+    monkeypatch.setattr(
+        "implementations.store.socket.create_connection",
+        lambda *a, **k: (_ for _ in ()).throw(ConnectionError("unreachable")),
+    )
+    calls = []
+    real_mget = store.r.mget
+    store.r.mget = lambda keys: calls.append(keys) or real_mget(keys)
+    store.r.pipelines = 0
+
+    all_map = store.all()
+
+    assert calls == [["ns:vm:e1", "ns:vm:e2", "ns:vm:e3"]]
+    assert store.r.pipelines == 1
+    assert {vm.state for vm in all_map.values()} == {VMState.stopped}
+    assert store.get("e2").state == VMState.stopped
+
+
+def test_get_is_served_from_the_write_through_cache():
+    store = RedisStore(url="redis://dummy/0", namespace="ns", cache_ttl_s=60.0)
+    vm = _make_vm("f1")
+    store.put(vm)
+
+    gets = []
+    store.r.get = lambda key: gets.append(key)
+
+    first = store.get("f1")
+    first.state = VMState.error  # callers' edits stay out of the cache
+    assert store.get("f1").state == VMState.provisioning
+    assert gets == []
+
+    vm.state = VMState.stopped
+    store.put(vm)
+    assert store.get("f1").state == VMState.stopped
+
+    store.cache_ttl_s = 0.0
+    with pytest.raises(KeyError):
+        store.get("f1")
+    assert gets == ["ns:vm:f1"]
+
+
+def test_mget_only_fetches_ids_missing_from_the_cache():
+    store = RedisStore(url="redis://dummy/0", namespace="ns", cache_ttl_s=60.0)
+    store.put(_make_vm("g1"))
+    store.put(_make_vm("g2"))
+    store._cache.pop("g2")
+
+    calls = []
+    real_mget = store.r.mget
+    store.r.mget = lambda keys: calls.append(keys) or real_mget(keys)
+
+    out = store.mget(["g2", "g1", "nope"])
+
+    assert list(out) == ["g2", "g1"]
+    assert calls == [["ns:vm:g2", "ns:vm:nope"]]
+    assert store.mget(["g1", "g2"]).keys() == {"g1", "g2"}
+    assert len(calls) == 1
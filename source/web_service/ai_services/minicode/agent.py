@@ -79,16 +79,28 @@ class Agent:
     # the loop  (generator: yields events, returns the final text)
     # ------------------------------------------------------------------ #
     def run(self) -> Iterator[Event]:
+        # The system prompt depends only on the config and the agent type, and the
+        # toolset is fixed at construction: both are built once per turn, not on
+        # every step of the loop.
+        system = build_system(self.config, self.agent_type)
+        all_tools = [t.schema for t in self.tools]
+        # Repair once up front (safety net: we never send a broken history). Inside
+        # the loop the history only grows through add_assistant/add_tool_result,
+        # which keep every tool-call answered, so each step just appends what the
+        # previous one added instead of re-sanitizing and re-copying it all.
+        self.session.sanitize()
+        messages = [{"role": "system", "content": system}, *self.session.messages]
+        sent = len(self.session.messages)
         step = 0
         while True:
             step += 1
             last_step = step >= self.config.max_steps
 
-            # 1) assemble context: system + the session's (repaired) history
-            self.session.sanitize()  # safety net: we never send a broken history
-            system = build_system(self.config, self.agent_type)
-            messages = [{"role": "system", "content": system}, *self.session.messages]
-            tools_schema = None if last_step else [t.schema for t in self.tools]
+            # 1) assemble context: system + the session's history
+            new = self.session.messages[sent:]
+            messages.extend(new)
+            sent += len(new)
+            tools_schema = None if last_step else all_tools
             if last_step:
                 # on the last step we forbid tools and force a summary
                 messages.append({"role": "system", "content": MAX_STEPS_PROMPT})
@@ -1,4 +1,4 @@
-"""Assembling the system context on each turn of the loop.
+"""Assembling the system context for each turn of the agent.
 
 Pequeroku adaptation: the agent works on a remote VM (Debian), NOT on the Django
 server's filesystem. That is why the ``<env>`` block describes the VM and the
@@ -8,9 +8,10 @@ which would leak server config). Instead, the project context is read from the
 user's VM (``/app/AGENTS.md``) and the skills from ``/app/.pequenin/skills``; both
 are loaded by the pipeline ONCE per turn and stashed on the ``Config``.
 
-``build_system`` is called on EVERY turn of the loop, so it stays cheap: only
-strings, no I/O or round-trips to the VM (it reads the already-loaded
-``config.project_doc`` / ``config.skills``).
+``build_system`` is called once per turn, before the agent loop starts (the
+prompt depends only on the config and the agent type, so the loop's steps reuse
+it). It still stays cheap: only strings, no I/O or round-trips to the VM (it
+reads the already-loaded ``config.project_doc`` / ``config.skills``).
 """
 
 from __future__ import annotations
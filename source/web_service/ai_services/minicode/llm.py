@@ -117,6 +117,10 @@ class LLM:
 
         content: list[str] = []
         tool_calls: dict[int, dict] = {}
+        # Argument fragments per tool-call index, joined once at the end: a tool
+        # call that writes a whole file streams its arguments in hundreds of small
+        # pieces, and `str +=` would re-copy everything received so far each time.
+        arg_parts: dict[int, list[str]] = {}
         started_text = False
         raw_usage: dict | None = None
 
@@ -143,20 +147,27 @@ class LLM:
                 content.append(delta.content)
 
             for tcd in delta.tool_calls or []:
-                acc = tool_calls.setdefault(
-                    tcd.index, {"id": "", "name": "", "arguments": ""}
-                )
+                acc = tool_calls.get(tcd.index)
+                if acc is None:
+                    acc = tool_calls[tcd.index] = {
+                        "id": "",
+                        "name": "",
+                        "arguments": "",
+                    }
+                    arg_parts[tcd.index] = []
                 if tcd.id:
                     acc["id"] = tcd.id
                 if tcd.function:
                     if tcd.function.name:
                         acc["name"] = tcd.function.name
                     if tcd.function.arguments:
-                        acc["arguments"] += tcd.function.arguments
+                        arg_parts[tcd.index].append(tcd.function.arguments)
 
         if started_text:
             yield AssistantTextEnd()
 
+        for k, parts in arg_parts.items():
+            tool_calls[k]["arguments"] = "".join(parts)
         ordered = [tool_calls[k] for k in sorted(tool_calls)]
         for i, tc in enumerate(ordered):  # guarantee a non-empty id
             if not tc["id"]:
@@ -22,16 +22,23 @@ def truncate(
 ) -> str:
     """Trim from the head (default) or the tail (``from_tail``, e.g. shell)."""
     truncated = False
-    lines = text.split("\n")
-    if len(lines) > max_lines:
+    # Runs on every tool result, so the common small output is only counted, never
+    # split into lines or encoded.
+    if text.count("\n") >= max_lines:
         truncated = True
-        lines = lines[-max_lines:] if from_tail else lines[:max_lines]
+        # maxsplit: only the kept lines are split off, the rest stays one string.
+        if from_tail:
+            lines = text.rsplit("\n", max_lines)[1:]
+        else:
+            lines = text.split("\n", max_lines)[:max_lines]
         text = "\n".join(lines)
-    data = text.encode("utf-8")
-    if len(data) > max_bytes:
-        truncated = True
-        data = data[-max_bytes:] if from_tail else data[:max_bytes]
-        text = data.decode("utf-8", "ignore")
+    # A char is at most 4 UTF-8 bytes: short text can't exceed max_bytes.
+    if len(text) * 4 > max_bytes:
+        data = text.encode("utf-8")
+        if len(data) > max_bytes:
+            truncated = True
+            data = data[-max_bytes:] if from_tail else data[:max_bytes]
+            text = data.decode("utf-8", "ignore")
     if truncated:
         text += "\n\n[output truncated]"
     return text
@@ -19,7 +19,7 @@ from ai_services.minicode.events import (
     ToolResult,
     Usage,
 )
-from ai_services.minicode.tools.base import ToolContext
+from ai_services.minicode.tools.base import ToolContext, truncate
 from ai_services.minicode.tools import files as files_tools
 from ai_services.minicode.tools import shell as shell_tools
 
@@ -217,6 +217,21 @@ def test_process_status_and_stop():
 # --------------------------------------------------------------------------- #
 # Resiliencia del historial
 # --------------------------------------------------------------------------- #
+def test_truncate_keeps_head_or_tail_lines_and_bytes():
+    text = "\n".join(f"l{i}" for i in range(10))
+    assert truncate(text, max_lines=10) == text
+    assert truncate(text, max_lines=3) == "l0\nl1\nl2\n\n[output truncated]"
+    assert (
+        truncate(text, max_lines=3, from_tail=True)
+        == "l7\nl8\nl9\n\n[output truncated]"
+    )
+
+    wide = "ñ" * 10  # 20 bytes
+    assert truncate(wide, max_bytes=20) == wide
+    assert truncate(wide, max_bytes=7) == "ñññ\n\n[output truncated]"
+    assert truncate(wide, max_bytes=7, from_tail=True) == "ñññ\n\n[output truncated]"
+
+
 def test_session_sanitize_repairs_dangling_tool_calls():
     s = Session()
     s.messages = [
@@ -249,8 +264,11 @@ class FakeLLM:
     def __init__(self, script):
         self.script = list(script)
         self.calls = 0
+        # Lo que recibió cada llamada: (copia de los mensajes, schemas de tools).
+        self.requests = []
 
     def stream(self, messages, tools):
+        self.requests.append((list(messages), tools))
         msg = self.script[self.calls]
         self.calls += 1
         content = msg.get("content") or ""
@@ -263,11 +281,29 @@ class FakeLLM:
         return msg
 
 
-def test_agent_loop_executes_tool_then_answers():
-    client = FakeVMClient()
+def make_agent_config(client: FakeVMClient) -> Config:
     config = Config(api_key="k", base_url="u", model="m", workdir="/app")
     config.container = SimpleNamespace(container_id="vm-1", node=object())
     config._vm_client = client
+    return config
+
+
+def write_then_answer(path: str, content: str) -> list[dict]:
+    """Guion de dos pasos: una tool-call `write` y luego la respuesta final."""
+    call = {
+        "id": "c1",
+        "name": "write",
+        "arguments": json.dumps({"filePath": path, "content": content}),
+    }
+    return [
+        {"content": "", "tool_calls": [call], "usage": None},
+        {"content": "hecho", "tool_calls": [], "usage": None},
+    ]
+
+
+def test_agent_loop_executes_tool_then_answers():
+    client = FakeVMClient()
+    config = make_agent_config(client)
 
     llm = FakeLLM(
         [
@@ -312,3 +348,44 @@ def test_agent_loop_executes_tool_then_answers():
     assert any(isinstance(e, Usage) for e in events)
     # respuesta final del agente
     assert session.last_assistant_text() == "Listo, escribí hello.txt."
+
+
+def test_agent_builds_system_prompt_and_tool_schemas_once_per_turn(monkeypatch):
+    from ai_services.minicode import agent as agent_mod
+
+    built = []
+    real_build = agent_mod.build_system
+    monkeypatch.setattr(
+        agent_mod,
+        "build_system",
+        lambda cfg, agent_type: built.append(agent_type) or real_build(cfg, agent_type),
+    )
+
+    llm = FakeLLM(write_then_answer("a.txt", "a"))
+    session = Session()
+    session.add_user("escribe a.txt")
+    list(Agent(make_agent_config(FakeVMClient()), llm, session=session).run())
+
+    assert built == ["build"]
+    (messages1, tools1), (messages2, tools2) = llm.requests
+    assert messages1[0] == messages2[0] and messages1[0]["role"] == "system"
+    assert tools1 is tools2 and tools1
+
+
+def test_agent_sanitizes_once_and_only_appends_new_history(monkeypatch):
+    sanitized = []
+    real_sanitize = Session.sanitize
+    monkeypatch.setattr(
+        Session, "sanitize", lambda self: sanitized.append(1) or real_sanitize(self)
+    )
+
+    llm = FakeLLM(write_then_answer("b.txt", "b"))
+    session = Session()
+    session.add_user("escribe b.txt")
+    list(Agent(make_agent_config(FakeVMClient()), llm, session=session).run())
+
+    assert sanitized == [1]
+    assert [[m["role"] for m in messages] for messages, _ in llm.requests] == [
+        ["system", "user"],
+        ["system", "user", "assistant", "tool"],
+    ]
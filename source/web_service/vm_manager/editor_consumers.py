@@ -212,6 +212,8 @@ class EditorConsumer(
                 exclude_dirs=exclude_dirs,
                 max_results_total=250,
                 timeout_seconds=10,
+                # The panel searches for the text as typed: `foo(` is not a regex.
+                fixed_strings=True,
             ).apply_exclude_diff(),
         )
         await self.send_json({"event": "ok", "req_id": req_id, "data": search})
@@ -234,6 +234,9 @@ def test_editor_handlers_happy_path(monkeypatch):
         )
         msg = await comm.receive_json_from()
         assert msg["event"] == "ok" and msg["data"][0]["path"] == "/app/a.py"
+        # The panel searches for what the user typed, not for a regex.
+        search_req = next(req for name, req in vm.calls if name == "search")
+        assert search_req.fixed_strings is True
 
         # move_path
         await comm.send_json_to(
@@ -23,6 +23,8 @@ class SearchRequest:
     )
     max_results_total: int | None = None
     timeout_seconds: int = 10
+    # Match ``pattern`` literally instead of as an (extended) regex.
+    fixed_strings: bool = False
 
     def apply_exclude_diff(self):
         exclude_dirs = [